@@ -0,0 +1,640 @@
+"""
+Headless acquisition: the devices of control_v1.0.4.py, the live
+DeviceData and one polling pass, without any GUI.
+
+ControlApplication builds on Acquisition and overrides the two hooks:
+service_pending() runs queued button commands between device reads (the
+pass is abandoned when one was run, as before), on_limit_exceeded()
+triggers the emergency stop.  process_command() runs the command dicts
+of the button queue; acquisition_service.py runs the same loop in its own
+process and takes those commands over a socket.  bench_poll.py drives
+poll_once() directly against the simulators.  The process loggers of
+both apps and the PollClock that paces them live here too.
+"""
+import concurrent.futures
+import datetime
+import os
+import time
+
+from async_devices import LOOP, AsyncGasAnalyzer, AsyncPowerMeter
+from devices import (GAS_TAIL_WAIT, GAS_TIMEOUT, PM_TIMEOUT, TK4_ADDRESSES, TK4_RO_ADDRESSES, DeviceData, GasAnalyzer,
+                     MFCController, MFMFlowMeter, ModbusRelayController, PowerMeter,
+                     PSM4Controller, TK4Controller, modbus_client)
+from driver_log import get_logger
+from event_journal import OVERPRESSURE, OVERTEMP
+from row_codec import GAS_NAMES, RowEncoder, V1_VALUE_COLUMNS, VALUE
+from run_log import RunLogWriter, times_path
+from sample_model import ChannelBlock, NAN, ST_DISABLED, ST_NO_REPLY, ST_OFFLINE
+import startup_timer
+
+log = get_logger("acquisition")
+
+# How long after its start poll_once waits for a side read: the reply
+# ceilings of its transactions plus a second for a command ahead of it on
+# the port.  Past that the channels are marked missing for the pass.
+PM_READ_LIMIT = 2 * PM_TIMEOUT[1] + 1.0
+GAS_READ_LIMIT = GAS_TIMEOUT[1] + GAS_TAIL_WAIT + 1.0
+
+
+class Logger:
+    """
+    control_v1.0.4.py layout: one segment per run.  Rows are aligned on the
+    start of the pass; with channel_times a .ptimes file next to it holds
+    the time each value was actually read (run_log.read_channel_series).
+    """
+    def __init__(self, filename, channel_times=False):
+        self.max_temp = 400.0
+        self.max_press = 5.0
+        self.filename = filename
+        self.columns = ["Timestamp"] + V1_VALUE_COLUMNS + GAS_NAMES
+        self.encoder = RowEncoder([
+            ("main_temps", 4, None),
+            ("ro_temps", 2, None),
+            ("pressures", 4, None),
+            ("meters", 3, None),
+            ("mfc_flows", 4, None),
+        ])
+        # Streaming log; export_xlsx.py writes the xlsx (all columns 12 wide) after the run.
+        self.writer = RunLogWriter(self.filename, self.columns, [12] * len(self.columns))
+        self.times_writer = None
+        if channel_times:
+            self.times_writer = RunLogWriter(times_path(self.filename), self.columns, [12] * len(self.columns))
+
+    def log(self, data, gas_values=None):
+        try:
+            # Stamped with the start of the pass (DeviceData.last_update), not the time of logging
+            self.writer.append(self.encoder.encode(data, gas_values, data.last_update))
+            if self.times_writer is not None:
+                self.times_writer.append(self.encoder.encode_times(data, data.gas_time, data.last_update))
+        except Exception as e:
+            log.error(f"[Logger] Logging error: {e}")
+
+    def close(self):
+        self.writer.close()
+        if self.times_writer is not None:
+            self.times_writer.close()
+
+
+class HourlyLogger:
+    """control1.py layout: one segment per hour in "Data log" (channel_times: see Logger)."""
+    def __init__(self, data_log_dir=None, channel_times=False):
+        self.columns = [
+            "Timestamp", "Heater", "Preheater", "Reactor",
+            "Temp1", "Temp2", "Temp3",
+            "Pressure1", "Pressure2", "Pressure3",
+            "Power", "Energy", "MFM_Flow",
+            "MFC_CH4", "MFC_O2", "MFC_N2", "MFC_H2",
+            "CO", "CO2", "CH4", "CnHm", "H2", "O2", "C2H2", "C2H4", "HHV", "N2"
+        ]
+        self.encoder = RowEncoder([
+            ("temps", 6, None),
+            ("pressures", 3, None),
+            ("power", 1, VALUE), ("energy", 1, VALUE), ("mfm_flow", 1, VALUE),
+            ("mfc_flows", 4, None),
+        ], access="item")
+        # Column widths used when a segment is exported with export_xlsx.py
+        self.widths = [18] + [12] * (len(self.columns) - 1)
+        self.writer = None
+        self.times_writer = None
+        self.channel_times = channel_times
+        if data_log_dir is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            data_log_dir = os.path.join(script_dir, "Data log")
+        self.data_log_dir = data_log_dir
+        os.makedirs(self.data_log_dir, exist_ok=True)
+
+    def get_filename(self):
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H')
+        return os.path.join(self.data_log_dir, f"process_log_{timestamp}.plog")
+
+    def log(self, data, gas_values=None, timestamp=None, gas_time=NAN):
+        record = self.encoder.encode(data, gas_values, timestamp)
+        try:
+            filename = self.get_filename()
+            if self.writer is None or self.writer.path != filename:
+                self.close()
+                self.writer = RunLogWriter(filename, self.columns, self.widths)
+                if self.channel_times:
+                    self.times_writer = RunLogWriter(times_path(filename), self.columns, self.widths)
+            self.writer.append(record)
+            if self.times_writer is not None:
+                self.times_writer.append(self.encoder.encode_times(data, gas_time, record[0]))
+        except Exception as e:
+            log.error(f"[Logger] Logging error: {e}")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.times_writer is not None:
+            self.times_writer.close()
+            self.times_writer = None
+
+
+class PollClock:
+    """
+    Fixed sample period on time.monotonic(): pass k is due at
+    start + k * period however long the passes before it took, so the
+    sample period does not drift with device latency.  A pass that runs
+    into the next slot is an overrun; slots already missed are skipped,
+    not run back to back.
+
+        stamp = clock.begin()     # wall-clock acquisition time of the pass
+        ...poll...
+        clock.end()               # or clock.again() to rerun a cut-short pass now
+        time.sleep(clock.remaining())
+    """
+    def __init__(self, period):
+        self.period = period
+        self.due = None
+        self.rerun = False
+        self.started = None
+        self.passes = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_late = 0.0
+        self.overrunning = False
+
+    def remaining(self):
+        """Seconds until the next pass is due (<= 0: due now)."""
+        if self.rerun or self.due is None:
+            return 0.0
+        return self.due - time.monotonic()
+
+    def begin(self):
+        """Start a pass; returns its time stamp (epoch seconds)."""
+        now = time.monotonic()
+        if self.due is None:
+            self.due = now
+        if self.rerun:
+            # Off-grid rerun of a cut-short pass; the grid stays where it was
+            self.rerun = False
+        else:
+            late = now - self.due
+            if late >= self.period > 0:
+                missed = int(late // self.period)
+                self.skipped += missed
+                self.due += missed * self.period
+                late -= missed * self.period
+            self.max_late = max(self.max_late, late)
+            self.due += self.period
+        self.passes += 1
+        self.started = now
+        return time.time()
+
+    def end(self):
+        """Finish a pass; reports when passes start or stop overrunning the period."""
+        now = time.monotonic()
+        overrun = now > self.due
+        if overrun:
+            self.overruns += 1
+            if not self.overrunning:
+                log.warning(f"[Poll] Pass took {now - self.started:.2f} s, longer than the "
+                            f"{self.period:.2f} s sample period")
+        elif self.overrunning:
+            log.info(f"[Poll] Back on the {self.period:.2f} s schedule ({self.overruns} overruns so far)")
+        self.overrunning = overrun
+
+    def again(self):
+        self.rerun = True
+
+    def stats(self):
+        return {"period": self.period, "passes": self.passes, "overruns": self.overruns,
+                "skipped": self.skipped, "max_late_ms": round(self.max_late * 1000.0, 1)}
+
+
+class Acquisition:
+    poll_interval = 1.0  # sample period, seconds
+    poll_slice = 0.1     # handle_polling returns at once while the next pass is further away than this
+
+    def __init__(self, rs485_port, pm_port, gas_port, logger=None, modbus_transport="pymodbus"):
+        self.data = DeviceData()
+        self.max_temp = 400.0
+        self.max_press = 5.0
+
+        self.pm = PowerMeter(port=pm_port)
+        self.pm_enabled = True
+        if self.pm_enabled:
+            self.pm.connect()
+        self.mfm = MFMFlowMeter(port=rs485_port, device_id=1)
+        self.mfm_enabled = True
+        self.logger = logger
+        self.mfc = MFCController(port=rs485_port)
+        self.mfc_enabled = True
+        self.gas_analyzer = GasAnalyzer(port=gas_port)
+        self.gas_analyzer_enabled = True
+        self.gas_values = {k: None for k in GAS_NAMES}
+        self.modbus_client = modbus_client(rs485_port, modbus_transport)
+        self.modbus_client.connect()
+        self.tk4 = TK4Controller(self.modbus_client)
+        self.psm4 = PSM4Controller(self.modbus_client)
+        self.relay = ModbusRelayController(self.modbus_client, slave_id=8)
+        # The power meter and gas analyzer have ports of their own; poll_once
+        # reads them on their port workers while it polls the RS485 bus
+        self.pm_async = AsyncPowerMeter(self.pm)
+        self.gas_async = AsyncGasAnalyzer(self.gas_analyzer)
+        self.pm_read = self.gas_read = None
+        self.pm_deadline = self.gas_deadline = 0.0  # time.monotonic() by which each read should be in
+        self.clock = PollClock(self.poll_interval)
+        self.armed = True  # re-armed by the next pass that finds every value within limits
+        self.tripped = False  # a limit was exceeded in the current pass
+
+    # --- Hooks ---
+    def service_pending(self):
+        """Run one pending command, if any; True abandons the current pass."""
+        return False
+
+    def on_limit_exceeded(self, description, **event):
+        """Once per trip; event: code, device, value and limit for the event journal."""
+        log.warning(f"[Acquisition] {description}")
+
+    def limit_exceeded(self, description, **event):
+        """Latch the trip; on_limit_exceeded runs again only after a clean pass re-armed it."""
+        self.tripped = True
+        if self.armed:
+            self.armed = False
+            self.on_limit_exceeded(description, **event)
+
+    # --- Bus handling ---
+    def reconnect_modbus(self):
+        """Reopen the Modbus client after an ASCII transaction on the shared port."""
+        self.modbus_client.connect()
+        self.tk4.client = self.modbus_client
+        self.psm4.client = self.modbus_client
+        self.relay.client = self.modbus_client
+
+    # --- Commands ---
+    # A command is a dict {"cmd": ..., args..., "reply_queue": optional
+    # queue.Queue}; the reply dict is put on reply_queue.  The GUI worker,
+    # the acquisition service and RemoteAcquisition all use this format.
+    def process_command(self, command):
+        cmd_type = command.get("cmd")
+        reply_queue = command.get("reply_queue", None)
+
+    # --- TK4 (Modbus) ---
+        if cmd_type == "read_tk4":
+            addr = command["address"]
+            try:
+                value, status = self.tk4.read_temperature(addr)
+            except Exception as e:
+                log.error(f"[Worker] read_tk4 error: {e}")
+                value, status = NAN, ST_NO_REPLY
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "address": addr, "value": value, "status": status})
+
+        elif cmd_type == "set_tk4_sv":
+            addr = command["address"]
+            val = command["value"]
+            try:
+                result = self.tk4.set_setpoint(addr, val)
+            except Exception as e:
+                log.error(f"[Worker] set_tk4_sv error: {e}")
+                result = False
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
+
+        elif cmd_type == "start_tk4":
+            addr = command["address"]
+            try:
+                result = self.tk4.control_heater(addr, False)
+            except Exception as e:
+                log.error(f"start_tk4 error: {e}")
+                result = False
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
+
+        
+
+    # --- PSM4 (Modbus) ---
+        elif cmd_type == "read_psm4":
+            try:
+                values = self.psm4.read_pressures()
+            except Exception as e:
+                log.error(f"[Worker] read_psm4 error: {e}")
+                values = ChannelBlock(4)
+                values.invalidate(ST_NO_REPLY)
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "values": values})
+
+    # --- Relay (Modbus) ---
+        elif cmd_type == "relay_pulse":
+            channel = command["channel"]
+            duration = command.get("duration", 1.0)
+            try:
+                self.relay.send_pulse(channel, duration)
+                success = True
+            except Exception as e:
+                log.error(f"[Worker] relay_pulse error: {e}")
+                success = False
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "channel": channel, "success": success})
+
+    # --- MFC (ASCII, needs port switch) ---
+        elif cmd_type in ("set_mfc_flow", "on_off_mfc", "read_mfc"):
+            try:
+                self.modbus_client.close()
+                if cmd_type == "set_mfc_flow":
+                    ch = command["channel"]
+                    val = command["value"]
+                    try:
+                        result = self.mfc.set_flow(ch, val)
+                    except Exception as e:
+                        log.error(f"[Worker] set_mfc_flow error: {e}")
+                        result = False
+                    if reply_queue:
+                        reply_queue.put({"cmd": cmd_type, "channel": ch, "success": result})
+                elif cmd_type == "on_off_mfc":
+                    ch = command["channel"]
+                    state = command["state"]
+                    try:
+                        result = self.mfc.on_off(ch, state)
+                    except Exception as e:
+                        log.error(f"[Worker] on_off_mfc error: {e}")
+                        result = False
+                    if reply_queue:
+                        reply_queue.put({"cmd": cmd_type, "channel": ch, "success": result})
+                elif cmd_type == "read_mfc":
+                    ch = command["channel"]
+                    try:
+                        value = self.mfc.read_flow(ch)
+                    except Exception as e:
+                        log.error(f"[Worker] read_mfc error: {e}")
+                        value = None
+                    if reply_queue:
+                        reply_queue.put({"cmd": cmd_type, "channel": ch, "value": value})
+            finally:
+                try:
+                    self.reconnect_modbus()
+                except Exception as e:
+                    log.error(f"[Worker] Error reconnecting Modbus after MFC: {e}")
+
+    # --- MFM (ASCII, needs port switch) ---
+        elif cmd_type == "read_mfm":
+            try:
+                self.modbus_client.close()
+                try:
+                    value = self.mfm.read_flow()
+                except Exception as e:
+                    log.error(f"[Worker] read_mfm error: {e}")
+                    value = None
+                if reply_queue:
+                    reply_queue.put({"cmd": cmd_type, "value": value})
+            finally:
+                try:
+                    self.reconnect_modbus()
+                except Exception as e:
+                    log.error(f"[Worker] Error reconnecting Modbus after MFM: {e}")
+
+    # --- Gas Analyzer (separate port) ---
+        elif cmd_type == "read_gas":
+            try:
+                # On the port worker, so it cannot collide with a poll_once read
+                values = LOOP.run(self.gas_async.read_gases())
+            except Exception as e:
+                log.error(f"[Worker] read_gas error: {e}")
+                values = None
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "values": values})
+
+    # --- Poll all devices (periodic) ---
+        elif cmd_type == "read_all":
+            try:
+                self.handle_polling()
+            except Exception as e:
+                log.error(f"[Worker] handle_polling error: {e}")
+        
+        elif cmd_type == "relay_open_all":
+            try:
+                self.relay.open_all()
+                success = True
+            except Exception as e:
+                log.error(f"[Worker] relay_open_all error: {e}")
+                success = False
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "success": success})
+
+        elif cmd_type == "relay_close_all":
+            try:
+                self.relay.close_all()
+                success = True
+            except Exception as e:
+                log.error(f"[Worker] relay_close_all error: {e}")
+                success = False
+            if reply_queue:
+                reply_queue.put({"cmd": cmd_type, "success": success})
+
+    def handle_polling(self):
+        """Run the next pass when it is due (waiting up to poll_slice for it)."""
+        remaining = self.clock.remaining()
+        if remaining > self.poll_slice:
+            return
+        if remaining > 0:
+            time.sleep(remaining)
+        self.run_pass()
+
+    def run_pass(self):
+        """
+        poll_once() on the clock; False when a command cut the pass short and
+        it should run again right away.  A pass that trips a limit is logged
+        and ends on the clock like a full one, with the trip latched.
+        """
+        self.clock.begin()
+        self.tripped = False
+        try:
+            completed = self.poll_once()
+        except Exception as e:
+            log.error(f"[Acquisition] Polling error: {e}")
+            completed = None  # paced like a full pass, but does not re-arm
+        if completed is False and not self.tripped:
+            self.clock.again()
+            return False
+        if self.tripped:
+            # Limit still exceeded: keep the record going and retry on the clock
+            self.log_sample()
+        elif completed:
+            self.armed = True
+        self.clock.end()
+        return True
+
+    def emergency_stop(self):
+        """Open all relays, stop every MFC, close the relays again after 1 s."""
+        t0 = time.monotonic()
+        self.process_command({"cmd": "relay_open_all"})
+        for ch in self.mfc.channels:
+            self.process_command({"cmd": "set_mfc_flow", "channel": ch, "value": 0.0})
+            self.process_command({"cmd": "on_off_mfc", "channel": ch, "state": False})
+        time.sleep(max(0.0, 1.0 - (time.monotonic() - t0)))
+        self.process_command({"cmd": "relay_close_all"})
+
+    def start_side_reads(self):
+        """
+        Start the power meter and gas analyzer reads of this pass on their
+        port workers.  A read still running from an abandoned pass is kept
+        rather than queueing another one behind it.
+        """
+        if not self.pm_enabled:
+            self.pm_read = None
+        elif self.pm_read is None or self.pm_read.done():
+            self.pm_read = LOOP.submit(self.pm_async.read_power_and_energy())
+            self.pm_deadline = time.monotonic() + PM_READ_LIMIT
+        if not (self.gas_analyzer_enabled and self.gas_analyzer):
+            self.gas_read = None
+        elif self.gas_read is None or self.gas_read.done():
+            self.gas_read = LOOP.submit(self.gas_async.read_gases_stamped())
+            self.gas_deadline = time.monotonic() + GAS_READ_LIMIT
+
+    @staticmethod
+    def side_result(read, deadline):
+        """
+        Result of a side read, waiting no later than its deadline.  A read
+        that is stuck past it raises TimeoutError at once on later passes;
+        it is not restarted until it returns.
+        """
+        try:
+            return read.result(timeout=max(0.0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            if read.done():
+                raise
+            raise TimeoutError("no result from the port worker") from None
+
+    def poll_once(self):
+        """
+        One pass over every enabled device, then log.  Returns False when the
+        pass was cut short by a pending command or an exceeded limit.
+        """
+        # Acquisition time of this sample: the logger and the sample ring use it
+        self.data.last_update = time.time()
+        startup_timer.mark("first poll")
+        self.start_side_reads()
+    # 1. TK4 main controllers (poll one by one, yield to button queue between)
+        for i, addr in enumerate(TK4_ADDRESSES):
+            if self.data.controllers_enabled[i]:
+                try:
+                    self.data.main_temps.set(i, *self.tk4.read_temperature(addr))
+                except Exception as e:
+                    log.error(f"TK4 polling error for addr {addr}: {e}")
+                    self.data.main_temps.invalidate(ST_NO_REPLY, i)
+            else:
+                self.data.main_temps.invalidate(ST_DISABLED, i)
+            if self.service_pending():
+                return False
+
+    # 2. TK4 read-only sensors
+        for i, addr in enumerate(TK4_RO_ADDRESSES):
+            if self.data.readonly_enabled[i]:
+                try:
+                    self.data.ro_temps.set(i, *self.tk4.read_temperature(addr))
+                except Exception as e:
+                    log.error(f"TK4 RO polling error for addr {addr}: {e}")
+                    self.data.ro_temps.invalidate(ST_NO_REPLY, i)
+            else:
+                self.data.ro_temps.invalidate(ST_DISABLED, i)
+            if self.service_pending():
+                return False
+
+    # 3. PSM4 pressures
+        try:
+            self.psm4.read_pressures(self.data.pressures)
+        except Exception as e:
+            log.error(f"PSM4 polling error: {e}")
+            self.data.pressures.invalidate(ST_NO_REPLY)
+        if self.service_pending():
+            return False
+
+        hot = self.data.main_temps.first_above(self.max_temp)
+        if hot is not None:
+            self.limit_exceeded("Max temperature exceeded", code=OVERTEMP, device=f"TK4_{TK4_ADDRESSES[hot]}",
+                                   value=self.data.main_temps[hot], limit=self.max_temp)
+            return False
+
+    # Check for over-pressure
+        high = self.data.pressures.first_above(self.max_press)
+        if high is not None:
+            self.limit_exceeded("Max pressure exceeded", code=OVERPRESSURE, device="PSM4", channel=high + 1,
+                                   value=self.data.pressures[high], limit=self.max_press)
+            return False
+
+    # 4. Power meter (if enabled)
+        if self.pm_read is not None:
+            try:
+                self.data.power, self.data.energy = self.side_result(self.pm_read, self.pm_deadline)
+            except Exception as e:
+                log.error(f"Power meter polling error: {e}")
+                self.data.meters.invalidate(ST_NO_REPLY, DeviceData.POWER)
+                self.data.meters.invalidate(ST_NO_REPLY, DeviceData.ENERGY)
+            if self.service_pending():
+                return False
+
+    # 5. Close Modbus before MFM/MFC
+        try:
+            self.modbus_client.close()
+        except Exception as e:
+            log.error(f"Modbus close error: {e}")
+
+    # 6. MFM
+        if self.mfm_enabled:
+            try:
+                flow = self.mfm.read_flow()
+                if flow is None:
+                    self.data.meters.invalidate(ST_OFFLINE, DeviceData.FLOW)
+                else:
+                    self.data.flow = flow
+            except Exception as e:
+                log.error(f"MFM polling error: {e}")
+                self.data.flow = NAN
+            if self.service_pending():
+                return False
+
+    # 7. MFC
+        if self.mfc_enabled:
+            try:
+                self.mfc.read_all_flows(self.data.mfc_flows)
+            except Exception as e:
+                log.error(f"MFC polling error: {e}")
+                self.data.mfc_flows.invalidate(ST_NO_REPLY)
+            if self.service_pending():
+                return False
+
+    # 8. Reopen Modbus after
+        try:
+            self.reconnect_modbus()
+        except Exception as e:
+            log.error(f"Modbus reconnect error: {e}")
+        if self.service_pending():
+            return False
+
+    # 9. Gas analyzer
+        if self.gas_read is not None:
+            try:
+                vals, read_time = self.side_result(self.gas_read, self.gas_deadline)
+                if vals and isinstance(vals, dict):
+                    for k in self.gas_values:
+                        self.gas_values[k] = vals.get(k)
+                    self.data.gas_time = read_time
+            except Exception as e:
+                log.error(f"Gas analyzer read error: {e}")
+                for k in self.gas_values:
+                    self.gas_values[k] = None
+            if self.service_pending():
+                return False
+
+    # 10. Logging
+        self.log_sample()
+        return True
+
+    def log_sample(self):
+        if self.logger is not None:
+            try:
+                self.logger.log(self.data, self.gas_values)
+            except Exception as e:
+                log.error(f"Logger error: {e}")
+
+    def close(self):
+        # Let side reads finish before their ports are closed under them
+        for read in (self.pm_read, self.gas_read):
+            if read is not None:
+                concurrent.futures.wait([read], timeout=2)
+        if self.pm_enabled:
+            self.pm.close()
+        self.tk4.close()
+        self.gas_analyzer.close()
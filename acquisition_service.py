@@ -0,0 +1,393 @@
+"""
+Acquisition as its own process, with the GUI as a client.
+
+    python acquisition_service.py                   # ports and limits from settings.json
+    python acquisition_service.py --address 127.0.0.1:8765 --shm apgreen_samples
+
+The service owns every device, runs Acquisition.poll_once() at a fixed
+interval, logs, enforces the temperature/pressure limits itself (the
+emergency stop does not wait for a GUI) and publishes every pass through
+sample_bus.  Commands arrive as JSON lines on a localhost TCP socket in
+the Acquisition.process_command format and run between device reads,
+exactly like the GUI's button queue.
+
+control_v1.0.4.py builds on RemoteAcquisition instead of Acquisition when
+settings.json has "ACQUISITION_SERVICE": "127.0.0.1:8765", so a stalled
+GUI event loop no longer stalls sampling, logging or the interlock.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime
+
+from acquisition import Acquisition, Logger, PollClock
+from device_health import HEALTH
+from devices import DeviceData
+from driver_log import get_logger
+from driver_stats import STATS
+from row_codec import GAS_NAMES
+from sample_bus import DEFAULT_NAME, SampleReader, SampleWriter, apply_sample
+from sample_model import ChannelBlock
+import startup_timer
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+COMMAND_TIMEOUT = 10.0
+STALE_AFTER = 5.0  # s without a new sample before a client re-attaches the shared memory
+# Settings a client may change: attributes of the service and lists in its DeviceData
+STATE_KEYS = ("pm_enabled", "mfm_enabled", "mfc_enabled", "gas_analyzer_enabled", "max_temp", "max_press")
+DATA_LISTS = ("controllers_enabled", "readonly_enabled", "controller_states", "setpoints")
+# Driver methods a client may call directly ("call" command)
+SERVICE_CALLS = {
+    "pm": {"connect", "close", "start_integration", "stop_integration", "reset_integration"},
+}
+
+log = get_logger("service")
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _encode(obj):
+    if isinstance(obj, ChannelBlock):
+        return {"names": list(obj.names), "values": list(obj.values), "status": list(obj.status)}
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+
+def _decode(reply):
+    values = reply.get("values")
+    if isinstance(values, dict) and "status" in values:
+        block = ChannelBlock(values["names"])
+        for i, (v, st) in enumerate(zip(values["values"], values["status"])):
+            block.values[i] = v
+            block.status[i] = st
+        reply["values"] = block
+    return reply
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            try:
+                command = json.loads(line)
+            except ValueError:
+                reply = {"error": "invalid JSON"}
+            else:
+                reply_queue = queue.Queue()
+                command["reply_queue"] = reply_queue
+                service.command_queue.put(command)
+                try:
+                    reply = reply_queue.get(timeout=COMMAND_TIMEOUT)
+                except queue.Empty:
+                    reply = {"cmd": command.get("cmd"), "error": "timeout"}
+            self.wfile.write(json.dumps(reply, default=_encode).encode() + b"\n")
+
+
+class _CommandServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class AcquisitionService(Acquisition):
+    def __init__(self, rs485_port, pm_port, gas_port, logger=None,
+                 address=DEFAULT_ADDRESS, shm_name=DEFAULT_NAME, interval=1.0, modbus_transport="pymodbus"):
+        super().__init__(rs485_port, pm_port, gas_port, logger=logger, modbus_transport=modbus_transport)
+        self.poll_interval = interval
+        self.clock = PollClock(interval)
+        self.command_queue = queue.Queue()
+        self.writer = SampleWriter(shm_name)
+        self.server = _CommandServer(parse_address(address), _CommandHandler)
+        self.server.service = self
+        self.trips = 0
+        self.trip_message = ""
+        self.running = False
+
+    # --- Hooks ---
+    def service_pending(self):
+        try:
+            command = self.command_queue.get_nowait()
+        except queue.Empty:
+            return False
+        self.run_command(command)
+        return True
+
+    def on_limit_exceeded(self, description, **event):
+        log.warning(f"[Service] {description}: emergency stop")
+        self.trips += 1
+        self.trip_message = description
+        self.publish()
+        self.emergency_stop()
+
+    # --- Commands ---
+    def run_command(self, command):
+        reply_queue = command.get("reply_queue")
+        try:
+            self.process_command(command)
+        except Exception as e:
+            log.error(f"[Service] Command {command.get('cmd')} failed: {e}")
+            if reply_queue is not None:
+                reply_queue.put({"cmd": command.get("cmd"), "error": str(e)})
+        # Every socket request gets an answer, even from commands that do not reply
+        if reply_queue is not None and reply_queue.empty():
+            reply_queue.put({"cmd": command.get("cmd")})
+
+    def process_command(self, command):
+        cmd_type = command.get("cmd")
+        reply_queue = command.get("reply_queue")
+        if cmd_type == "set_state":
+            for key, value in command.get("values", {}).items():
+                if key in STATE_KEYS:
+                    setattr(self, key, value)
+                elif key in DATA_LISTS and len(value) == len(getattr(self.data, key)):
+                    getattr(self.data, key)[:] = value
+            reply = {"cmd": cmd_type, "success": True}
+        elif cmd_type == "call":
+            device, method = command.get("device"), command.get("method")
+            if method not in SERVICE_CALLS.get(device, ()):
+                reply = {"cmd": cmd_type, "error": f"{device}.{method} is not callable remotely"}
+            else:
+                reply = {"cmd": cmd_type, "result": getattr(getattr(self, device), method)(*command.get("args", []))}
+        elif cmd_type == "emergency_stop":
+            self.emergency_stop()
+            reply = {"cmd": cmd_type, "success": True}
+        elif cmd_type == "status":
+            reply = {"cmd": cmd_type, "trips": self.trips, "message": self.trip_message,
+                     "state": {k: getattr(self, k) for k in STATE_KEYS},
+                     "driver_stats": STATS.snapshot(), "health": HEALTH.snapshot(), "clock": self.clock.stats()}
+        else:
+            super().process_command(command)
+            return
+        if reply_queue is not None:
+            reply_queue.put(reply)
+
+    # --- Main loop ---
+    def publish(self):
+        self.writer.publish(self.data, self.gas_values, self.trips, self.trip_message, self.data.last_update)
+
+    def run(self):
+        self.running = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        log.info(f"[Service] Commands on {self.server.server_address}, samples in '{self.writer.name}'")
+        while self.running:
+            paced = self.run_pass()
+            self.publish()
+            if not paced:
+                continue
+            # Serve commands until the next pass is due
+            while self.running:
+                remaining = self.clock.remaining()
+                if remaining <= 0:
+                    break
+                try:
+                    command = self.command_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                self.run_command(command)
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().close()
+        if self.logger is not None:
+            self.logger.close()
+        self.writer.close()
+
+
+# --- Client side ---
+
+class ServiceClient:
+    """Blocking JSON-lines requests to the service; reconnects on the next request after an error."""
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=COMMAND_TIMEOUT):
+        self.address = parse_address(address)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sock = None
+        self.file = None
+
+    def request(self, command):
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection(self.address, timeout=self.timeout)
+                    self.file = self.sock.makefile("rwb")
+                self.file.write(json.dumps(command).encode() + b"\n")
+                self.file.flush()
+                line = self.file.readline()
+                if not line:
+                    raise ConnectionError("service closed the connection")
+            except OSError as e:
+                self._close()
+                return {"cmd": command.get("cmd"), "error": str(e)}
+        return _decode(json.loads(line))
+
+    def _close(self):
+        if self.sock is not None:
+            try:
+                self.file.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = self.file = None
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+class RemoteDevice:
+    """Stands in for a driver object; method calls become "call" commands (see SERVICE_CALLS)."""
+    def __init__(self, client, name, **attrs):
+        self._client = client
+        self._name = name
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(*args):
+            reply = self._client.request({"cmd": "call", "device": self._name, "method": method, "args": list(args)})
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            return reply.get("result")
+        return call
+
+
+class RemoteAcquisition(Acquisition):
+    """
+    Acquisition interface backed by a running AcquisitionService: samples
+    come from shared memory, commands go over the socket, and local changes
+    to the STATE_KEYS/DATA_LISTS settings are pushed on every poll.
+    """
+    poll_interval = 0.0  # the service sets the pace
+
+    def __init__(self, address=DEFAULT_ADDRESS, shm_name=DEFAULT_NAME):
+        self.data = DeviceData()
+        self.max_temp = 400.0
+        self.max_press = 5.0
+        self.pm_enabled = self.mfm_enabled = self.mfc_enabled = self.gas_analyzer_enabled = True
+        self.gas_values = {k: None for k in GAS_NAMES}
+        self.logger = None
+        self.client = ServiceClient(address)
+        self.pm = RemoteDevice(self.client, "pm")
+        self.mfc = RemoteDevice(self.client, "mfc", channels=[1, 2, 3, 4])
+        self.tk4 = self.psm4 = self.relay = self.mfm = self.gas_analyzer = self.modbus_client = None
+        self.shm_name = shm_name
+        self.reader = None
+        self.last_seq = None
+        self.last_change = time.monotonic()
+        self.trips = None
+        self._pushed = {}
+        self.clock = PollClock(self.poll_interval)
+        self.armed = True
+        self.tripped = False
+
+    def on_interlock(self, description):
+        """The service tripped its interlock and has already run the emergency stop."""
+        log.warning(f"[Remote] Interlock: {description}")
+
+    def push_state(self):
+        state = {k: getattr(self, k) for k in STATE_KEYS}
+        state.update({k: list(getattr(self.data, k)) for k in DATA_LISTS})
+        changed = {k: v for k, v in state.items() if self._pushed.get(k) != v}
+        if changed and "error" not in self.client.request({"cmd": "set_state", "values": changed}):
+            self._pushed.update(changed)
+
+    def poll_once(self):
+        """Push changed settings, then copy the newest sample into self.data; True if there was one."""
+        self.push_state()
+        if self.reader is None:
+            try:
+                self.reader = SampleReader(self.shm_name)
+            except FileNotFoundError:
+                return False
+        sample = self.reader.read()
+        now = time.monotonic()
+        if sample is None or sample.seq == self.last_seq:
+            if now - self.last_change > STALE_AFTER:
+                # The service may have restarted with a new segment
+                self.reader.close()
+                self.reader = None
+                self.last_change = now
+            return False
+        self.last_seq = sample.seq
+        self.last_change = now
+        apply_sample(sample, self.data, self.gas_values)
+        self.data.last_update = sample.time
+        if self.trips is not None and sample.trips > self.trips:
+            self.on_interlock(sample.message)
+        self.trips = sample.trips
+        return True
+
+    def process_command(self, command):
+        reply_queue = command.get("reply_queue")
+        if command.get("cmd") == "read_all":
+            self.handle_polling()
+            return
+        request = {k: v for k, v in command.items() if k != "reply_queue"}
+        reply = self.client.request(request)
+        if "error" in reply:
+            log.error(f"[Remote] {request.get('cmd')}: {reply['error']}")
+        if reply_queue:
+            reply_queue.put(reply)
+
+    def reconnect_modbus(self):
+        pass
+
+    def emergency_stop(self):
+        self.process_command({"cmd": "emergency_stop"})
+
+    def close(self):
+        self.client.close()
+        if self.reader is not None:
+            self.reader.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run device acquisition without a GUI")
+    parser.add_argument("--settings", default="settings.json")
+    parser.add_argument("--address", help=f"command socket host:port (default {DEFAULT_ADDRESS})")
+    parser.add_argument("--shm", help=f"shared memory name (default {DEFAULT_NAME})")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between passes")
+    parser.add_argument("--no-log", action="store_true", help="do not write a process log")
+    parser.add_argument("--channel-times", action="store_true",
+                        help="also log when each value was read (.ptimes next to the log)")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if os.path.exists(args.settings):
+        with open(args.settings) as f:
+            settings = json.load(f)
+    logger = None if args.no_log else Logger(f"process_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.plog",
+                                             channel_times=args.channel_times)
+    service = AcquisitionService(
+        settings.get("RS485_PORT", "COM6"), settings.get("PM_PORT", "COM3"),
+        settings.get("GAS_ANALYZER_PORT", "COM4"), logger=logger,
+        address=args.address or settings.get("ACQUISITION_SERVICE", DEFAULT_ADDRESS),
+        shm_name=args.shm or settings.get("SAMPLE_SHM", DEFAULT_NAME), interval=args.interval,
+        modbus_transport=settings.get("MODBUS_TRANSPORT", "pymodbus"))
+    service.max_temp = settings.get("max_temp", service.max_temp)
+    service.max_press = settings.get("max_press", service.max_press)
+    service.data.setpoints = settings.get("setpoints", service.data.setpoints)
+    STATS.start_dump("driver_stats.jsonl", interval=60.0)
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        STATS.stop_dump("driver_stats.jsonl")
+
+
+if __name__ == "__main__":
+    main()
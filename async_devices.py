@@ -0,0 +1,178 @@
+"""
+asyncio front end for the device drivers.
+
+Every serial port gets one worker thread (PortWorker).  Calls on the same
+port run one after another, as the line requires, while calls on
+different ports run at the same time.  All coroutines run on one shared
+event loop in a background thread (LOOP), so a poll can wait on the power
+meter, the gas analyzer and the RS485 bus together:
+
+    tk4 = AsyncTK4Controller(TK4Controller(client), port=rs485_port)
+    pm = AsyncPowerMeter(power_meter)
+    gas = AsyncGasAnalyzer(analyzer)
+
+    async def poll():
+        return await asyncio.gather(tk4.read_temperature(1), pm.read_power_and_energy(), gas.read_gases())
+
+    temps, (power, energy), gases = LOOP.run(poll())
+
+Sync code can also start a coroutine with LOOP.submit() and collect the
+concurrent.futures.Future later; Acquisition.poll_once does this for the
+power meter and gas analyzer.
+
+The drivers in devices.py stay blocking and remain the synchronous API.
+pyserial has no asyncio transport for Windows COM ports, so the
+coroutines here await the port worker instead of the wire.  Every
+coroutine takes timeout=: on expiry the await is cancelled at once and
+raises TimeoutError.  A call still queued behind others on the port is
+dropped.  A call already on the wire finishes within its serial timeout,
+and its result is thrown away.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeviceLoop:
+    """Event loop in a daemon thread, shared by every async driver; started on first use."""
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="device-loop", daemon=True)
+                self._thread.start()
+                self.loop = loop
+        return self.loop
+
+    def submit(self, coro):
+        """Schedule coro on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop or self._start())
+
+    def run(self, coro, timeout=None):
+        """Run coro on the loop and wait for its result; for sync callers only."""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("LOOP.run() called from the device loop; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if future.done():  # the coroutine's own timeout (the same class since 3.11)
+                raise
+            future.cancel()
+            raise TimeoutError(f"Device call did not finish within {timeout} s") from None
+
+
+LOOP = DeviceLoop()
+
+
+class PortWorker:
+    """One thread per serial port: calls on a port run in order, ports run in parallel."""
+    def __init__(self, port):
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"port-{port}")
+
+    async def call(self, fn, *args, timeout=None, **kwargs):
+        future = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        if timeout is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{getattr(fn, '__name__', fn)} on {self.port} did not finish within {timeout} s") from None
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def port_worker(port):
+    """The worker of a port; drivers sharing a port (the RS485 bus) share it."""
+    with _workers_lock:
+        worker = _workers.get(port)
+        if worker is None:
+            worker = _workers[port] = PortWorker(port)
+        return worker
+
+
+def _coroutine(name):
+    """Coroutine method running the driver method `name` on the port worker."""
+    async def method(self, *args, timeout=None, **kwargs):
+        # Looked up per call, so a method replaced on the driver (bench_poll) is used
+        return await self.worker.call(getattr(self.driver, name), *args, timeout=timeout, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class AsyncDriver:
+    """
+    Coroutine front of a blocking driver.  `port` defaults to the driver's
+    own; the Modbus drivers only hold a client, so pass the RS485 port.
+    The driver itself stays usable for synchronous calls.
+    """
+    def __init__(self, driver, port=None):
+        self.driver = driver
+        self.worker = port_worker(port if port is not None else driver.port)
+
+
+class AsyncTK4Controller(AsyncDriver):
+    read_temperature = _coroutine("read_temperature")
+    set_setpoint = _coroutine("set_setpoint")
+    control_heater = _coroutine("control_heater")
+
+
+class AsyncPSM4Controller(AsyncDriver):
+    read_pressures = _coroutine("read_pressures")
+
+
+class AsyncModbusRelayController(AsyncDriver):
+    send_pulse = _coroutine("send_pulse")
+    open_all = _coroutine("open_all")
+    close_all = _coroutine("close_all")
+
+
+class AsyncMFCController(AsyncDriver):
+    read_flow = _coroutine("read_flow")
+    set_flow = _coroutine("set_flow")
+    on_off = _coroutine("on_off")
+    read_flows = _coroutine("read_flows")
+    read_all_flows = _coroutine("read_all_flows")
+
+
+class AsyncMFMFlowMeter(AsyncDriver):
+    read_flow = _coroutine("read_flow")
+
+
+class AsyncPowerMeter(AsyncDriver):
+    connect = _coroutine("connect")
+    read_power = _coroutine("read_power")
+    read_energy = _coroutine("read_energy")
+    start_integration = _coroutine("start_integration")
+    stop_integration = _coroutine("stop_integration")
+    reset_integration = _coroutine("reset_integration")
+    close = _coroutine("close")
+
+    async def read_power_and_energy(self, timeout=None):
+        """Both readings in one turn on the port."""
+        def read_power_and_energy():
+            return self.driver.read_power(), self.driver.read_energy()
+        return await self.worker.call(read_power_and_energy, timeout=timeout)
+
+
+class AsyncGasAnalyzer(AsyncDriver):
+    connect = _coroutine("connect")
+    read_gases = _coroutine("read_gases")
+    close = _coroutine("close")
+
+    async def read_gases_stamped(self, timeout=None):
+        """(readings, time.monotonic() when their reply was in); readings None on failure."""
+        def read_gases_stamped():
+            return self.driver.read_gases(), self.driver.read_time
+        return await self.worker.call(read_gases_stamped, timeout=timeout)
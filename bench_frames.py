@@ -0,0 +1,116 @@
+"""
+Microbenchmark of the per-transaction CPU cost of building and parsing frames.
+
+    python bench_frames.py
+    python bench_frames.py --number 200000 -o frames.json
+
+Compares the TSM-D frame cache and parse_float (tsmd.py) with the code
+they replaced (f-string frame plus byte-by-byte XOR, decode() plus
+bytes.fromhex()), and the Modbus RTU request/decode path of
+modbus_rtu.RtuClient against an in-memory port, so no serial hardware or
+simulator is involved.  Results are microseconds per call.
+"""
+import argparse
+import json
+import struct
+import timeit
+
+from modbus_rtu import RtuClient, crc16
+from tsmd import mfc_frame, mfc_prefix, mfm_read_frame, parse_float
+
+
+# --- The code tsmd.py replaced, kept here as the baseline ---
+
+def legacy_checksum(data):
+    cs = 0
+    for b in data.encode():
+        cs ^= b
+    return f"{cs:02X}"
+
+
+def legacy_mfc_frame(channel, cmd, addr, value=""):
+    frame_wo_cs = f":{channel:02d}{cmd}{addr}{value}"
+    return f"{frame_wo_cs}{legacy_checksum(frame_wo_cs)}\r".encode()
+
+
+def legacy_mfm_frame(device_id):
+    frame_wo_cs = f":{device_id:02X}0300"
+    return f"{frame_wo_cs}{legacy_checksum(frame_wo_cs)}\r".encode()
+
+
+def legacy_parse_flow(channel, resp):
+    if not resp.startswith(f":{channel:02d}".encode()) or len(resp) < 16:
+        return None
+    try:
+        return struct.unpack('>f', bytes.fromhex(resp[7:15].decode()))[0]
+    except ValueError:
+        return None
+
+
+class MemoryPort:
+    """Answers every write with a fixed reply; stands in for serial.Serial."""
+    timeout = 0.2
+    is_open = True
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.pending = b""
+
+    def write(self, data):
+        self.pending = self.reply
+
+    def read(self, n):
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
+
+
+def _tk4_reply(unit=1, pv=2500, decimal=1):
+    body = bytes([unit, 4, 4]) + struct.pack(">HH", pv, decimal)
+    return body + struct.pack("<H", crc16(body))
+
+
+def cases():
+    flow_reply = b":01030742C80000" + b"5A\r"  # 100.0
+    client = RtuClient("memory")
+    client.socket = MemoryPort(_tk4_reply())
+    return {
+        "tsmd.mfc_read_frame": (lambda: legacy_mfc_frame(2, "03", "0038"), lambda: mfc_frame(2, "03", "0038")),
+        "tsmd.mfm_read_frame": (lambda: legacy_mfm_frame(1), lambda: mfm_read_frame(1)),
+        "tsmd.parse_flow": (lambda: legacy_parse_flow(1, flow_reply), lambda: parse_float(flow_reply, mfc_prefix(1))),
+        "rtu.read_input_registers": (None, lambda: client.read_input_registers(0x03E8, count=2, device_id=1).registers),
+    }
+
+
+def run(number):
+    results = {}
+    for name, (old, new) in cases().items():
+        row = {}
+        for label, fn in (("before", old), ("after", new)):
+            if fn is not None:
+                best = min(timeit.repeat(fn, number=number, repeat=5))
+                row[label] = round(best / number * 1e6, 3)
+        results[name] = row
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frame build/parse microbenchmark")
+    parser.add_argument("--number", type=int, default=100000, help="calls per timing run")
+    parser.add_argument("-o", "--output", help="write the result as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.number)
+    for name, row in results.items():
+        before, after = row.get("before"), row.get("after")
+        line = f"  {name:<28} {after:8.3f} us"
+        if before is not None:
+            line += f"   (was {before:.3f} us, {before / after:.1f}x)"
+        print(line)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[Bench] Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Poll-cycle benchmark against the device simulators (no GUI needed).
+
+    python bench_poll.py --cycles 20 --latency 0.01 -o bench.json
+    python bench_poll.py --profile control1 --compare bench.json
+
+Profiles:
+    v1        Acquisition.poll_once(), i.e. one handle_polling pass of
+              control_v1.0.4.py without the 1 s pause
+    control1  the device reads of ControlGUI.update_all_devices in the same
+              order, with the worker-queue hops replaced by direct calls
+
+Reports cycle time percentiles, per-transaction latency and failures for
+every driver call, serial port open/close counts per port and the logger
+cost, plus the per-transaction driver_stats snapshot (bytes, timeouts),
+and writes everything as JSON for regression comparison.  On a rig
+without --offline devices every device answers, so a device that fails
+every call means a broken driver: the result is marked invalid and the
+exit status is 1.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+
+import serial
+
+from acquisition import Acquisition, HourlyLogger, Logger
+from device_simulator import SimulatedRig, _parse_offline
+from devices import DeviceManager
+from device_health import HEALTH
+from driver_stats import STATS
+from sample_model import ChannelBlock, NAN
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples_ms):
+    values = sorted(samples_ms)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def _failed(result):
+    if result is None:
+        return True
+    if isinstance(result, float):
+        return result != result
+    if isinstance(result, ChannelBlock):
+        return not result.any_ok()
+    if isinstance(result, tuple) and len(result) in (2, 3) and isinstance(result[1], int):
+        return result[1] != 0
+    return False
+
+
+class Recorder:
+    """Per-call timings of wrapped driver methods."""
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, name, seconds, failed=False):
+        self.samples.setdefault(name, []).append(seconds * 1000.0)
+        if failed:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def wrap(self, obj, method, name, check=True):
+        """
+        Replace obj.method by a timed version (instance attribute only).
+        With check, a None/NaN/not-OK result counts as an error.
+        """
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                result = original(*args, **kwargs)
+            except Exception:
+                self.add(name, time.perf_counter() - t0, True)
+                raise
+            self.add(name, time.perf_counter() - t0, check and _failed(result))
+            return result
+        setattr(obj, method, timed)
+
+    def report(self):
+        out = {}
+        for name, samples in sorted(self.samples.items()):
+            out[name] = summarize(samples)
+            out[name]["errors"] = self.errors.get(name, 0)
+        return out
+
+
+class PortCounter:
+    """Counts serial.Serial open()/close() per port while active (pymodbus uses the same class)."""
+    def __init__(self):
+        self.opened = {}
+        self.closed = {}
+
+    def __enter__(self):
+        self._open, self._close = serial.Serial.open, serial.Serial.close
+        counter = self
+
+        def open_(port, *args, **kwargs):
+            counter.opened[port.port] = counter.opened.get(port.port, 0) + 1
+            return counter._open(port, *args, **kwargs)
+
+        def close_(port, *args, **kwargs):
+            if port.is_open:
+                counter.closed[port.port] = counter.closed.get(port.port, 0) + 1
+            return counter._close(port, *args, **kwargs)
+        serial.Serial.open, serial.Serial.close = open_, close_
+        return self
+
+    def __exit__(self, *exc):
+        serial.Serial.open, serial.Serial.close = self._open, self._close
+
+    def report(self, names):
+        ports = set(self.opened) | set(self.closed)
+        return {names.get(p, p): {"open": self.opened.get(p, 0), "close": self.closed.get(p, 0)}
+                for p in sorted(ports)}
+
+
+# --- Profiles ---
+
+def run_v1(rig, cycles, log_dir, rec, transport="pymodbus"):
+    logger = Logger(os.path.join(log_dir, "process_log_bench_v1.plog"))
+    acq = Acquisition(rig.ports["RS485_PORT"], rig.ports["PM_PORT"], rig.ports["GAS_ANALYZER_PORT"], logger=logger,
+                      modbus_transport=transport)
+    for obj, method, name, *check in [
+        (acq.tk4, "read_temperature", "tk4.read_temperature"),
+        (acq.psm4, "read_pressures", "psm4.read_pressures"),
+        (acq.pm, "read_power", "pm.read_power"),
+        (acq.pm, "read_energy", "pm.read_energy"),
+        (acq.mfm, "read_flow", "mfm.read_flow"),
+        (acq.mfc, "read_flow", "mfc.read_flow"),
+        (acq.gas_analyzer, "read_gases", "gas.read_gases"),
+        (acq.modbus_client, "connect", "modbus.connect", False),
+        (acq.modbus_client, "close", "modbus.close", False),
+        (logger, "log", "logger.log", False),
+    ]:
+        rec.wrap(obj, method, name, *check)
+    try:
+        return _run_cycles(cycles, acq.poll_once), logger
+    finally:
+        acq.close()
+        logger.close()
+
+
+def control1_cycle(manager, logger, scaling=1.0):
+    """The reads of ControlGUI.update_all_devices, in order, without the worker queue."""
+    temperatures = ChannelBlock([1, 2, 3, 4, 5, 6])
+    for i, addr in enumerate(temperatures.names):
+        temperatures.set(i, *manager.read_temperature_stamped(addr))
+    pressures = ChannelBlock(4)
+    manager.read_pressures(pressures)
+
+    def ascii_transaction(fn):
+        # button_command_handler closes Modbus around every ASCII command
+        if manager.client.is_socket_open():
+            manager.client.close()
+        try:
+            return fn()
+        finally:
+            if not manager.client.is_socket_open():
+                manager.client.connect()
+                time.sleep(0.1)
+            manager.psm4.client = manager.client
+
+    mfc_flows = ChannelBlock(["CH4", "O2", "N2", "H2"])
+    mfc_flows.copy_from(ascii_transaction(manager.read_all_mfc_flows))
+    mfm_flow = ascii_transaction(manager.read_mfm_flow)
+    power, energy = manager.read_power_meter()
+    gas_values = manager.read_gas_analyzer()
+    data = {
+        'temps': temperatures,
+        'pressures': pressures,
+        'power': NAN if power is None else power * scaling,
+        'energy': NAN if energy is None else energy * scaling,
+        'mfm_flow': NAN if mfm_flow is None else mfm_flow,
+        'mfc_flows': mfc_flows,
+    }
+    logger.log(data, gas_values)
+    return True
+
+
+def run_control1(rig, cycles, log_dir, rec, transport="pymodbus"):
+    logger = HourlyLogger(log_dir)
+    manager = DeviceManager(dict(rig.ports, MODBUS_TRANSPORT=transport))
+    for obj, method, name, *check in [
+        (manager, "read_temperature_stamped", "tk4.read_temperature"),
+        (manager, "read_pressures", "psm4.read_pressures"),
+        (manager, "read_power_meter", "pm.read_power_meter"),
+        (manager.mfm, "read_flow", "mfm.read_flow"),
+        (manager.mfc, "read_flow", "mfc.read_flow"),
+        (manager, "read_gas_analyzer", "gas.read_gases"),
+        (manager.client, "connect", "modbus.connect", False),
+        (manager.client, "close", "modbus.close", False),
+        (logger, "log", "logger.log", False),
+    ]:
+        rec.wrap(obj, method, name, *check)
+    try:
+        return _run_cycles(cycles, lambda: control1_cycle(manager, logger)), logger
+    finally:
+        manager.client.close()
+        manager.gas_analyzer.close()
+        logger.close()
+
+
+def _run_cycles(cycles, poll):
+    times, completed = [], 0
+    for _ in range(cycles):
+        t0 = time.perf_counter()
+        completed += bool(poll())
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return times, completed
+
+
+PROFILES = {"v1": run_v1, "control1": run_control1}
+
+
+def run_benchmark(profile="v1", cycles=20, baudrate=9600, latency=0.0, jitter=0.0, offline=(), log_dir=None,
+                  transport="pymodbus"):
+    """Run one profile against a fresh SimulatedRig and return the result dict."""
+    rec = Recorder()
+    STATS.reset()
+    HEALTH.reset()
+    with tempfile.TemporaryDirectory() as tmp, SimulatedRig(baudrate, latency, jitter, offline) as rig:
+        counter = PortCounter()
+        with counter:
+            (times, completed), logger = PROFILES[profile](rig, cycles, log_dir or tmp, rec, transport)
+        names = {port: key for key, port in rig.ports.items()}
+        devices, driver_stats = rec.report(), STATS.snapshot()
+        failing = failing_devices(devices, driver_stats)
+        return {
+            "profile": profile,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "config": {"cycles": cycles, "baudrate": baudrate, "latency": latency, "jitter": jitter,
+                       "offline": sorted(map(str, offline)), "transport": transport},
+            "completed": completed,
+            "failing": failing,
+            "valid": bool(offline) or not failing,
+            "cycle_ms": summarize(times),
+            "devices": devices,
+            "ports": counter.report(names),
+            "logger": {"encode_us": round(logger.encoder.mean_encode_us(), 2),
+                       "rows": logger.encoder.rows},
+            "simulator": rig.stats(),
+            "driver_stats": driver_stats,
+        }
+
+
+def failing_devices(devices, driver_stats):
+    """Timed calls and bus devices that failed every time."""
+    failing = [name for name, s in devices.items() if s.get("count") and s["errors"] == s["count"]]
+    failing += [f"bus {name}" for name, d in driver_stats["devices"].items()
+                if d["calls"] and d["errors"] == d["calls"]]
+    return failing
+
+
+def compare(result, baseline):
+    """Print p50/p99 changes against a previous result."""
+    def row(name, new, old):
+        if not old or not new or not old.get("count") or not new.get("count"):
+            return
+        cells = []
+        for key in ("p50", "p99"):
+            delta = (new[key] - old[key]) / old[key] * 100.0 if old[key] else 0.0
+            cells.append(f"{key} {old[key]:9.2f} -> {new[key]:9.2f} ms ({delta:+6.1f}%)")
+        print(f"  {name:24s} " + "  ".join(cells))
+    print(f"[Bench] Compared with {baseline.get('timestamp')} ({baseline.get('profile')})")
+    if not baseline.get("valid", True):
+        print("[Bench] WARNING: the baseline run was marked invalid")
+    row("cycle", result["cycle_ms"], baseline.get("cycle_ms"))
+    for name, stats in result["devices"].items():
+        row(name, stats, baseline.get("devices", {}).get(name))
+
+
+def print_result(result):
+    c = result["cycle_ms"]
+    print(f"[Bench] {result['profile']}: {result['completed']}/{result['config']['cycles']} cycles completed")
+    print(f"  cycle  mean {c['mean']:.1f} ms  p50 {c['p50']:.1f}  p90 {c['p90']:.1f}  p99 {c['p99']:.1f}  max {c['max']:.1f}")
+    for name, s in result["devices"].items():
+        print(f"  {name:24s} n={s['count']:<5d} mean {s['mean']:8.2f} ms  p99 {s['p99']:8.2f}  errors {s['errors']}")
+    for name, p in result["ports"].items():
+        print(f"  port {name:19s} open {p['open']:<5d} close {p['close']}")
+    print(f"  logger encode {result['logger']['encode_us']} us/row")
+    for name, d in result["driver_stats"]["devices"].items():
+        print(f"  bus {name:20s} {d['share'] * 100:5.1f}% of bus time  calls {d['calls']:<5d} "
+              f"errors {d['errors']:<4d} timeouts {d['timeouts']}")
+    if not result["valid"]:
+        print(f"[Bench] WARNING: failed every call on a rig with all devices online: {', '.join(result['failing'])}")
+        print("[Bench] WARNING: these numbers do not measure a working poll; see the driver log for the cause")
+    elif result["failing"]:
+        print(f"[Bench] Failed every call (--offline): {', '.join(result['failing'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the acquisition cycle against simulated devices")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="v1")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--offline", nargs="*", default=[], help="devices that never answer: 1-8, MFC1-4, MFM, PM, GAS")
+    parser.add_argument("--transport", choices=["pymodbus", "native"], default="pymodbus",
+                        help="Modbus client (native: modbus_rtu.RtuClient)")
+    parser.add_argument("-o", "--output", help="write the result as JSON")
+    parser.add_argument("--compare", metavar="JSON", help="previous result to compare with")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.profile, args.cycles, args.baud, args.latency, args.jitter,
+                           _parse_offline(args.offline), transport=args.transport)
+    print_result(result)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[Bench] Saved {args.output}")
+    if not result["valid"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
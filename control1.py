@@ -1,27 +1,26 @@
+import startup_timer
 import wx
 import threading
 import queue
-import json
 import os
 import datetime
-import matplotlib
-matplotlib.use('WXAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
-from matplotlib.figure import Figure
-from pymodbus.client import ModbusSerialClient
 #import sys
 import winsound
 import serial
 import gc
-import struct
 import time
 wx.Log.SetActiveTarget(wx.LogStderr())
-import logging
-import openpyxl
-from openpyxl.utils import get_column_letter
-import glob
-import pandas as pd
+from log_catalog import LogCatalog, TIMESTAMP_FORMAT, parse_timestamp
+from plot_export import PlotExporter
+from sample_model import ChannelBlock, NAN, ST_OK, ST_NO_REPLY
+from devices import DeviceManager, MODBUS_REQUEST_LEN, MODBUS_WRITE_REPLY_LEN, full_modbus_timeout, record_modbus_reply
+from device_health import HEALTH
+from driver_log import get_logger
+from driver_stats import STATS, ROW_HEADERS
+from settings_store import SettingsStore
+from event_journal import EMERGENCY_RESET, EMERGENCY_STOP, OVERPRESSURE, OVERTEMP, EventJournal
+from selftest import DISCOVERY_TIMEOUT, REPLY_WAIT, SelfTest, load_cache, save_cache
+from acquisition import HourlyLogger, PollClock
 import serial.tools.list_ports
 
 
@@ -35,9 +34,11 @@ os.makedirs(data_log_dir, exist_ok=True)
 # Set log filename in that folder
 log_filename = os.path.join(
     data_log_dir,
-    f"process_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    f"process_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.plog"
 )
 
+log = get_logger("control")
+
 def get_data_type(col):
     name = col.lower()
     if any(x in name for x in ["temp", "heater"]):
@@ -55,22 +56,45 @@ def get_data_type(col):
 
 
 class PlotDialog(wx.Dialog):
-    def __init__(self, parent, log_file, data_log_dir):
+    def __init__(self, parent, catalog, data_log_dir, start=None, end=None):
         super().__init__(parent, title="Data Plot", size=(1200, 800))
         self.SetBackgroundColour(wx.Colour(0, 0, 0))  # All-black window
 
-        self.log_file = log_file
+        self.catalog = catalog
         self.data_log_dir = data_log_dir
 
         panel = wx.Panel(self)
         panel.SetBackgroundColour(wx.Colour(0, 0, 0))
         vbox = wx.BoxSizer(wx.VERTICAL)
 
-        # Load data
-        self.df = pd.read_excel(self.log_file)
-        self.df['Timestamp'] = pd.to_datetime(self.df['Timestamp'])
+        # Load data (default: the newest segment, as before)
+        if start is None and end is None:
+            latest = self.catalog.latest()
+            start, end = latest.start, latest.end
+        self.df = self.catalog.load_window(start, end)
         self.available = [c for c in self.df.columns if c != "Timestamp"]
 
+        # --- Time window selection ---
+        label_font = wx.Font(12, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        window_box = wx.BoxSizer(wx.HORIZONTAL)
+        first, last = self.catalog.span()
+        for text, attr, value in [("From:", "start_input", start), ("To:", "end_input", end)]:
+            lbl = wx.StaticText(panel, label=text)
+            lbl.SetFont(label_font)
+            lbl.SetForegroundColour(wx.Colour(255, 255, 255))
+            window_box.Add(lbl, flag=wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, border=5)
+            ctrl = wx.TextCtrl(panel, value=value.strftime(TIMESTAMP_FORMAT) if value else "", size=(180, -1))
+            setattr(self, attr, ctrl)
+            window_box.Add(ctrl, flag=wx.RIGHT, border=15)
+        load_btn = wx.Button(panel, label="Load")
+        load_btn.Bind(wx.EVT_BUTTON, self.on_load_window)
+        window_box.Add(load_btn, flag=wx.RIGHT, border=15)
+        span_lbl = wx.StaticText(panel, label=f"Logged: {first:%Y-%m-%d %H:%M} .. {last:%Y-%m-%d %H:%M}")
+        span_lbl.SetFont(label_font)
+        span_lbl.SetForegroundColour(wx.Colour(200, 200, 200))
+        window_box.Add(span_lbl, flag=wx.ALIGN_CENTER_VERTICAL)
+        vbox.Add(window_box, flag=wx.ALL, border=10)
+
         # --- Checkbox panel for series selection ---
         self.checkboxes = {}
         checkbox_panel = wx.Panel(panel)
@@ -89,6 +113,11 @@ class PlotDialog(wx.Dialog):
         vbox.Add(checkbox_panel, flag=wx.EXPAND | wx.ALL, border=10)
 
         # --- Matplotlib Figure ---
+        # Imported here, on the first plot, so it does not delay polling at startup
+        import matplotlib
+        matplotlib.use('WXAgg')
+        from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
+        from matplotlib.figure import Figure
         matplotlib.rcParams['axes.edgecolor'] = 'white'
         matplotlib.rcParams['axes.labelcolor'] = 'white'
         matplotlib.rcParams['xtick.color'] = 'white'
@@ -122,8 +151,25 @@ class PlotDialog(wx.Dialog):
         self.selected = set(col for col, cb in self.checkboxes.items() if cb.GetValue())
         self.plot_data()
 
+    def on_load_window(self, event):
+        bounds = []
+        for ctrl in (self.start_input, self.end_input):
+            text = ctrl.GetValue().strip()
+            value = parse_timestamp(text) if text else None
+            if text and value is None:
+                wx.MessageBox("Use the format YYYY-MM-DD HH:MM:SS.", "Input Error", wx.ICON_WARNING)
+                return
+            bounds.append(value)
+        start, end = bounds
+        self.catalog.refresh()
+        self.df = self.catalog.load_window(start, end)
+        self.plot_data()
+
     def plot_data(self):
         self.figure.clear()
+        if self.df.empty:
+            self.canvas.draw()
+            return
         t0 = self.df['Timestamp'].iloc[0]
         x = (self.df['Timestamp'] - t0).dt.total_seconds()
 
@@ -147,13 +193,14 @@ class PlotDialog(wx.Dialog):
             ax3.spines['right'].set_position(('axes', 1.15))
             ax3.spines['right'].set_visible(True)
 
-        color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        import matplotlib
+        color_cycle = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
         lines = []
         labels = []
 
         # Temperature
         for i, col in enumerate(groups["Temperature"]):
-            y = pd.to_numeric(self.df[col], errors='coerce')
+            y = self.df[col]
             l, = ax1.plot(x, y, label=col, linewidth=2)
             lines.append(l)
             labels.append(col)
@@ -163,7 +210,7 @@ class PlotDialog(wx.Dialog):
         # Pressure
         if groups["Pressure"]:
             for i, col in enumerate(groups["Pressure"]):
-                y = pd.to_numeric(self.df[col], errors='coerce')
+                y = self.df[col]
                 l, = ax2.plot(x, y, label=col, linewidth=2)
                 lines.append(l)
                 labels.append(col)
@@ -174,7 +221,7 @@ class PlotDialog(wx.Dialog):
         if groups["Other"]:
             target_ax = ax3 if ax3 else (ax2 if ax2 else ax1)
             for i, col in enumerate(groups["Other"]):
-                y = pd.to_numeric(self.df[col], errors='coerce')
+                y = self.df[col]
                 l, = target_ax.plot(x, y, label=col, linewidth=2)
                 lines.append(l)
                 labels.append(col)
@@ -195,166 +242,83 @@ class PlotDialog(wx.Dialog):
         self.figure.tight_layout()
         self.canvas.draw()
 
-    def save_full_plot(self):
-        # Use a dark background for the saved plot
-        plt.style.use('dark_background')
-        matplotlib.rcParams['axes.edgecolor'] = 'white'
-        matplotlib.rcParams['axes.labelcolor'] = 'white'
-        matplotlib.rcParams['xtick.color'] = 'white'
-        matplotlib.rcParams['ytick.color'] = 'white'
-        matplotlib.rcParams['text.color'] = 'white'
-        matplotlib.rcParams['figure.facecolor'] = 'black'
-        matplotlib.rcParams['axes.facecolor'] = 'black'
-        matplotlib.rcParams['savefig.facecolor'] = 'black'
-
-        df = self.df
-        t0 = df['Timestamp'].iloc[0]
-        x = (df['Timestamp'] - t0).dt.total_seconds()
-
-    # Group selected columns by type
-        groups = {"Temperature": [], "Pressure": [], "Other": []}
-        for col in self.selected:
-            dtype = get_data_type(col)
-            if dtype == "Temperature":
-                groups["Temperature"].append(col)
-            elif dtype == "Pressure":
-                groups["Pressure"].append(col)
-            else:
-                groups["Other"].append(col)
-
-        fig, ax1 = plt.subplots(figsize=(12, 5))
-        ax2 = ax1.twinx() if groups["Pressure"] or groups["Other"] else None
-        ax3 = None
-        if groups["Pressure"] and groups["Other"]:
-            ax3 = ax1.twinx()
-            ax3.spines['right'].set_position(('axes', 1.15))
-            ax3.spines['right'].set_visible(True)
-
-        color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
-        lines = []
-        labels = []
-
-    # Temperature
-        for i, col in enumerate(groups["Temperature"]):
-            y = pd.to_numeric(df[col], errors='coerce')
-            l, = ax1.plot(x, y, label=col, linewidth=2)
-            lines.append(l)
-            labels.append(col)
-        ax1.set_ylabel("Temperature (°C)", color="white")
-        ax1.tick_params(axis='y', labelcolor="white")
-
-    # Pressure
-        if groups["Pressure"]:
-            for i, col in enumerate(groups["Pressure"]):
-                y = pd.to_numeric(df[col], errors='coerce')
-                l, = ax2.plot(x, y, label=col, linewidth=2)
-                lines.append(l)
-                labels.append(col)
-            ax2.set_ylabel("Pressure (bar)", color="white")
-            ax2.tick_params(axis='y', labelcolor="white")
-
-    # Other (Flow, Power, Gas, etc.)
-        if groups["Other"]:
-            target_ax = ax3 if ax3 else (ax2 if ax2 else ax1)
-            for i, col in enumerate(groups["Other"]):
-                y = pd.to_numeric(df[col], errors='coerce')
-                l, = target_ax.plot(x, y, label=col, linewidth=2)
-                lines.append(l)
-                labels.append(col)
-            if ax3:
-                ax3.set_ylabel("Other", color="white")
-                ax3.tick_params(axis='y', labelcolor="white")
-            elif ax2 and not groups["Pressure"]:
-                ax2.set_ylabel("Other", color="white")
-                ax2.tick_params(axis='y', labelcolor="white")
-
-        ax1.set_xlabel("Time (s from start)", color="white")
-        ax1.tick_params(axis='x', labelcolor="white")
-        if lines:
-            legend = ax1.legend(lines, labels, loc='upper left', fontsize=12)
-            if legend:
-                for text in legend.get_texts():
-                    text.set_color("white")
-        fig.tight_layout()
-
+    def on_save_plot(self, event):
+        columns = [c for c in self.available if c in self.selected]
+        if not columns or self.df.empty:
+            wx.MessageBox("Select at least one series to save.", "Save Plot", wx.ICON_WARNING)
+            return
         now = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = os.path.join(self.data_log_dir, f"plot_{now}.png")
-        plt.savefig(filename, bbox_inches='tight')
-        plt.close(fig)
-        return filename
-
-
-    def on_save_plot(self, event):
-        filename = self.save_full_plot()
-        wx.MessageBox(f"Plot saved to {filename}", "Save Plot", wx.ICON_INFORMATION)
-
-
-class Logger:
-    def __init__(self):
-        self.columns = [
-            "Timestamp", "Heater", "Preheater", "Reactor",
-            "Temp1", "Temp2", "Temp3",
-            "Pressure1", "Pressure2", "Pressure3",
-            "Power", "Energy", "MFM_Flow",
-            "MFC_CH4", "MFC_O2", "MFC_N2", "MFC_H2",
-            "CO", "CO2", "CH4", "CnHm", "H2", "O2", "C2H2", "C2H4", "HHV", "N2"
-        ]
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        self.data_log_dir = os.path.join(script_dir, "Data log")
-        os.makedirs(self.data_log_dir, exist_ok=True)
-
-    def get_filename(self):
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H')
-        return os.path.join(self.data_log_dir, f"process_log_{timestamp}.xlsx")
-
-    def log(self, data, gas_values=None):
-        filename = self.get_filename()
-
-        # Create file and header if new
-        if not os.path.exists(filename):
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(self.columns)
-            ws.column_dimensions['A'].width = 18
-            for i, col in enumerate(self.columns[1:], 2):
-                ws.column_dimensions[get_column_letter(i)].width = 12
-            wb.save(filename)
-
-        row = [
-            datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            data.get(1), data.get(2), data.get(3),
-            data.get(4), data.get(5), data.get(6),
-            *(data.get('pressures', [None, None, None])),
-            data.get('power'), data.get('energy'), data.get('mfm_flow'),
-            *(data.get('mfc_flows', [None, None, None, None])),
-            *(gas_values.get(gas) if gas_values else None for gas in ["CO", "CO2", "CH4", "CnHm", "H2", "O2", "C2H2", "C2H4", "HHV", "N2"])
-        ]
-
-        try:
-            wb = openpyxl.load_workbook(filename)
-            ws = wb.active
-            ws.append(row)
-            wb.save(filename)
-        except Exception as e:
-            print(f"[Logger] Logging error: {e}")
-
-
-
-
+        frame = self.GetParent()
+        frame.plot_exporter.export_frame(
+            self.df, columns, [get_data_type(c) for c in columns], filename, dark=True,
+            on_done=lambda fn, err: wx.CallAfter(frame.on_plot_exported, fn, err))
+        frame.status_bar_label.SetLabel(f"Saving plot to {filename}...")
+
+
+class DriverStatsDialog(wx.Dialog):
+    """Live per-device/command latency table from driver_stats.STATS."""
+    def __init__(self, parent, dump_path):
+        super().__init__(parent, title="Driver Stats", size=(1000, 500),
+                         style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.dump_path = dump_path
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+        self.list = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for i, title in enumerate(ROW_HEADERS):
+            self.list.InsertColumn(i, title, width=140 if i < 2 else 80)
+        vbox.Add(self.list, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
 
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        for label, handler in [("Reset", self.on_reset), ("Save", self.on_save), ("Close", lambda evt: self.Close())]:
+            btn = wx.Button(panel, label=label, size=(100, 35))
+            btn.Bind(wx.EVT_BUTTON, handler)
+            hbox.Add(btn, flag=wx.LEFT, border=10)
+        vbox.Add(hbox, flag=wx.ALIGN_RIGHT | wx.ALL, border=10)
+        panel.SetSizer(vbox)
 
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda evt: self.refresh(), self.timer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.refresh()
+        self.timer.Start(1000)
+
+    def refresh(self):
+        rows = STATS.rows()
+        self.list.Freeze()
+        self.list.DeleteAllItems()
+        for row in rows:
+            index = self.list.InsertItem(self.list.GetItemCount(), row[0])
+            for col, text in enumerate(row[1:], 1):
+                self.list.SetItem(index, col, text)
+        self.list.Thaw()
+
+    def on_reset(self, event):
+        STATS.reset()
+        self.refresh()
+
+    def on_save(self, event):
+        STATS.dump(self.dump_path)
+        self.GetParent().status_bar_label.SetLabel(f"Driver stats appended to {self.dump_path}")
 
-abnormal_logger = logging.getLogger("abnormal")
-abnormal_logger.setLevel(logging.INFO)
-abnormal_handler = logging.FileHandler("abnormal_events.log")
-abnormal_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
-abnormal_logger.handlers = [abnormal_handler]  # Remove all other handlers
+    def on_close(self, event):
+        self.timer.Stop()
+        self.Destroy()
 
-def log_abnormal_event(description):
-    abnormal_logger.info(description)
 
 # Use an absolute path for the settings file
 SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "settings.json")
+POLL_PERIOD = 2.0  # s from the start of one device update to the next
+# Oldest cached TK4/PSM4 reading each caller accepts (s); the self-test always reads
+EMERGENCY_MAX_AGE = 0.5  # one emergency check period
+DISPLAY_MAX_AGE = 1.0
+SELFTEST_CACHE_FILE = os.path.join(os.path.dirname(__file__), "selftest_cache.json")
+# Self-test entries -> device_health names, where they differ
+SELFTEST_DEVICES = {
+    "MFC": ["MFC1", "MFC2", "MFC3", "MFC4"],
+    "PowerMeter": ["PM"],
+    "GasAnalyzer": ["GAS"],
+}
 
 # Default settings for the JSON file
 DEFAULT_SETTINGS = {
@@ -368,18 +332,14 @@ DEFAULT_SETTINGS = {
     },
     "heater_2": {
         "coil_sv": "--",
-        "coil_pv": "--",
-        "reactor_temp": "--",
         "coil_max_temp": "--",
         "reactor_max_temp": "--",
         "status": "OFF"
     }
 }
 
-# Ensure the JSON file exists and create it with default values if missing
-if not os.path.exists(SETTINGS_FILE):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(DEFAULT_SETTINGS, f, indent=4)
+# Runtime readings older versions kept in settings.json; never written back
+LIVE_SETTINGS = [("heater_1", "pv"), ("heater_2", "coil_pv"), ("heater_2", "reactor_temp")]
 
 
     
@@ -458,11 +418,15 @@ class ModbusRelayController:
                     self.client.connect()
                     time.sleep(0.1)  # Give the OS/driver a moment
                 except Exception as e:
-                    print(f"Relay: failed to connect before command: {e}")
+                    log.error(f"Relay: failed to connect before command: {e}")
             try:
-                self.client.write_register(channel, value, slave=self.slave_id)
+                with STATS.transaction("RELAY", f"relay_{command}") as t:
+                    full_modbus_timeout(self.client)
+                    t.sent(MODBUS_REQUEST_LEN)
+                    record_modbus_reply(t, self.client.write_register(channel, value, device_id=self.slave_id),
+                                        MODBUS_WRITE_REPLY_LEN)
             except Exception as e:
-                print(f"Relay: write_register error: {e}")
+                log.error(f"Relay: write_register error: {e}")
 
 
     def send_pulse(self, channel, duration=1.0):
@@ -471,7 +435,7 @@ class ModbusRelayController:
             time.sleep(duration)
             self._write_channel(channel - 1, 'off')
         except Exception as e:
-            print(f"Relay pulse error on channel {channel}: {e}")
+            log.error(f"Relay pulse error on channel {channel}: {e}")
 
 
     def open_all(self):
@@ -479,14 +443,22 @@ class ModbusRelayController:
         with self.lock:
             if not self.client.is_socket_open():
                 self.client.connect()
-            self.client.write_register(0x0000, 0x0700, slave=self.slave_id)
+            with STATS.transaction("RELAY", "open_all") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                record_modbus_reply(t, self.client.write_register(0x0000, 0x0700, device_id=self.slave_id),
+                                    MODBUS_WRITE_REPLY_LEN)
 
     def close_all(self):
         """Close (deactivate) all relays using the group command."""
         with self.lock:
             if not self.client.is_socket_open():
                 self.client.connect()
-            self.client.write_register(0x0000, 0x0800, slave=self.slave_id)
+            with STATS.transaction("RELAY", "close_all") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                record_modbus_reply(t, self.client.write_register(0x0000, 0x0800, device_id=self.slave_id),
+                                    MODBUS_WRITE_REPLY_LEN)
 
 
 
@@ -872,107 +844,6 @@ class PressureDialog(wx.Dialog):
         """Close the dialog without saving."""
         self.EndModal(wx.ID_CANCEL)
     
-class GasAnalyzer:
-    def __init__(self, port="COM4"):
-        self.port = port
-        self.ser = None
-
-    def connect(self):
-        try:
-            if self.ser is None or not self.ser.is_open:
-                print(f"Connecting to gas analyzer on port {self.port}")
-                self.ser = serial.Serial(self.port, baudrate=9600, timeout=1)
-            return True
-        except Exception as e:
-            print(f"Gas analyzer connection error: {e}")
-            self.ser = None
-            return False
-
-    def on_ok(self, event):
-        max_pressure_value = self.max_pressure_input.GetValue()
-        if max_pressure_value:
-            self.settings["sensor_settings"][f"sensor_{self.sensor_id}_max_pressure"] = float(max_pressure_value)
-            self.GetParent().save_settings()
-        self.EndModal(wx.ID_OK)
-
-    
-    def close(self):
-        if self.ser:
-            self.ser.close()
-            self.ser = None
-
-    def read_gases(self):
-        try:
-            if self.ser is None or not self.ser.is_open:
-                self.ser = serial.Serial(self.port, baudrate=9600, timeout=1)
-
-            self.ser.reset_input_buffer()
-            self.ser.write(bytes([0x11, 0x01, 0x01, 0xED]))
-
-            time.sleep(0.2)
-
-            data = self.ser.read(32)
-
-            if len(data) >= 23:
-                raw = data[3:23]
-            elif len(data) == 20:
-                raw = data
-            else:
-                print(f"Unexpected data length: {len(data)}")
-                return None
-
-            gas_names = ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']
-            readings = {}
-
-            for i, name in enumerate(gas_names):
-                value_bytes = raw[i*2:i*2+2]
-                value = int.from_bytes(value_bytes, byteorder='big', signed=False)
-                readings[name] = value / 100.0
-
-            return readings
-
-        except Exception as e:
-            print(f"Gas analyzer read error: {e}")
-        # Close bad port so reconnect works next time
-            if self.ser:
-                try:
-                    self.ser.close()
-                except Exception:
-                    pass
-            self.ser = None
-        return None
-
-
-
-
-
-
-    def show_keypad(self, event):
-        text_ctrl = event.GetEventObject()
-        if text_ctrl is None:
-            return
-        keypad = NumericKeypad(self)
-        try:
-            if keypad.ShowModal() == wx.ID_OK:
-                value = keypad.get_value()
-                if text_ctrl is not None:
-                    text_ctrl.SetValue(value)
-        except Exception as e:
-            print(f"Error in keypad: {e}")
-        keypad.Destroy()
-
-    def on_ok(self, event):
-        """Save the maximum pressure setting."""
-        max_pressure_value = self.max_pressure_input.GetValue()
-        if max_pressure_value:
-            self.settings["sensor_settings"][f"sensor_{self.sensor_id}_max_pressure"] = float(max_pressure_value)
-        self.GetParent().save_settings()
-        self.EndModal(wx.ID_OK)
-
-    def on_cancel(self, event):
-        """Close the dialog without saving."""
-        self.EndModal(wx.ID_CANCEL)
-
 class PowerMeterDialog(wx.Dialog):
     def __init__(self, parent, power_label, energy_label, integration_status_label):
         super().__init__(parent, title="Power Meter Settings", size=(450, 250))
@@ -1059,332 +930,22 @@ class CustomStatusBarRedirector:
         pass
 
 
-class DeviceManager:
-    def __init__(self, settings, lock=None):
-        self.settings = settings
-        self.lock = lock or threading.Lock()
-        self.power_port = settings.get("PM_PORT", "COM3")
-        #self.pm = PowerMeter(port=self.power_port)
-        self.gas_port = settings.get("GAS_ANALYZER_PORT", "COM4")
-        self.gas_analyzer = GasAnalyzer(self.gas_port)
-        self.rs485_port = settings.get("RS485_PORT", "COM5")
-        self.client = ModbusSerialClient(
-            port=self.rs485_port, baudrate=9600, stopbits=2, bytesize=8,
-            parity='N', timeout=0.2, retries=0
-        )
-        self.client.connect()
-        self.psm4 = PSM4Controller(self.client)
-        self.mfc = MFCController(port=self.rs485_port)
-        self.mfm = MFMFlowMeter(port=self.rs485_port)
-        self.configure_power_meter()
-        
-    def read_gas_analyzer(self):
-        """Read all gas values as a dict, or None if not connected."""
-        try:
-            return self.gas_analyzer.read_gases()
-        except Exception as e:
-            print(f"Gas analyzer read error: {e}")
-            return None
-
-    def read_temperature(self, slave_id):
-        try:
-            with self.lock:
-                result = self.client.read_input_registers(0x03E8, count=2, slave=slave_id)
-            if result.isError():
-                return None
-            raw, decimal = result.registers
-            if raw == 31000:
-                return None
-            return raw / (10 ** decimal)
-        except Exception as e:
-            print(f"TK4_{slave_id}: not connected")
-            return None
-
-
-    def set_sv(self, slave_id, temperature):
-        try:
-            with self.lock:
-                return not self.client.write_register(0x0000, int(temperature), slave=slave_id).isError()
-        except Exception as e:
-            print(f"[MODBUS] Failed to set SV on ID {slave_id}: {e}")
-            return False
-
-    def start_heater(self, slave_id):
-        try:
-            with self.lock:
-                return not self.client.write_register(0x0032, 0, slave=slave_id).isError()
-        except Exception as e:
-            print(f"[MODBUS] Failed to start heater ID {slave_id}: {e}")
-            return False
-
-    def stop_heater(self, slave_id):
-        try:
-            with self.lock:
-                return not self.client.write_register(0x0032, 1, slave=slave_id).isError()
-        except Exception as e:
-            print(f"[MODBUS] Failed to stop heater ID {slave_id}: {e}")
-            return False
-
-    def read_power_meter(self):
-        try:
-            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
-            # Read power
-                ser.write(b":NUMERIC:NORMAL:VALUE?3\r\n")
-                time.sleep(0.2)
-                power_line = ser.readline().decode().strip()
-                power = float(power_line) if power_line else None
-
-            # Read energy
-                ser.write(b":NUMERIC:NORMAL:VALUE?4\r\n")
-                time.sleep(0.2)
-                energy_line = ser.readline().decode().strip()
-                energy = float(energy_line) if energy_line else None
-
-                return power, energy
-        except Exception as e:
-            print("Power Meter: not connected")
-            return None, None
-
-    def configure_power_meter(self):
-        try:
-            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
-                ser.write(b":COMMunicate:REMote ON\r\n")
-                time.sleep(0.2)
-                ser.write(b":NUMERIC:NORMAL:ITEM4 WH,1\r\n")
-                time.sleep(0.2)
-                ser.write(b":INTEGrate:MODE MANUAL\r\n")
-                time.sleep(0.2)
-                ser.write(b":INTEGrate:FUNCtion WP\r\n")
-                time.sleep(0.5)
-        except Exception as e:
-            print(f"Power meter configuration error: {e}")
-
-    
-    def start_integration(self):
-        try:
-            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
-                ser.write(b":INTEGrate:RESet\r\n")
-                time.sleep(0.5)
-                ser.write(b":INTEGrate:STARt\r\n")
-        except Exception as e:
-            print(f"Power meter start integration error: {e}")
-
-
-    def stop_integration(self):
-        try:
-            with serial.Serial(self.power_port, baudrate=9600, timeout=0.2) as ser:
-                ser.write(b":INTEGrate:STOP\r\n")
-        except Exception as e:
-         print(f"Power meter stop integration error: {e}")
-
-    def reset_integration(self):
-        try:
-            with serial.Serial(self.power_port, baudrate=9600, timeout=0.2) as ser:
-                ser.write(b":INTEGrate:RESet\r\n")
-                
-        except Exception as e:
-            print(f"Power meter reset integration error: {e}")
-
-
-
-    def set_mfc_flow(self, channel, value):
-        try:
-            #with self.lock:
-            return self.mfc.set_flow(channel, value)
-        except Exception as e:
-            print(f"MFC set flow error: {e}")
-            return False
-
-    def on_off_mfc(self, channel, state):
-        try:
-            
-            return self.mfc.on_off(channel, state)
-        except Exception as e:
-            print(f"MFC on/off error: {e}")
-            return False
-
-    def read_mfc_flow(self, channel):
-        """Read the PV (process value/flow) for a single MFC channel."""
-        try:
-            return self.mfc.read_flow(channel)
-        except Exception as e:
-            print(f"MFC read flow error: {e}")
-            return None
-
-    def read_all_mfc_flows(self):
-        """Read all MFC flows (channels 1-4). Returns a list of 4 floats or None if not connected."""
-        try:
-            return self.mfc.read_all_flows()
-        except Exception as e:
-            print(f"MFC read all flows error: {e}")
-            return [None] * 4
-
-
-    def read_mfm_flow(self):
-        """
-    Read the MFM flow value.
-    Returns a float or None if not connected.
-    """
-        try:
-            return self.mfm.read_flow()
-        except Exception as e:
-            print(f"MFM read flow error: {e}")
-            return None
-
-
-    def read_pressures(self):
-        try:
-            with self.lock:
-                return self.psm4.read_pressures()
-        except Exception as e:
-            print(f"PSM4 read error: {e}")
-            return ["NC"] * 4
-
-
-class PSM4Controller:
-    """
-    Modbus RTU controller for PSM4 pressure sensor (4 channels).
-    Assumes slave address 7 and standard register layout.
-    """
-    def __init__(self, client):
-        self.client = client  # pymodbus ModbusSerialClient
-        self.lock = threading.Lock()
-
-    def read_pressures(self):
-        """
-        Read all 4 pressure channels (slave ID 7).
-        Returns a list of 4 values (floats in bar, or "NC" if not connected/invalid).
-        """
-        pressures = []
-        # Base register addresses for each channel (from your v1.0.4 code)
-        base_addrs = [0x03E8, 0x03ED, 0x03F2, 0x03F7]
-        try:
-            with self.lock:
-                for addr in base_addrs:
-                    response = self.client.read_input_registers(
-                        address=addr + 1,
-                        count=2,
-                        slave=7
-                    )
-                    if response.isError():
-                        pressures.append("NC")
-                        continue
-                    raw, decimal = response.registers
-                    try:
-                        val = raw / (10 ** decimal) / 10.0  # per your scaling
-                    except Exception:
-                        pressures.append("NC")
-                        continue
-                    # If value > 20 bar, show NC (sensor disconnected or error)
-                    if val > 20.0:
-                        pressures.append("NC")
-                    else:
-                        pressures.append(round(val, 2))
-            return pressures
-        except Exception as e:
-            #print(f"PSM4 read error: {str(e)}")
-            return ["NC"] * 4
-
-    def close(self):
-        if self.client:
-            self.client.close()
-
-class MFCController:
-    def __init__(self, port="COM6", channels=[1,2,3,4]):
-        self.port = port
-        self.channels = channels
-
-    def _checksum(self, data):
-        cs = 0
-        for b in data.encode():
-            cs ^= b
-        return f"{cs:02X}"
-
-    def send_command(self, channel, cmd, addr, value=""):
-        frame_wo_cs = f":{channel:02d}{cmd}{addr}{value}"
-        cs = self._checksum(frame_wo_cs)
-        frame = f"{frame_wo_cs}{cs}\r".encode()
-        with serial.Serial(
-            port=self.port, baudrate=9600, bytesize=8,
-            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=0.1
-        ) as ser:
-            ser.write(frame)
-            resp = ser.read_until(b'\r')
-        return resp
-
-    def read_flow(self, channel):
-        try:
-            resp = self.send_command(channel, "03", "0038")
-            if not resp or not resp.startswith(b':'):
-                return None
-            data_ascii = resp[7:15].decode()
-            return struct.unpack('>f', bytes.fromhex(data_ascii))[0]
-        except Exception as e:
-            print("MFC: not connected")
-            return None
-
-    
-    def set_flow(self, channel, value):
-        hexval = struct.pack('!f', float(value)).hex().upper()
-        resp = self.send_command(channel, "01", "07", hexval)
-        return resp.startswith(f":{channel:02d}81".encode())
-
-    def on_off(self, channel, state):
-        val = "01" if state else "00"
-        resp = self.send_command(channel, "58", "02", val)
-        return resp.startswith(f":{channel:02d}D8".encode())
-
-    def read_all_flows(self):
-        return [self.read_flow(ch) for ch in self.channels]
-
-class MFMFlowMeter:
-    def __init__(self, port='COM6', device_id=1):
-        self.port = port
-        self.device_id = device_id
-
-    def _checksum(self, frame_wo_cs):
-        cs = 0
-        for b in frame_wo_cs.encode():
-            cs ^= b
-        return f"{cs:02X}"
-
-    def build_read_flow_frame(self):
-        id_ascii = f"{self.device_id:02X}"
-        frame_wo_cs = f":{id_ascii}0300"
-        cs = self._checksum(frame_wo_cs)
-        return f"{frame_wo_cs}{cs}\r".encode()
-
-    def read_flow(self):
-        with serial.Serial(
-            port=self.port, baudrate=9600, bytesize=8,
-            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=0.1
-        ) as ser:
-            frame = self.build_read_flow_frame()
-            ser.write(frame)
-            resp = ser.read_until(b'\r')
-            if not resp.startswith(b':'):
-                return None
-            if len(resp) < 16:
-                return None
-            try:
-                data_ascii = resp[7:15].decode('ascii')
-                data_bytes = bytes.fromhex(data_ascii)
-                return struct.unpack('>f', data_bytes)[0]
-            except Exception:
-                return None
-    
-    
-
-
 class ControlGUI(wx.Frame):
     def __init__(self, parent, title):
         super().__init__(parent, title=title, size=(1280, 800), style=wx.DEFAULT_FRAME_STYLE & ~wx.RESIZE_BORDER)
         # Initialize latch dictionaries FIRST
         self.overtemp_latched = {1: False, 2: False, 3: False}  # 1: Heater2, 2: Heater1, 3: Reactor
         self.overpress_latched = {1: False, 2: False, 3: False}
+        # Abnormal events; written by a background thread so the emergency path never waits on the disk
+        self.journal = EventJournal()
+        # Created here, not at import: the spawned plot workers re-import this script
+        self.plot_exporter = PlotExporter()
         #log_filename = f"process_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        self.logger = Logger()
+        self.stats_path = os.path.join(data_log_dir, "driver_stats.jsonl")
+        STATS.start_dump(self.stats_path, interval=60.0)
+        self.log_catalog = LogCatalog(data_log_dir)
         self.polling_paused = False
+        self.poll_clock = PollClock(POLL_PERIOD)
         self.device_status = {
             "TK4_1": False,
             "TK4_2": False,
@@ -1399,7 +960,11 @@ class ControlGUI(wx.Frame):
             "GasAnalyzer": False
         }
         self.button_command_queue = queue.Queue()
+        # Creates settings.json with the defaults when it is missing
+        self.settings_store = SettingsStore(SETTINGS_FILE, DEFAULT_SETTINGS, live=LIVE_SETTINGS)
         self.settings = self.load_settings()
+        # LOG_CHANNEL_TIMES: also log when each value was read (.ptimes next to each segment)
+        self.logger = HourlyLogger(channel_times=bool(self.settings.get("LOG_CHANNEL_TIMES", False)))
         self.modbus_lock = threading.Lock()
         self.running = True
         self.worker_thread = threading.Thread(target=self.button_command_handler, daemon=True)
@@ -1454,8 +1019,11 @@ class ControlGUI(wx.Frame):
         self.selftest_btn.Bind(wx.EVT_BUTTON, lambda evt: self.run_selftest())
         self.plot_btn = wx.Button(self.status_bar_panel, label="Plot", pos=(1000, 10), size=(80, 30))
         self.plot_btn.Bind(wx.EVT_BUTTON, self.on_plot)
+        self.stats_btn = wx.Button(self.status_bar_panel, label="Stats", pos=(800, 10), size=(80, 30))
+        self.stats_btn.Bind(wx.EVT_BUTTON, self.on_stats)
         self.selftest_btn.SetFont(SHARED_FONT)
         self.plot_btn.SetFont(SHARED_FONT)
+        self.stats_btn.SetFont(SHARED_FONT)
        
         #sys.stdout = CustomStatusBarRedirector(self.status_bar_label)
 
@@ -1473,8 +1041,8 @@ class ControlGUI(wx.Frame):
         self.heater_2_panel = wx.Panel(self.background, pos=(810, 250), size=(120, 95), style=wx.SIMPLE_BORDER)
         self.heater_2_panel.SetBackgroundColour(wx.Colour(255, 255, 255))
         self.coil_sv_label = wx.StaticText(self.heater_2_panel, label=f"SV: {self.settings['heater_2']['coil_sv']}", pos=(10, 10))
-        self.coil_pv_label = wx.StaticText(self.heater_2_panel, label=f"PV: {self.settings['heater_2']['coil_pv']}", pos=(10, 30))
-        self.reactor_temp_label = wx.StaticText(self.heater_2_panel, label=f"Reactor: {self.settings['heater_2']['reactor_temp']}", pos=(10, 50))
+        self.coil_pv_label = wx.StaticText(self.heater_2_panel, label="PV: --", pos=(10, 30))
+        self.reactor_temp_label = wx.StaticText(self.heater_2_panel, label="Reactor: --", pos=(10, 50))
         self.heater_2_status_label = wx.StaticText(
         self.heater_2_panel,
         label="OFF",  # Always initialize as OFF or whatever you want as default
@@ -1593,87 +1161,118 @@ class ControlGUI(wx.Frame):
         self.integration_status_label.SetFont(LARGE_FONT)
         self.integration_status_label.SetForegroundColour(COLOR_RED)
         self.power_meter_panel.Bind(wx.EVT_LEFT_DOWN, self.on_power_meter_click)
-        wx.CallAfter(self.run_selftest)
+        # Start from the last self-test on these ports, then check again in the background
+        cached = load_cache(SELFTEST_CACHE_FILE, self.selftest_ports())
+        if cached:
+            self.apply_device_status(cached)
+        wx.CallAfter(self.run_selftest, popup=not cached)
 
     def on_plot(self, event):
     
-        log_files = glob.glob(os.path.join(data_log_dir, "process_log_*.xlsx"))
-        if not log_files:
+        if not self.log_catalog.refresh().latest():
             wx.MessageBox("No log files found in Data log folder.", "Plot Error", wx.ICON_ERROR)
             return
-        latest_log = max(log_files, key=os.path.getmtime)
-        dlg = PlotDialog(self, latest_log, data_log_dir)
+        dlg = PlotDialog(self, self.log_catalog, data_log_dir)
         dlg.ShowModal()
         dlg.Destroy()
 
 
 
-    def run_selftest(self):
-        status = {}
-    # TK4 controllers (IDs 1-6)
-        for addr in [1, 2, 3, 4, 5, 6]:
-            try:
-                temp = self.device_manager.read_temperature(addr)
-                print(f"Selftest: TK4_{addr} temp={temp}")
-                status[f"TK4_{addr}"] = temp is not None
-            except Exception:
-                status[f"TK4_{addr}"] = False
+    def on_stats(self, event):
+        DriverStatsDialog(self, self.stats_path).Show()
 
-    # PSM4 (pressure)
-        try:
-            pressures = self.device_manager.read_pressures()
-            status["PSM4"] = any(isinstance(p, (float, int)) for p in pressures)
-        except Exception:
-            status["PSM4"] = False
+    def on_plot_exported(self, filename, error):
+        if error is not None:
+            self.status_bar_label.SetLabel(f"Plot export failed: {error}")
+        else:
+            self.status_bar_label.SetLabel(f"Plot saved to {filename}")
 
-    # MFC (try reading flow from channel 1)
-        try:
-            reply_queue = queue.Queue()
-            self.button_command_queue.put({"cmd": "read_mfc", "channel": 1, "reply_queue": reply_queue})
-            result = reply_queue.get(timeout=0.5)
-            flow = result.get("value", None)
-            status["MFC"] = flow is not None
-        except Exception:
-            status["MFC"] = False
+    def _worker_probe(self, command, key):
+        """Probe through the worker thread (ASCII devices need the Modbus port switch)."""
+        reply_queue = queue.Queue()
+        self.button_command_queue.put(dict(command, reply_queue=reply_queue))
+        return reply_queue.get(timeout=REPLY_WAIT).get(key) is not None
 
-    # MFM (use worker thread)
-        try:
-            reply_queue = queue.Queue()
-            self.button_command_queue.put({"cmd": "read_mfm", "reply_queue": reply_queue})
-            result = reply_queue.get(timeout=2)
-            mfm_flow = result.get("value", None)
-            status["MFM"] = mfm_flow is not None
-        except Exception:
-            status["MFM"] = False
+    def selftest_ports(self):
+        return {key: self.settings.get(key) for key in ("RS485_PORT", "PM_PORT", "GAS_ANALYZER_PORT")}
 
-    # Power Meter
-        try:
-            power, energy = self.device_manager.read_power_meter()
-            status["PowerMeter"] = power is not None and energy is not None
-        except Exception:
-            status["PowerMeter"] = False
+    def run_selftest(self, popup=True):
+        """
+        Probe all devices in the background, one thread per port; results
+        show in the status bar as they come in.  With popup=False the
+        result dialog only appears when it differs from the cached one.
+        """
+        if getattr(self, "selftest_running", False):
+            return
+        dm = self.device_manager
+
+        def probe(dev, read):
+            # Close the device's circuit just before its probe, so the probe reaches it even
+            # when the cache marked it absent; until then polling keeps skipping it
+            def run():
+                for device in SELFTEST_DEVICES.get(dev, [dev]):
+                    HEALTH.reset(device)
+                return read()
+            return dev, run
+        groups = {
+            "RS485": [probe(f"TK4_{addr}", lambda addr=addr: dm.read_temperature(addr)[1] == ST_OK)
+                      for addr in [1, 2, 3, 4, 5, 6]] + [
+                probe("PSM4", lambda: dm.read_pressures().any_ok()),
+                # MFC: try reading flow from channel 1
+                probe("MFC", lambda: self._worker_probe({"cmd": "read_mfc", "channel": 1}, "value")),
+                probe("MFM", lambda: self._worker_probe({"cmd": "read_mfm"}, "value")),
+            ],
+            "PM": [probe("PowerMeter", lambda: None not in dm.read_power_meter(timeout=DISCOVERY_TIMEOUT))],
+            "GAS": [probe("GasAnalyzer", lambda: dm.read_gas_analyzer() is not None)],
+        }
+        cached = load_cache(SELFTEST_CACHE_FILE, self.selftest_ports())
+        # Polling goes on meanwhile: the bus locks keep probes and polled reads apart
+        self.selftest_running = True
+        total = sum(len(probes) for probes in groups.values())
+        self.selftest_seen = 0
+        self.status_bar_label.SetLabel("Selftest running...")
 
-    # Gas Analyzer
-        try:
-            reply_queue = queue.Queue()
-            self.button_command_queue.put({"cmd": "read_gas_analyzer", "reply_queue": reply_queue})
-            result = reply_queue.get(timeout=2)
-            gases = result.get("values", None)
-            status["GasAnalyzer"] = gases is not None
-        except Exception:
-            status["GasAnalyzer"] = False
+        def on_result(dev, ok):
+            wx.CallAfter(self.on_selftest_result, dev, ok, total)
 
+        def on_done(status):
+            wx.CallAfter(self.on_selftest_done, status, popup or status != cached)
+        SelfTest(groups).start(on_result, on_done)
+
+    def on_selftest_result(self, dev, ok, total):
+        if getattr(self, "closing", False):
+            return
+        self.selftest_seen += 1
+        self.device_status[dev] = ok
+        if not ok:
+            self.trip_device(dev)
+        self.status_bar_label.SetLabel(
+            f"Selftest {self.selftest_seen}/{total}: {dev} {'OK' if ok else 'NOT CONNECTED'}")
+
+    def on_selftest_done(self, status, popup):
+        self.selftest_running = False
+        if getattr(self, "closing", False):
+            return
+    # Store results; devices that failed go straight to backoff probing instead of being dropped for good
+        self.apply_device_status(status)
+        save_cache(SELFTEST_CACHE_FILE, self.selftest_ports(), status)
+        failed = [dev for dev, ok in status.items() if not ok]
+        self.status_bar_label.SetLabel(f"Selftest done: {len(failed)} not connected" if failed else "Selftest done: all OK")
+        if popup:
+            available_ports = [port.device for port in serial.tools.list_ports.comports()]
+            self.show_selftest_popup(status, available_ports)
+
+    def apply_device_status(self, status):
+        self.device_status = dict(status)
+        for dev, ok in status.items():
+            if not ok:
+                self.trip_device(dev)
 
+    def trip_device(self, dev):
+        """Take a device that failed the self-test off the poll until a backoff probe finds it."""
+        for device in SELFTEST_DEVICES.get(dev, [dev]):
+            HEALTH.trip(device)
 
-    # Update labels with self-test results
-    # Store results
-        self.device_status = status
-        
-    # Show popup with results
-        #self.show_selftest_popup(status)
-        available_ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.show_selftest_popup(status, available_ports)
-        
     def show_selftest_popup(self, status, available_ports):
         msg = ""
         for dev, ok in status.items():
@@ -1710,7 +1309,7 @@ class ControlGUI(wx.Frame):
                     try:
                         result = self.device_manager.set_sv(addr, val)
                     except Exception as e:
-                        print(f"[Worker] set_tk4_sv error: {e}")
+                        log.error(f"[Worker] set_tk4_sv error: {e}")
                         result = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
@@ -1720,7 +1319,7 @@ class ControlGUI(wx.Frame):
                     try:
                         result = self.device_manager.start_heater(addr)
                     except Exception as e:
-                        print(f"[Worker] start_tk4 error: {e}")
+                        log.error(f"[Worker] start_tk4 error: {e}")
                         result = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
@@ -1730,7 +1329,7 @@ class ControlGUI(wx.Frame):
                     try:
                         result = self.device_manager.stop_heater(addr)
                     except Exception as e:
-                        print(f"[Worker] stop_tk4 error: {e}")
+                        log.error(f"[Worker] stop_tk4 error: {e}")
                         result = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
@@ -1740,12 +1339,12 @@ class ControlGUI(wx.Frame):
                     
                     channel = cmd["channel"]
                     duration = cmd.get("duration", 1.0)
-                    print(f"Worker: Pulsing relay {channel} for {duration}s")
+                    log.info(f"Worker: Pulsing relay {channel} for {duration}s")
                     try:
                         self.relay_controller.send_pulse(channel, duration)
                         success = True
                     except Exception as e:
-                        print(f"[Worker] relay_pulse error: {e}")
+                        log.error(f"[Worker] relay_pulse error: {e}")
                         success = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "channel": channel, "success": success})
@@ -1755,7 +1354,7 @@ class ControlGUI(wx.Frame):
                         self.relay_controller.open_all()
                         success = True
                     except Exception as e:
-                        print(f"[Worker] relay_open_all error: {e}")
+                        log.error(f"[Worker] relay_open_all error: {e}")
                         success = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "success": success})
@@ -1765,7 +1364,7 @@ class ControlGUI(wx.Frame):
                         self.relay_controller.close_all()
                         success = True
                     except Exception as e:
-                        print(f"[Worker] relay_close_all error: {e}")
+                        log.error(f"[Worker] relay_close_all error: {e}")
                         success = False
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "success": success})
@@ -1804,7 +1403,7 @@ class ControlGUI(wx.Frame):
                             if reply_queue:
                                 reply_queue.put({"cmd": cmd_type, "value": value})
                     except Exception as e:
-                        print(f"[Worker] {cmd_type} error: {e}")
+                        log.error(f"[Worker] {cmd_type} error: {e}")
                         if reply_queue:
                             reply_queue.put({"cmd": cmd_type, "success": False})
                     finally:
@@ -1821,8 +1420,9 @@ class ControlGUI(wx.Frame):
                     try:
                         values = self.device_manager.read_pressures()
                     except Exception as e:
-                        print(f"[Worker] read_psm4 error: {e}")
-                        values = ["NC"] * 4
+                        log.error(f"[Worker] read_psm4 error: {e}")
+                        values = ChannelBlock(4)
+                        values.invalidate(ST_NO_REPLY)
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "values": values})
 
@@ -1831,7 +1431,7 @@ class ControlGUI(wx.Frame):
                     try:
                         power, energy = self.device_manager.read_power_meter()
                     except Exception as e:
-                        print(f"[Worker] read_power_meter error: {e}")
+                        log.error(f"[Worker] read_power_meter error: {e}")
                         power, energy = None, None
                     if reply_queue:
                         reply_queue.put({"cmd": cmd_type, "power": power, "energy": energy})
@@ -1841,33 +1441,34 @@ class ControlGUI(wx.Frame):
                     try:
                         gases = self.device_manager.read_gas_analyzer()
                     except Exception as e:
-                        print(f"[Worker] read_gas_analyzer error: {e}")
+                        log.error(f"[Worker] read_gas_analyzer error: {e}")
                         gases = None
                     if reply_queue:
-                        reply_queue.put({"cmd": cmd_type, "values": gases})
+                        reply_queue.put({"cmd": cmd_type, "values": gases,
+                                         "time": self.device_manager.gas_analyzer.read_time})
 
                 else:
-                    print(f"[Worker] Unknown command: {cmd_type}")
+                    log.error(f"[Worker] Unknown command: {cmd_type}")
 
             except Exception as e:
-                print(f"Control error: {e}")
+                log.error(f"Control error: {e}")
 
-        print("button_command_handler thread exiting")
+        log.info("button_command_handler thread exiting")
 
 
     def control_heater(self, address, state):
         try:
             if self.modbus_client is None or not getattr(self.modbus_client, 'connected', False):
-                print(f"MODBUS client not initialized or not connected. Cannot control heater ID {address}.")
+                log.error(f"MODBUS client not initialized or not connected. Cannot control heater ID {address}.")
                 return False
             value = 1 if state else 0
-            response = self.modbus_client.write_register(address=0x0032, value=value, slave=address)
+            response = self.modbus_client.write_register(address=0x0032, value=value, device_id=address)
             if response.isError():
-                print(f"Error controlling heater ID {address}")
+                log.error(f"Error controlling heater ID {address}")
                 return False
             return True
         except Exception as e:
-            print(f"Error controlling heater ID {address}: {e}")
+            log.error(f"Error controlling heater ID {address}: {e}")
             return False
         
     
@@ -1880,175 +1481,139 @@ class ControlGUI(wx.Frame):
     2. Read all ASCII devices (MFC, MFM) via the worker thread
     3. Update all GUI elements
     """
+        sample_time = self.poll_clock.begin()
+        startup_timer.mark("first poll")
     # === 1. READ ALL MODBUS RTU DEVICES ===
 
     # Read all TK4 temperature controllers (IDs 1-6)
-        temperatures = {}
-        for addr in [1, 2, 3, 4, 5, 6]:
+        temperatures = ChannelBlock([1, 2, 3, 4, 5, 6])
+        for i, addr in enumerate(temperatures.names):
             try:
-                if self.device_status.get(f"TK4_{addr}", True):
-                    temp = self.device_manager.read_temperature(addr)
-                    temperatures[addr] = temp
-                else:
-                    temperatures[addr] = None
+                temperatures.set(i, *self.device_manager.read_temperature_stamped(addr, max_age=DISPLAY_MAX_AGE))
             except Exception as e:
-                temperatures[addr] = None
+                temperatures.invalidate(ST_NO_REPLY, i)
 
     # Read all pressure sensors (PSM4)
-        pressures = ["NC"] * 4
+        pressures = ChannelBlock(4)
         try:
-            if self.device_status.get("PSM4", True):
-                pressures = self.device_manager.read_pressures()
+            self.device_manager.read_pressures(pressures, max_age=DISPLAY_MAX_AGE)
         except Exception as e:
-            print(f"Pressure read error: {e}")
-            pressures = ["NC"] * 4
+            log.error(f"Pressure read error: {e}")
+            pressures.invalidate(ST_NO_REPLY)
 
     # === 2. READ ALL ASCII DEVICES (MFC/MFM) VIA WORKER THREAD ===
 
     # Read MFC flows (ASCII)
-        mfc_flows = [None] * 4
+        mfc_flows = ChannelBlock(self.mfc_channels)
         try:
-            if self.device_status.get("MFC", True):
-                reply_queue = queue.Queue()
-                self.button_command_queue.put({"cmd": "read_all_mfc", "reply_queue": reply_queue})
-                result = reply_queue.get(timeout=2)
-                mfc_flows = result.get("values", [None]*4)
+            reply_queue = queue.Queue()
+            self.button_command_queue.put({"cmd": "read_all_mfc", "reply_queue": reply_queue})
+            result = reply_queue.get(timeout=2)
+            mfc_flows.copy_from(result["values"])
         except Exception as e:
-            print(f"MFC read error: {e}")
-            mfc_flows = [None] * 4
+            log.error(f"MFC read error: {e}")
+            mfc_flows.invalidate(ST_NO_REPLY)
 
     # Read MFM flow (ASCII)
         mfm_flow = None
         try:
-            if self.device_status.get("MFM", True):
-                reply_queue = queue.Queue()
-                self.button_command_queue.put({"cmd": "read_mfm", "reply_queue": reply_queue})
-                result = reply_queue.get(timeout=2)
-                mfm_flow = result.get("value", None)
+            reply_queue = queue.Queue()
+            self.button_command_queue.put({"cmd": "read_mfm", "reply_queue": reply_queue})
+            result = reply_queue.get(timeout=2)
+            mfm_flow = result.get("value", None)
         except Exception as e:
-            print(f"MFM read error: {e}")
+            log.error(f"MFM read error: {e}")
             mfm_flow = None
+        if mfm_flow is None:
+            mfm_flow = NAN
 
     # Read Power Meter (ASCII, if connected)
         power, energy = None, None
 
         try:
-            if self.device_status.get("PowerMeter", True):
-                reply_queue = queue.Queue()
-                self.button_command_queue.put({"cmd": "read_power_meter", "reply_queue": reply_queue})
-                result = reply_queue.get(timeout=2)
-                power = result.get("power", None)
-                energy = result.get("energy", None)
+            reply_queue = queue.Queue()
+            self.button_command_queue.put({"cmd": "read_power_meter", "reply_queue": reply_queue})
+            result = reply_queue.get(timeout=2)
+            power = result.get("power", None)
+            energy = result.get("energy", None)
         except Exception as e:
-            print(f"Power meter read error: {e}")
+            log.error(f"Power meter read error: {e}")
 
         scaling = self.settings.get("power_meter_scaling_factor", 1.0)
-        if power is not None:
-            power *= scaling
-        if energy is not None:
-            energy *= scaling
+        power = NAN if power is None else power * scaling
+        energy = NAN if energy is None else energy * scaling
 
 
     # --- Gas Analyzer ---
         gas_values = None
         try:
-            if self.device_status.get("GasAnalyzer", True):
-                reply_queue = queue.Queue()
-                self.button_command_queue.put({"cmd": "read_gas_analyzer", "reply_queue": reply_queue})
-                result = reply_queue.get(timeout=2)
-                gas_values = result.get("values", None)
+            reply_queue = queue.Queue()
+            self.button_command_queue.put({"cmd": "read_gas_analyzer", "reply_queue": reply_queue})
+            result = reply_queue.get(timeout=2)
+            gas_values = result.get("values", None)
+            if gas_values is not None:
+                self.gas_time = result.get("time", NAN)
         except Exception as e:
-            print(f"Gas analyzer read error: {e}")
+            log.error(f"Gas analyzer read error: {e}")
             gas_values = None
 
+        # temps: TK4 IDs 1-6 (coil, preheater, reactor, Temp1-3); the logger keeps
+        # only the first 3 pressure sensors.  Missing values are NaN.
         data = {
-                1: temperatures.get(1),   # Heater (coil, TK4 ID=1)
-                2: temperatures.get(2),   # Preheater (TK4 ID=2)
-                3: temperatures.get(3),   # Reactor (TK4 ID=3)
-                4: temperatures.get(4),   # Temp1 (TK4 ID=4)
-                5: temperatures.get(5),   # Temp2 (TK4 ID=5)
-                6: temperatures.get(6),   # Temp3 (TK4 ID=6)
-                'pressures': pressures[:3],  # Use only first 3 sensors
+                'temps': temperatures,
+                'pressures': pressures,
                 'power': power,
                 'energy': energy,
                 'mfm_flow': mfm_flow,
-                'mfc_flows': [mfc_flows[0], mfc_flows[1], mfc_flows[2], mfc_flows[3]] if mfc_flows else [None]*4
+                'mfc_flows': mfc_flows,
                 }           
 
     # === 3. UPDATE ALL GUI ELEMENTS ===
 
     # Update Heater 1 (ID=2)
-        heater_1_temp = temperatures.get(2)
-        if heater_1_temp is not None:
-            self.settings['heater_1']['pv'] = f"{heater_1_temp:.1f}"
+        heater_1_temp = temperatures[1]
+        if temperatures.ok(1):
             self.pv_label.SetLabel(f"PV: {heater_1_temp:.1f}")
             self.pv_label.SetForegroundColour(COLOR_RED)
         else:
-            self.settings['heater_1']['pv'] = "NC"
             self.pv_label.SetLabel("PV: NC")
             self.pv_label.SetForegroundColour(COLOR_RED)
 
     # Update Heater 2 (ID=1)
-        heater_2_temp = temperatures.get(1)
-        if heater_2_temp is not None:
-            self.settings["heater_2"]["coil_pv"] = f"{heater_2_temp:.1f}"
+        heater_2_temp = temperatures[0]
+        if temperatures.ok(0):
             self.coil_pv_label.SetLabel(f"PV: {heater_2_temp:.1f}")
             self.coil_pv_label.SetForegroundColour(COLOR_RED)
         else:
-            self.settings["heater_2"]["coil_pv"] = "NC"
             self.coil_pv_label.SetLabel("PV: NC")
             self.coil_pv_label.SetForegroundColour(COLOR_RED)
 
     # Update Reactor Temp (ID=3)
-        reactor_temp = temperatures.get(3)
-        if reactor_temp is not None:
-            self.settings["heater_2"]["reactor_temp"] = f"{reactor_temp:.1f}"
+        reactor_temp = temperatures[2]
+        if temperatures.ok(2):
             self.reactor_temp_label.SetLabel(f"Reactor: {reactor_temp:.1f}")
             self.reactor_temp_label.SetForegroundColour(COLOR_RED)
         else:
-            self.settings["heater_2"]["reactor_temp"] = "NC"
             self.reactor_temp_label.SetLabel("Reactor: NC")
             self.reactor_temp_label.SetForegroundColour(COLOR_RED)
 
     # Update Read-only sensors (IDs 4, 5, 6)
-        for i, sensor_id in enumerate([4, 5, 6]):
-            sensor_temp = temperatures.get(sensor_id)
-            try:
-                if (sensor_temp is None or
-                    (isinstance(sensor_temp, str) and sensor_temp.upper() == "NC") or
-                    (isinstance(sensor_temp, float) and (sensor_temp != sensor_temp))):  # NaN check
-                    label_text = "Temp: NC"
-                    self.sensor_labels[i].SetForegroundColour(COLOR_RED)
-                else:
-                    label_text = f"Temp: {float(sensor_temp):.1f}"
-                    self.sensor_labels[i].SetForegroundColour(COLOR_RED)
-            except Exception:
-                label_text = "Temp: NC"
-                self.sensor_labels[i].SetForegroundColour(COLOR_RED)
-            self.sensor_labels[i].SetLabel(label_text)
+        for i in range(3):
+            self.sensor_labels[i].SetLabel("Temp: " + temperatures.format(3 + i, missing="NC"))
+            self.sensor_labels[i].SetForegroundColour(COLOR_RED)
 
     # Update Pressure sensors
-        if len(pressures) >= 3:
-            for i, pressure_label in enumerate([self.pressure_label, self.pressure_2_label, self.pressure_3_label]):
-                if pressures[i] != "NC" and pressures[i] is not None:
-                    pressure_label.SetLabel(f"{pressures[i]} bar")
-                    pressure_label.SetForegroundColour(COLOR_RED)
-                else:
-                    pressure_label.SetLabel("-- bar")
-                    pressure_label.SetForegroundColour(COLOR_RED)
+        for i, pressure_label in enumerate([self.pressure_label, self.pressure_2_label, self.pressure_3_label]):
+            pressure_label.SetLabel(pressures.format(i, "{} bar", missing="-- bar"))
+            pressure_label.SetForegroundColour(COLOR_RED)
 
     # Update MFC flows
-        if mfc_flows:
-            for i, channel in enumerate(self.mfc_channels):
-                if i < len(mfc_flows) and mfc_flows[i] is not None:
-                    self.mfc_pv_labels[channel].SetLabel(f"{mfc_flows[i]:.2f}")
-                    self.mfc_pv_labels[channel].SetForegroundColour(COLOR_RED)
-                else:
-                    self.mfc_pv_labels[channel].SetLabel("--")
-                    self.mfc_pv_labels[channel].SetForegroundColour(COLOR_RED)
+        for i, channel in enumerate(self.mfc_channels):
+            self.mfc_pv_labels[channel].SetLabel(mfc_flows.format(i, "{:.2f}"))
+            self.mfc_pv_labels[channel].SetForegroundColour(COLOR_RED)
 
     # Update MFM flow
-        if mfm_flow is not None:
+        if mfm_flow == mfm_flow:
             self.mfm_label.SetLabel(f"{mfm_flow:.2f}")
             self.mfm_label.SetForegroundColour(COLOR_RED)
         else:
@@ -2056,14 +1621,14 @@ class ControlGUI(wx.Frame):
             self.mfm_label.SetForegroundColour(COLOR_RED)
 
     # Update Power Meter (if available)
-        if power is not None:
+        if power == power:
             self.power_label.SetLabel(f"{power:.1f}")
             self.power_label.SetForegroundColour(COLOR_RED)
         else:
             self.power_label.SetLabel("--")
             self.power_label.SetForegroundColour(COLOR_RED)
 
-        if energy is not None:
+        if energy == energy:
             self.energy_label.SetLabel(f"{energy:.2f}")
             self.energy_label.SetForegroundColour(COLOR_RED)
         else:
@@ -2085,11 +1650,12 @@ class ControlGUI(wx.Frame):
                 label.SetForegroundColour(COLOR_RED)
 
         try:
-            self.logger.log(data, gas_values)
+            self.logger.log(data, gas_values, sample_time, getattr(self, "gas_time", NAN))
         except Exception as e:
-            print(f"Logger error: {e}")
-    # Schedule next update
-        wx.CallLater(2000, self.update_all_devices)   
+            log.error(f"Logger error: {e}")
+    # Schedule next update on the fixed period, not 2 s after this one ended
+        self.poll_clock.end()
+        wx.CallLater(max(1, int(self.poll_clock.remaining() * 1000)), self.update_all_devices)
 
 
 
@@ -2107,26 +1673,20 @@ class ControlGUI(wx.Frame):
         self.update_datetime()
 
     def load_settings(self):
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, "r") as f:
-                settings = json.load(f)
-        else:
-            settings = {}
+        settings = self.settings_store.data
         if "heater_1" not in settings:
-            settings["heater_1"] = {"sv": "--", "max_temp": "--", "pv": "--"}
+            settings["heater_1"] = {"sv": "--", "max_temp": "--"}
         else:
             settings["heater_1"].setdefault("sv", "--")
             settings["heater_1"].setdefault("max_temp", "--")
-            settings["heater_1"].setdefault("pv", "--")
-        
         return settings
 
     
 
 
     def save_settings(self):
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump(self.settings, f, indent=4)
+        """Queue settings.json for writing; the store writes it in the background."""
+        self.settings_store.save(self.settings)
 
     def on_close(self, event):
         self.shutdown_all_devices()
@@ -2134,11 +1694,16 @@ class ControlGUI(wx.Frame):
         self.running = False
         self.button_command_queue.put({"cmd": "relay_close_all"})
         self.save_settings()
+        self.settings_store.close()
+        self.journal.close()
+        self.plot_exporter.shutdown(wait=False)
         self.Destroy()
         if hasattr(self, 'worker_thread'):
             print("Waiting for worker thread to exit...")
             self.worker_thread.join(timeout=2)
             print("Worker thread exited.")
+        self.logger.close()
+        STATS.stop_dump(self.stats_path)
 
 
 
@@ -2171,7 +1736,7 @@ class ControlGUI(wx.Frame):
 
         # Emergency button area
         if 1000 <= x <= 1200 and 150 <= y <= 280:
-            print("Emergency button pressed!")
+            log.warning("Emergency button pressed!")
             self.handle_emergency_button()
             return
 
@@ -2253,29 +1818,28 @@ class ControlGUI(wx.Frame):
         try:
             winsound.PlaySound("mixkit-emergency-alert-alarm-1007.wav", winsound.SND_FILENAME | winsound.SND_ASYNC | winsound.SND_LOOP)
         except Exception as e:
-            print(f"Alarm sound error: {e}")
+            log.error(f"Alarm sound error: {e}")
 
     def stop_alarm(self):
         try:       
             winsound.PlaySound(None, winsound.SND_PURGE)
         except Exception as e:
-            print(f"Alarm stop error: {e}")
+            log.error(f"Alarm stop error: {e}")
     def stop_alarm(self):
         try:        
             winsound.PlaySound(None, winsound.SND_PURGE)
         except Exception as e:
-            print(f"Alarm stop error: {e}") 
+            log.error(f"Alarm stop error: {e}")
         
     def check_emergency_conditions(self):
         if getattr(self, "closing", False):
             return
         try:
         # --- Heater 1 overtemperature (ID=2) ---
-            heater_1_temp = self.device_manager.read_temperature(2)
+            heater_1_temp, heater_1_temp_status = self.device_manager.read_temperature(2, max_age=EMERGENCY_MAX_AGE)
             heater_1_max = self.settings.get("heater_1", {}).get("max_temp", None)
             if (
-                heater_1_temp is not None
-                and isinstance(heater_1_temp, (int, float))
+                heater_1_temp_status == ST_OK
                 and heater_1_max not in (None, "--", "NC", "")
             ):
                 try:
@@ -2283,8 +1847,8 @@ class ControlGUI(wx.Frame):
                     if heater_1_temp > heater_1_max_val:
                         if not self.overtemp_latched[2]:
                             msg = f"Overtemperature: Heater 1 ({heater_1_temp} > {heater_1_max_val})"
-                            print(msg)
-                            log_abnormal_event(msg)
+                            log.warning(msg)
+                            self.journal.record(OVERTEMP, msg, device="TK4_2", value=heater_1_temp, limit=heater_1_max_val)
                             self.overtemp_latched[2] = True
                             self.handle_emergency_button()
                             return
@@ -2297,11 +1861,10 @@ class ControlGUI(wx.Frame):
                 self.overtemp_latched[2] = False
 
         # --- Heater 2 coil overtemperature (ID=1) ---
-            heater_2_temp = self.device_manager.read_temperature(1)
+            heater_2_temp, heater_2_temp_status = self.device_manager.read_temperature(1, max_age=EMERGENCY_MAX_AGE)
             coil_max = self.settings.get("heater_2", {}).get("coil_max_temp", None)
             if (
-                heater_2_temp is not None
-                and isinstance(heater_2_temp, (int, float))
+                heater_2_temp_status == ST_OK
                 and coil_max not in (None, "--", "NC", "")
             ):
                 try:
@@ -2309,8 +1872,8 @@ class ControlGUI(wx.Frame):
                     if heater_2_temp > coil_max_val:
                         if not self.overtemp_latched[1]:
                             msg = f"Overtemperature: Heater 2 ({heater_2_temp} > {coil_max_val})"
-                            print(msg)
-                            log_abnormal_event(msg)
+                            log.warning(msg)
+                            self.journal.record(OVERTEMP, msg, device="TK4_1", value=heater_2_temp, limit=coil_max_val)
                             self.overtemp_latched[1] = True
                             self.handle_emergency_button()
                             return
@@ -2322,11 +1885,10 @@ class ControlGUI(wx.Frame):
                 self.overtemp_latched[1] = False
 
         # --- Reactor overtemperature (ID=3) ---
-            reactor_temp = self.device_manager.read_temperature(3)
+            reactor_temp, reactor_temp_status = self.device_manager.read_temperature(3, max_age=EMERGENCY_MAX_AGE)
             reactor_max = self.settings.get("heater_2", {}).get("reactor_max_temp", None)
             if (
-                reactor_temp is not None
-                and isinstance(reactor_temp, (int, float))
+                reactor_temp_status == ST_OK
                 and reactor_max not in (None, "--", "NC", "")
             ):
                 try:
@@ -2334,8 +1896,8 @@ class ControlGUI(wx.Frame):
                     if reactor_temp > reactor_max_val:
                         if not self.overtemp_latched[3]:
                             msg = f"Overtemperature: Reactor ({reactor_temp} > {reactor_max_val})"
-                            print(msg)
-                            log_abnormal_event(msg)
+                            log.warning(msg)
+                            self.journal.record(OVERTEMP, msg, device="TK4_3", value=reactor_temp, limit=reactor_max_val)
                             self.overtemp_latched[3] = True
                             self.handle_emergency_button()
                             return
@@ -2347,16 +1909,14 @@ class ControlGUI(wx.Frame):
                 self.overtemp_latched[3] = False
 
         # --- Pressure sensors (IDs 1,2,3) ---
-            pressures = self.device_manager.read_pressures()
+            pressures = self.device_manager.read_pressures(max_age=EMERGENCY_MAX_AGE)
             sensor_settings = self.settings.get("sensor_settings", {})
             for i, sensor_id in enumerate([1, 2, 3]):
                 max_press = sensor_settings.get(f"sensor_{sensor_id}_max_pressure", None)
                 value = None
                 if (
                     max_press not in (None, "--", "NC", "")
-                    and pressures is not None
-                    and i < len(pressures)
-                    and pressures[i] not in ("NC", "--", None)
+                    and pressures.ok(i)
                 ):
                     try:
                         value = float(pressures[i])
@@ -2364,8 +1924,9 @@ class ControlGUI(wx.Frame):
                         if value > max_press_val:
                             if not self.overpress_latched[sensor_id]:
                                 msg = f"Overpressure: Sensor {sensor_id} ({value} > {max_press_val})"
-                                print(msg)
-                                log_abnormal_event(msg)
+                                log.warning(msg)
+                                self.journal.record(OVERPRESSURE, msg, device="PSM4", channel=sensor_id,
+                                               value=value, limit=max_press_val)
                                 self.overpress_latched[sensor_id] = True
                                 self.handle_emergency_button()
                                 return
@@ -2378,7 +1939,7 @@ class ControlGUI(wx.Frame):
                     self.overpress_latched[sensor_id] = False
 
         except Exception as e:
-            print(f"Error in check_emergency_conditions: {e}")
+            log.error(f"Error in check_emergency_conditions: {e}")
 
         
         wx.CallLater(500, self.check_emergency_conditions)
@@ -2389,12 +1950,10 @@ class ControlGUI(wx.Frame):
 
 
     def handle_emergency_button(self):
-    # Log every Emergency button press (both activation and reset)
-        log_abnormal_event("Emergency button pressed")
-
         if not self.alarm_active:
         # --- EMERGENCY ACTIVATION ---
-            print("Emergency button pressed!")
+            self.journal.record(EMERGENCY_STOP, "Emergency button pressed")
+            log.warning("Emergency button pressed!")
             self.status_bar_label.SetLabel("EMERGENCY STOP: All heaters and flows OFF!")
             self.status_bar_label.SetForegroundColour(COLOR_RED)
             self.alarm_active = True
@@ -2440,11 +1999,12 @@ class ControlGUI(wx.Frame):
                     winsound.SND_FILENAME | winsound.SND_ASYNC | winsound.SND_LOOP
                 )
             except Exception as e:
-                print(f"Alarm sound error: {e}")
+                log.error(f"Alarm sound error: {e}")
 
         else:
         # --- EMERGENCY RESET ---
-            print("Emergency alarm stopped.")
+            self.journal.record(EMERGENCY_RESET, "Emergency button pressed")
+            log.info("Emergency alarm stopped.")
             self.alarm_active = False
 
         # --- RESUME POLLING ---
@@ -2454,7 +2014,7 @@ class ControlGUI(wx.Frame):
             try:
                 winsound.PlaySound(None, winsound.SND_PURGE)
             except Exception as e:
-                print(f"Alarm stop error: {e}")
+                log.error(f"Alarm stop error: {e}")
 
             self.status_bar_label.SetLabel("System Ready")
             self.status_bar_label.SetForegroundColour(COLOR_BLUE)
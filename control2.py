@@ -460,7 +460,7 @@ class ModbusRelayController:
                 except Exception as e:
                     print(f"Relay: failed to connect before command: {e}")
             try:
-                self.client.write_register(channel, value, slave=self.slave_id)
+                self.client.write_register(channel, value, device_id=self.slave_id)
             except Exception as e:
                 print(f"Relay: write_register error: {e}")
 
@@ -479,14 +479,14 @@ class ModbusRelayController:
         with self.lock:
             if not self.client.is_socket_open():
                 self.client.connect()
-            self.client.write_register(0x0000, 0x0700, slave=self.slave_id)
+            self.client.write_register(0x0000, 0x0700, device_id=self.slave_id)
 
     def close_all(self):
         """Close (deactivate) all relays using the group command."""
         with self.lock:
             if not self.client.is_socket_open():
                 self.client.connect()
-            self.client.write_register(0x0000, 0x0800, slave=self.slave_id)
+            self.client.write_register(0x0000, 0x0800, device_id=self.slave_id)
 
 
 
@@ -1089,7 +1089,7 @@ class DeviceManager:
     def read_temperature(self, slave_id):
         try:
             with self.lock:
-                result = self.client.read_input_registers(0x03E8, count=2, slave=slave_id)
+                result = self.client.read_input_registers(0x03E8, count=2, device_id=slave_id)
             if result.isError():
                 return None
             raw, decimal = result.registers
@@ -1104,7 +1104,7 @@ class DeviceManager:
     def set_sv(self, slave_id, temperature):
         try:
             with self.lock:
-                return not self.client.write_register(0x0000, int(temperature), slave=slave_id).isError()
+                return not self.client.write_register(0x0000, int(temperature), device_id=slave_id).isError()
         except Exception as e:
             print(f"[MODBUS] Failed to set SV on ID {slave_id}: {e}")
             return False
@@ -1112,7 +1112,7 @@ class DeviceManager:
     def start_heater(self, slave_id):
         try:
             with self.lock:
-                return not self.client.write_register(0x0032, 0, slave=slave_id).isError()
+                return not self.client.write_register(0x0032, 0, device_id=slave_id).isError()
         except Exception as e:
             print(f"[MODBUS] Failed to start heater ID {slave_id}: {e}")
             return False
@@ -1120,7 +1120,7 @@ class DeviceManager:
     def stop_heater(self, slave_id):
         try:
             with self.lock:
-                return not self.client.write_register(0x0032, 1, slave=slave_id).isError()
+                return not self.client.write_register(0x0032, 1, device_id=slave_id).isError()
         except Exception as e:
             print(f"[MODBUS] Failed to stop heater ID {slave_id}: {e}")
             return False
@@ -1264,7 +1264,7 @@ class PSM4Controller:
                     response = self.client.read_input_registers(
                         address=addr + 1,
                         count=2,
-                        slave=7
+                        device_id=7
                     )
                     if response.isError():
                         pressures.append("NC")
@@ -1861,7 +1861,7 @@ class ControlGUI(wx.Frame):
                 print(f"MODBUS client not initialized or not connected. Cannot control heater ID {address}.")
                 return False
             value = 1 if state else 0
-            response = self.modbus_client.write_register(address=0x0032, value=value, slave=address)
+            response = self.modbus_client.write_register(address=0x0032, value=value, device_id=address)
             if response.isError():
                 print(f"Error controlling heater ID {address}")
                 return False
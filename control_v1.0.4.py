@@ -1,22 +1,26 @@
+import startup_timer
 import queue
 import math
 import time
 import serial
-from pymodbus.client import ModbusSerialClient
 import dearpygui.dearpygui as dpg
 from datetime import datetime
-import openpyxl
-from openpyxl.utils import get_column_letter
 import os
 import threading
-import struct
-import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="matplotlib")
-import pandas as pd
-import json
 import os
-import multiprocessing
+from log_catalog import LogCatalog, TIMESTAMP_FORMAT, parse_timestamp
+from plot_export import PlotExporter
+from sample_model import ST_NO_DATA
+from devices import TK4_ADDRESSES, DeviceData
+from acquisition import Acquisition, Logger
+from acquisition_service import RemoteAcquisition
+from sample_bus import DEFAULT_NAME
+from driver_log import get_logger
+from driver_stats import STATS, ROW_HEADERS
+from settings_store import SettingsStore, read_settings
+from event_journal import EMERGENCY_RESET, EMERGENCY_STOP, INTERLOCK, LIMIT, EventJournal
 SETTINGS_FILE = "settings.json"
 default_config = {
     "RS485_PORT": "COM6",
@@ -25,77 +29,26 @@ default_config = {
     # Add other default settings as needed
 }
 
-if not os.path.exists(SETTINGS_FILE):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(default_config, f, indent=2)
-
-with open(SETTINGS_FILE) as f:
-    config = json.load(f)
+# Read only: the spawned plot workers re-import this script, so the
+# SettingsStore (writer thread, creates the file) belongs to ControlApplication
+config = read_settings(SETTINGS_FILE, default_config)
     
 SERIAL_PORT = 'COM6'
-BAUDRATE = 9600
-BYTESIZE = 8
-TIMEOUT = 1
-TK4_ADDRESSES = [1, 2, 3, 4]
-TK4_RO_ADDRESSES = [5, 6]
 COLOR_RED = [220, 50, 50]
 COLOR_GREEN = [50, 180, 50]
 COLOR_BLUE = [50, 120, 220]
 COLOR_YELLOW = [220, 220, 0]
 COLOR_WHITE = [255, 255, 255]
 COLOR_GRAY = [200, 200, 200]
-log_filename = f"process_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-with open("settings.json") as f:
-    config = json.load(f)
+log_filename = f"process_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.plog"
+STATS_FILE = "driver_stats.jsonl"
+log = get_logger("control")
 SERIAL_PORT = config.get("RS485_PORT", "COM6")
 GAS_ANALYZER_PORT = config.get("GAS_ANALYZER_PORT", "COM4")
 PM_PORT = config.get("PM_PORT", "COM3")
-class Logger:
-    def __init__(self, filename):
-        
-        self.max_temp = 400.0
-        self.max_press = 5.0
-        self.filename = filename
-        self.columns = [
-            "Timestamp",
-            "Heater1", "Heater2", "Heater3","Heater4'",
-            "Temp1", "Temp2",
-            "PSM4_1", "PSM4_2", "PSM4_3", "PSM4_4",
-            "Power", "Energy",
-            "MFM_Flow",
-            "MFC1_Flow", "MFC2_Flow", "MFC3_Flow", "MFC4_Flow",
-            "CO", "CO2", "CH4", "CnHm", "H2", "O2", "C2H2", "C2H4", "HHV", "N2",
-        ]
-        if not os.path.exists(self.filename):
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(self.columns)
-            for i, col in enumerate(self.columns, 1):
-                ws.column_dimensions[get_column_letter(i)].width = 12
-            wb.save(self.filename)
-
-    def log(self, data, gas_values=None):
-        row = [
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            *[(t if t is not None and t < 2000 else ("NC" if t == 31000 else t)) for t in (data.main_temps if hasattr(data, "main_temps") else [None]*4)],
-            *[(t if t is not None and t < 2000 else ("NC" if t == 31000 else t)) for t in (data.ro_temps if hasattr(data, "ro_temps") else [None]*2)],
-            *(data.pressures if hasattr(data, "pressures") else [None]*4),
-            data.power if hasattr(data, "power") else None,
-            data.energy if hasattr(data, "energy") else None,
-            data.flow if hasattr(data, "flow") else None,
-            *(data.mfc_flows if hasattr(data, "mfc_flows") else [None]*4),
-            *(gas_values.get(gas) if gas_values else None for gas in ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2'])
-        ]
-        try:
-            wb = openpyxl.load_workbook(self.filename)
-            ws = wb.active
-            ws.append(row)
-            wb.save(self.filename)
-        except Exception as e:
-            print(f"[Logger] Logging error: {e}")
-
-
-
+# "127.0.0.1:8765" runs the GUI as a client of acquisition_service.py
+SERVICE_ADDRESS = config.get("ACQUISITION_SERVICE")
+AcquisitionBase = RemoteAcquisition if SERVICE_ADDRESS else Acquisition
 # Fixed hardcoded ports
 #TK4_PORT = 'COM5'
 #PM_PORT = 'COM3'
@@ -109,426 +62,6 @@ COLOR_YELLOW = [220, 220, 0]
 COLOR_WHITE = [255, 255, 255]
 COLOR_GRAY = [200, 200, 200]
 
-class AbnormalEventLogger:
-    def __init__(self, filename="abnormal_events.log"):
-        self.filename = filename
-        # Create the file with headers if it doesn't exist
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w') as f:
-                f.write("Timestamp,Event Description\n")
-
-    def log_event(self, description):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(self.filename, 'a') as f:
-            f.write(f"{timestamp},{description}\n")
-        print(f"Logged event: {timestamp} - {description}")
-class MFCController:
-    def __init__(self, port=SERIAL_PORT, channels=[1,2,3,4]):
-        self.port = port
-        self.channels = channels
-
-    def _checksum(self, data):
-        cs = 0
-        for b in data.encode():
-            cs ^= b
-        return f"{cs:02X}"
-
-    def send_command(self, channel, cmd, addr, value=""):
-        frame_wo_cs = f":{channel:02d}{cmd}{addr}{value}"
-        cs = self._checksum(frame_wo_cs)
-        frame = f"{frame_wo_cs}{cs}\r".encode()
-        
-        with serial.Serial(
-            port=self.port, baudrate=BAUDRATE, bytesize=BYTESIZE,
-            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=0.1
-        ) as ser:
-            ser.write(frame)
-            resp = ser.read_until(b'\r')
-            return resp
-
-    def read_flow(self, channel):
-        resp = self.send_command(channel, "03", "0038")
-        if not resp or not resp.startswith(b':'):
-            return None
-        data_ascii = resp[7:15].decode()
-        return struct.unpack('>f', bytes.fromhex(data_ascii))[0]
-
-    def set_flow(self, channel, value):
-    # Build IEEE754 float as 8 ASCII hex chars
-        hexval = struct.pack('!f', float(value)).hex().upper()
-    # Correct command for TSM-D: Command "01", DataType "07"
-        resp = self.send_command(channel, "01", "07", hexval)
-    # Optionally, check response for success:
-        return resp.startswith(f":{channel:02d}81".encode())
-
-
-
-
-    def on_off(self, channel, state):
-        val = "01" if state else "00"
-        resp = self.send_command(channel, "58", "02", val)
-    # Response should start with :{channel}D8 for success
-        return resp.startswith(f":{channel:02d}D8".encode())
-
-
-    def read_all_flows(self):
-        return [self.read_flow(ch) for ch in self.channels]
-
-class PowerMeter:
-    def __init__(self, port=PM_PORT):
-        self.port = port
-        self.ser = None
-        self.lock = threading.Lock()
-        
-    def connect(self):
-        """Connect and initialize power meter using correct commands"""
-        try:
-            self.ser = serial.Serial(
-                port=self.port,
-                baudrate=9600,
-                bytesize=8,
-                parity='N',
-                stopbits=2,
-                timeout=2,
-                write_timeout=5,
-                inter_byte_timeout=0.5
-            )
-            self._send(":COMMunicate:REMote ON")
-            self._send(":NUMERIC:NORMAL:ITEM4 WH,1")
-            self._send(":SCALING:CT:ELEMENT1 10")
-            time.sleep(0.5)
-            return True
-        except Exception as e:
-            print(f"PM connection failed: {str(e)}")
-            if self.ser and self.ser.is_open:
-                self.close()
-            return False
-    
-    def _send(self, cmd, read_response=True):
-        """Send command and get response"""
-        with self.lock:
-            self.ser.write(f"{cmd}\r\n".encode())
-            time.sleep(0.2)
-            if read_response:
-                return self.ser.read_all().decode().strip()
-            return None
-    
-    def is_connected(self):
-        """Check if power meter is connected"""
-        return self.ser is not None and self.ser.is_open
-    
-    def read_power(self):
-        """Read active power using correct command"""
-        try:
-            response = self._send(":NUMERIC:NORMAL:VALUE?3")
-            if response:
-                return float(response)
-            return 0.0
-        except Exception as e:
-            print(f"Power read error: {str(e)}")
-            return 0.0
-    
-    def read_energy(self):
-        """Read accumulated energy"""
-        try:
-            response = self._send(":NUMERIC:NORMAL:VALUE?4")
-            if response:
-                return float(response)
-            return 0.0
-        except Exception as e:
-            print(f"Energy read error: {str(e)}")
-            return 0.0
-    
-    def start_integration(self):
-        """Start energy integration"""
-        self.reset_integration()
-        self._send(":INTEGrate:STARt", False)
-    
-    def stop_integration(self):
-        """Stop energy integration"""
-        self._send(":INTEGrate:STOP", False)
-    
-    def reset_integration(self):
-        """Reset integration counters"""
-        self._send(":INTEGrate:RESet", False)
-        time.sleep(0.5)
-    
-    def close(self):
-        """Close connection properly"""
-        if self.ser and self.ser.is_open:
-            self._send(":COMMunicate:REMote OFF", False)
-            self.ser.close()
-            self.ser = None
-
-class TK4Controller:
-    def __init__(self, client):
-        self.client = client
-        self.lock = threading.Lock()
-
-    
-
-    def close(self):
-        if self.client:
-            self.client.close()
-
-
-            
-    def read_temperature(self, address):
-        """Read temperature from controller"""
-        try:
-            with self.lock:
-                response = self.client.read_input_registers(
-                    address=0x03E8, 
-                    count=2, 
-                    slave=address
-                )
-                if response.isError():
-                    return None
-                raw_pv, decimal_point = response.registers
-                return raw_pv / (10 ** decimal_point)
-        except Exception as e:
-            print(f"Temperature read error: {str(e)}")
-            return None
-    
-    def set_setpoint(self, address, temperature):
-        """Set temperature setpoint"""
-        try:
-            with self.lock:
-                response = self.client.write_register(
-                    address=0x0000,
-                    value=int(temperature ),  # 0.1°C resolution
-                    slave=address
-                )
-                return not response.isError()
-        except Exception as e:
-            print(f"Set temperature error: {str(e)}")
-            return False
-    
-    def control_heater(self, address, state):
-        """Control heater state (on/off)"""
-        try:
-            with self.lock:
-                response = self.client.write_register(
-                    address=0x0032,
-                    value=int(state),
-                    slave=address
-                )
-                if response.isError():
-                    print(f"Control heater error: {response}")
-                    return False
-                return True
-        except Exception as e:
-            print(f"Control heater error: {str(e)}")
-        # Do NOT close the client here!
-            return False
-
-    
-    def close(self):
-        """Close connection"""
-        if self.client:
-            self.client.close()
-
-class ModbusRelayController:
-    def __init__(self, client, slave_id=8):
-        self.client = client
-        self.slave_id = slave_id
-        self.lock = threading.Lock()
-
-    def send_pulse(self, channel, duration=1.0):
-        # This method is now synchronous and must be called only from the worker thread!
-        try:
-            self._write_channel(channel, 'on')
-            time.sleep(duration)
-            self._write_channel(channel, 'off')
-        except Exception as e:
-            print(f"Relay pulse error on channel {channel}: {e}")
-
-    def _write_channel(self, channel, command):
-        value = {'on': 0x0100, 'off': 0x0200}[command]
-        print(f"Relay {channel} -> {command.upper()}")
-        self.client.write_register(channel, value, slave=self.slave_id)
-
-    def open_all(self):
-        """Open (activate) all relay channels using the group command."""
-        try:
-        # 0x0000 register, value 0x0700 (per manual: Open all)
-            self.client.write_register(0x0000, 0x0700, slave=self.slave_id)
-            print("All relays OPEN (ON)")
-        except Exception as e:
-            print(f"Relay open_all error: {e}")
-
-    def close_all(self):
-        """Close (deactivate) all relay channels using the group command."""
-        try:
-        # 0x0000 register, value 0x0800 (per manual: Close all)
-            self.client.write_register(0x0000, 0x0800, slave=self.slave_id)
-            print("All relays CLOSED (OFF)")
-        except Exception as e:
-            print(f"Relay close_all error: {e}")
-
-
-class PSM4Controller:
-    def __init__(self, client):
-        self.client = client  # Share TK4's Modbus client
-        self.lock = threading.Lock()
-
-    def read_pressures(self):
-        """Read all 4 pressure channels (ID=7)"""
-        pressures = []
-        base_addrs = [0x03E8, 0x03ED, 0x03F2, 0x03F7]
-        try:
-            with self.lock:
-                for addr in base_addrs:
-                    response = self.client.read_input_registers(
-                        address=addr + 1,
-                        count=2,
-                        slave=7
-                    )
-                    if response.isError():
-                        pressures.append("NC")
-                        continue
-                    raw, decimal = response.registers
-                # Correct scaling: divide by 10
-                    val = raw / (10 ** decimal) / 10.0
-                # If value > 20 bar, show NC
-                    if val > 20.0:
-                        pressures.append("NC")
-                    else:
-                        pressures.append(round(val, 2))
-
-            return pressures
-        except Exception as e:
-            print(f"PSM4 read error: {str(e)}")
-            return ["NC"]*4
-    def close(self):
-        if self.client:
-            self.client.close()
-
-
-
-# --- MFM (TSM-D) ---
-import time
-import serial
-import struct
-
-class MFMFlowMeter:
-    def __init__(self, port='COM6', device_id=1):
-        self.port = port
-        self.device_id = device_id
-
-    def _checksum(self, frame_wo_cs):
-        cs = 0
-        for b in frame_wo_cs.encode():
-            cs ^= b
-        return f"{cs:02X}"
-
-    def build_read_flow_frame(self):
-        id_ascii = f"{self.device_id:02X}"
-        frame_wo_cs = f":{id_ascii}0300"
-        cs = self._checksum(frame_wo_cs)
-        return f"{frame_wo_cs}{cs}\r".encode()
-
-    def read_flow(self):
-        
-        # Always open and close the port for each read, just like mfm_mfc1.py
-        with serial.Serial(
-            port=self.port, baudrate=BAUDRATE, bytesize=BYTESIZE,
-            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=TIMEOUT
-        ) as ser:
-            frame = self.build_read_flow_frame()
-                #print(f"[MFM] Sending: {frame!r}")
-            ser.write(frame)
-            resp = ser.read_until(b'\r')
-                #print(f"[MFM] Raw response: {resp!r}")
-            if not resp.startswith(b':'):
-                raise ValueError("Invalid response")
-            if len(resp) < 16:
-                raise ValueError(f"Response too short: {len(resp)} bytes")
-            try:
-                data_ascii = resp[7:15].decode('ascii')
-                data_bytes = bytes.fromhex(data_ascii)
-                return struct.unpack('>f', data_bytes)[0]
-            except Exception as e:
-                print(f"[MFM] Hex dump: {resp.hex()}")
-                raise e
-
-class GasAnalyzer:
-    def __init__(self, port="COM10"):
-        self.port = port
-        self.ser = None
-
-    def connect(self):
-        try:
-            self.ser = serial.Serial(self.port, baudrate=9600, timeout=1)
-            return True
-        except Exception as e:
-            print(f"Gas analyzer connection error: {e}")
-            self.ser = None
-            return False
-
-    def close(self):
-        if self.ser:
-            self.ser.close()
-            self.ser = None
-
-    def read_gases(self):
-        if not self.ser or not self.ser.is_open:
-            if not self.connect():
-                return None
-        try:
-            self.ser.reset_input_buffer()
-            self.ser.write(bytes([0x11, 0x01, 0x01, 0xed]))
-            time.sleep(0.2)
-            nbytes = self.ser.in_waiting
-            if nbytes >= 20:
-                data = self.ser.read(nbytes)
-                #print(f"Raw gas analyzer response: {data.hex()} ({len(data)} bytes)")
-                # Try both with and without header skip
-                #if len(data) == 20:
-                    #raw = data
-                if len(data) >= 23:
-                    raw = data[3:23]
-                else:
-                    print(f"Unexpected data length: {len(data)}")
-                    return None
-                gas_names = ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']
-                readings = {}
-                for i, name in enumerate(gas_names):
-                    value_bytes = raw[i*2:i*2+2]
-                    value = int.from_bytes(value_bytes, byteorder='big', signed=False)
-                    readings[name] = value / 100.0
-                return readings
-            else:
-                print("Not enough bytes received from analyzer.")
-                return None
-        except Exception as e:
-            print(f"Gas analyzer read error: {e}")
-            return None
-
-
-
-
-
-
-
-class DeviceData:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.main_temps = [None] * 4
-        self.ro_temps = [None] * 2
-        self.setpoints = [25.0] * 4
-        self.controller_states = [False] * 4
-        self.controllers_enabled = [True, True, True, True]
-        self.readonly_enabled = [True, True]
-        self.pressures = ["--"] * 4
-        self.power = None
-        self.energy = None
-        self.flow = None
-        self.last_update = None
-        self.mfc_flows = [None] * 4
-
-
-
 def get_timestamped_filename(prefix="plot", ext="png"):
     now = datetime.now()
 
@@ -549,24 +82,19 @@ def get_data_type(col):
         return "Gas"
     return "Other"
 
-def find_most_recent_excel_file(folder_path):
-    files = [f for f in os.listdir(folder_path) if f.endswith('.xlsx')]
-    if not files:
-        return None
-    full_paths = [os.path.join(folder_path, f) for f in files]
-    most_recent_file = max(full_paths, key=os.path.getmtime)
-    return most_recent_file
-
 def plot_callback(user_data, x_axis_id, y_axis_ids):
+    import pandas as pd
     df = user_data['df']
+    for axis_id in y_axis_ids.values():
+        dpg.delete_item(axis_id, children_only=True)
+    if df.empty:
+        return
     timestamps = df['Timestamp'].map(pd.Timestamp.timestamp)
     x = (timestamps - timestamps.iloc[0]).tolist()
     axes_with_data = {k: False for k in y_axis_ids}
-    for axis_id in y_axis_ids.values():
-        dpg.delete_item(axis_id, children_only=True)
     for col in user_data['series']:
         if col in df.columns:
-            y = pd.to_numeric(df[col], errors='coerce').tolist()
+            y = df[col].tolist()
             dtype = get_data_type(col)
             if dtype == "Temperature":
                 axis_tag = "y_axis1"
@@ -592,98 +120,65 @@ def make_update_callback(user_data, x_axis_id, y_axis_ids):
         update_plot(sender, app_data, user_data, x_axis_id, y_axis_ids)
     return callback
 
-def save_plot_worker(user_data_dict, filename):
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-GUI backend
-    import matplotlib.pyplot as plt
-    import pandas as pd
+def make_load_window_callback(user_data, x_axis_id, y_axis_ids):
+    def callback(sender, app_data):
+        bounds = []
+        for tag in ("plot_from", "plot_to"):
+            text = dpg.get_value(tag).strip()
+            value = parse_timestamp(text) if text else None
+            if text and value is None:
+                dpg.set_value("plot_window_status", "Use the format YYYY-MM-DD HH:MM:SS")
+                return
+            bounds.append(value)
+        user_data['catalog'].refresh()
+        user_data['df'] = user_data['catalog'].load_window(*bounds)
+        dpg.set_value("plot_window_status", f"{len(user_data['df'])} rows")
+        plot_callback(user_data, x_axis_id, y_axis_ids)
+    return callback
 
-    df = pd.DataFrame(user_data_dict['df'])
-    x = (pd.to_datetime(df['Timestamp']) - pd.to_datetime(df['Timestamp']).iloc[0]).dt.total_seconds()
-
-    groups = {"Temperature": [], "Pressure": [], "Other": []}
-    for col in user_data_dict['series']:
-        dtype = None
-        name = col.lower()
-        if any(x in name for x in ["temp", "heater"]):
-            dtype = "Temperature"
-        elif any(x in name for x in ["press", "psm4"]):
-            dtype = "Pressure"
-        else:
-            dtype = "Other"
-        groups[dtype].append(col)
-
-    fig, ax1 = plt.subplots(figsize=(12,6))
-    color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
-
-    if groups["Temperature"]:
-        for i, col in enumerate(groups["Temperature"]):
-            y = pd.to_numeric(df[col], errors='coerce')
-            ax1.plot(x, y, label=col, color=color_cycle[i % len(color_cycle)])
-        ax1.set_ylabel("Temperature (°C)")
-        ax1.tick_params(axis='y')
-    else:
-        ax1.set_yticks([])
-
-    ax2 = None
-    if groups["Pressure"]:
-        ax2 = ax1.twinx()
-        for i, col in enumerate(groups["Pressure"]):
-            y = pd.to_numeric(df[col], errors='coerce')
-            ax2.plot(x, y, label=col,  color=color_cycle[(i+3) % len(color_cycle)])
-        ax2.set_ylabel("Pressure (bar)")
-        ax2.tick_params(axis='y')
-
-    ax3 = None
-    if groups["Other"]:
-        ax3 = ax1.twinx()
-        ax3.spines["right"].set_position(("axes", 1.1))
-        for i, col in enumerate(groups["Other"]):
-            y = pd.to_numeric(df[col], errors='coerce')
-            ax3.plot(x, y, label=col,  color=color_cycle[(i+6) % len(color_cycle)])
-        ax3.set_ylabel("Flow (slm) / Power (W, Wh) / Gas (%) / Other")
-        ax3.tick_params(axis='y')
-
-    ax1.set_xlabel("Time (s from start)")
-
-    lines, labels = ax1.get_legend_handles_labels()
-    if ax2:
-        l2, lab2 = ax2.get_legend_handles_labels()
-        lines += l2
-        labels += lab2
-    if ax3:
-        l3, lab3 = ax3.get_legend_handles_labels()
-        lines += l3
-        labels += lab3
-    if lines:
-        ax1.legend(lines, labels, loc='best')
-
-    plt.tight_layout()
-    plt.savefig(filename, bbox_inches='tight')
-    plt.close()
+# Export results come back on the pool's result thread; the render loop
+# shows them (show_plot_messages), DearPyGui is only touched from there
+plot_messages = queue.SimpleQueue()
+
+def on_plot_exported(filename, error):
+    plot_messages.put(f"Plot export failed: {error}" if error is not None else f"Plot saved as {filename}")
+
+def show_plot_messages():
+    while not plot_messages.empty():
+        message = plot_messages.get()
+        log.info(f"[Plot] {message}")
+        if dpg.does_item_exist("plot_window_status"):
+            dpg.set_value("plot_window_status", message)
 
 
 def save_plot_matplotlib(user_data):
+    columns = list(user_data['series'])
+    if not columns or user_data['df'].empty:
+        return
     filename = get_timestamped_filename("plot")
-    save_plot_worker(user_data, filename)
-    print(f"Plot saved as {filename}")
+    user_data['exporter'].export_frame(
+        user_data['df'], columns, [get_data_type(c) for c in columns], filename,
+        axis_labels={"Other": "Flow (slm) / Power (W, Wh) / Gas (%) / Other"},
+        figsize=(12, 6), on_done=on_plot_exported)
+    dpg.set_value("plot_window_status", f"Saving {filename}...")
 
 
-def show_plot_window(log_file=None, blue_button_theme=None):
+def show_plot_window(log_catalog, plot_exporter, log_file=None, blue_button_theme=None):
     if dpg.does_item_exist("history_plot_window"):
         dpg.delete_item("history_plot_window")
 
+    log_catalog.refresh()
     if log_file is not None:
-        file = log_file
+        segment = next((seg for seg in log_catalog.segments() if os.path.samefile(seg.path, log_file)), None)
     else:
-        file = find_most_recent_excel_file(".")
-    if file is None:
+        segment = log_catalog.latest()
+    if segment is None:
         print("No Excel files found in the folder.")
         return
-    df = pd.read_excel(file)
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    start, end = segment.start, segment.end
+    df = log_catalog.load_window(start, end)
     available = [c for c in df.columns if c != "Timestamp"]
-    user_data = {'df': df, 'series': [], 'available': available}
+    user_data = {'df': df, 'series': [], 'available': available, 'catalog': log_catalog, 'exporter': plot_exporter}
     default_selected = available[:1] if len(available) >= 3 else available
     user_data['series'] = default_selected
     with dpg.window(label="History Plot", width=1100, height=700, tag="history_plot_window"):
@@ -695,6 +190,15 @@ def show_plot_window(log_file=None, blue_button_theme=None):
             y_axis2 = dpg.add_plot_axis(dpg.mvYAxis2, label="Pressure (bar)", tag="y_axis2")
             y_axis3 = dpg.add_plot_axis(dpg.mvYAxis3, label="Flow (slm) / Power (W, Wh) / Gas (%) / Other", tag="y_axis3")
             y_axis_ids = {"y_axis1": y_axis1, "y_axis2": y_axis2, "y_axis3": y_axis3}
+        first, last = log_catalog.span()
+        with dpg.group(horizontal=True):
+            dpg.add_input_text(label="From", tag="plot_from", default_value=start.strftime(TIMESTAMP_FORMAT), width=170)
+            dpg.add_input_text(label="To", tag="plot_to", default_value=end.strftime(TIMESTAMP_FORMAT), width=170)
+            dpg.add_button(label="Load", tag="plot_load_btn", callback=make_load_window_callback(user_data, x_axis_id, y_axis_ids))
+            dpg.add_text(f"Logged: {first:%Y-%m-%d %H:%M} .. {last:%Y-%m-%d %H:%M}", color=COLOR_GRAY)
+            dpg.add_text("", tag="plot_window_status", color=COLOR_YELLOW)
+        if blue_button_theme is not None:
+            dpg.bind_item_theme("plot_load_btn", blue_button_theme)
         dpg.add_button(label="Save Plot", tag="save_plot_btn", callback=lambda s, a: save_plot_matplotlib(user_data))
         if blue_button_theme is not None:
             dpg.bind_item_theme("save_plot_btn", blue_button_theme)
@@ -717,16 +221,25 @@ def show_plot_window(log_file=None, blue_button_theme=None):
 
 
 
-class ControlApplication:
+class ControlApplication(AcquisitionBase):
     def __init__(self):
         self.running = True
         # --- Data, settings, and devices ---
         self.button_command_queue = queue.Queue()
         self.serial_command_queue = queue.Queue()
-        
-        self.data = DeviceData()
-        self.max_temp = 400.0
-        self.max_press = 5.0
+        # Creates settings.json with the defaults when it is missing; writes happen in the background
+        self.settings_store = SettingsStore(SETTINGS_FILE, default_config, indent=2)
+        self.log_catalog = LogCatalog(".")
+        self.plot_exporter = PlotExporter()
+
+        # Devices, DeviceData and the polling pass live in acquisition.py
+        if SERVICE_ADDRESS:
+            super().__init__(SERVICE_ADDRESS, config.get("SAMPLE_SHM", DEFAULT_NAME))
+        else:
+            # LOG_CHANNEL_TIMES: also log when each value was read (.ptimes next to the log)
+            logger = Logger(log_filename, channel_times=bool(config.get("LOG_CHANNEL_TIMES", False)))
+            super().__init__(SERIAL_PORT, PM_PORT, GAS_ANALYZER_PORT, logger=logger,
+                             modbus_transport=config.get("MODBUS_TRANSPORT", "pymodbus"))
         self.load_settings()
         self.pause_polling_event = threading.Event()
         self.serial_command_queue = queue.Queue()
@@ -734,47 +247,18 @@ class ControlApplication:
         self.mfc_states = [False]*4
         self.pre_emergency_heater_states = [False] * 4  # For 4 heaters
         self.pre_emergency_mfc_states = [False] * 4     # For 4 MFCs
-        self.abnormal_logger = AbnormalEventLogger()
-
-        # Devices
-        self.pm = PowerMeter(port=PM_PORT)
-        self.pm_enabled = True
-        if self.pm_enabled:
-            self.pm.connect()
-        self.mfm = MFMFlowMeter(port=SERIAL_PORT, device_id=1)
-        self.mfm_enabled = True
-        self.logger = Logger(log_filename)
-        self.mfc = MFCController(port=SERIAL_PORT)
-        self.mfc_enabled = True
-        self.gas_analyzer = GasAnalyzer(port=GAS_ANALYZER_PORT)
-        self.gas_analyzer_enabled = True
-        self.gas_values = {k: None for k in ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']}
+        self.journal = EventJournal()
         self.alarm_enabled = True
-        self.modbus_client = ModbusSerialClient(
-            port=SERIAL_PORT, baudrate=BAUDRATE, parity='N',
-            stopbits=2, bytesize=8,timeout=0.2, retries=0)
-        self.modbus_client.connect()
-        self.tk4 = TK4Controller(self.modbus_client)
-        self.psm4 = PSM4Controller(self.modbus_client)
-        self.relay = ModbusRelayController(self.modbus_client, slave_id=8)
 
         # Start worker thread
         self.worker_thread = threading.Thread(target=self.serial_worker, daemon=True)
         self.worker_thread.start()
+        STATS.start_dump(STATS_FILE, interval=60.0)
 
     # --- Settings ---
     def save_settings(self):
-    # Load existing settings if present
-        settings = {}
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, "r") as f:
-                try:
-                    settings = json.load(f)
-                except Exception:
-                    settings = {}
-
-    # Update only the keys you want to change
-        settings.update({
+    # Update only the keys the GUI owns; the store keeps every other key and writes in the background
+        self.settings_store.update({
             "max_temp": self.max_temp,
             "max_press": self.max_press,
             "setpoints": self.data.setpoints,
@@ -784,15 +268,8 @@ class ControlApplication:
             "mfc_states": list(self.mfc_states),
         })
 
-    # Write the updated dictionary back to the file, preserving all other keys
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump(settings, f, indent=2)
-
     def load_settings(self):
-        if not os.path.exists(SETTINGS_FILE):
-            return
-        with open(SETTINGS_FILE, "r") as f:
-            settings = json.load(f)
+        settings = self.settings_store.data
         self.max_temp = settings.get("max_temp", self.max_temp)
         self.max_press = settings.get("max_press", self.max_press)
         self.data.setpoints = settings.get("setpoints", self.data.setpoints)
@@ -822,347 +299,31 @@ class ControlApplication:
                 # No command: do periodic polling
                     self.handle_polling()
             except Exception as e:
-                print(f"[Worker] Unexpected error: {e}")
+                log.error(f"[Worker] Unexpected error: {e}")
             # Continue running even if an error occurs
                 
-    def process_command(self, command):
-        cmd_type = command.get("cmd")
-        reply_queue = command.get("reply_queue", None)
-
-    # --- TK4 (Modbus) ---
-        if cmd_type == "read_tk4":
-            addr = command["address"]
-            try:
-                value = self.tk4.read_temperature(addr)
-            except Exception as e:
-                print(f"[Worker] read_tk4 error: {e}")
-                value = None
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "address": addr, "value": value})
-
-        elif cmd_type == "set_tk4_sv":
-            addr = command["address"]
-            val = command["value"]
-            t0 = time.time()
-            try:
-                result = self.tk4.set_setpoint(addr, val)
-            except Exception as e:
-                print(f"[Worker] set_tk4_sv error: {e}")
-                result = False
-            t1 = time.time()
-            print(f"[Worker] set_tk4_sv took {t1-t0:.2f}s")
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
-
-        elif cmd_type == "start_tk4":
-            addr = command["address"]
-            try:
-                result = self.tk4.control_heater(addr, False)
-            except Exception as e:
-                print(f"start_tk4 error: {e}")
-                result = False
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "address": addr, "success": result})
-
-        
-
-    # --- PSM4 (Modbus) ---
-        elif cmd_type == "read_psm4":
-            try:
-                values = self.psm4.read_pressures()
-            except Exception as e:
-                print(f"[Worker] read_psm4 error: {e}")
-                values = ["NC"] * 4
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "values": values})
-
-    # --- Relay (Modbus) ---
-        elif cmd_type == "relay_pulse":
-            channel = command["channel"]
-            duration = command.get("duration", 1.0)
-            try:
-                self.relay.send_pulse(channel, duration)
-                success = True
-            except Exception as e:
-                print(f"[Worker] relay_pulse error: {e}")
-                success = False
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "channel": channel, "success": success})
-
-    # --- MFC (ASCII, needs port switch) ---
-        elif cmd_type in ("set_mfc_flow", "on_off_mfc", "read_mfc"):
-            try:
-                self.modbus_client.close()
-                if cmd_type == "set_mfc_flow":
-                    ch = command["channel"]
-                    val = command["value"]
-                    try:
-                        result = self.mfc.set_flow(ch, val)
-                    except Exception as e:
-                        print(f"[Worker] set_mfc_flow error: {e}")
-                        result = False
-                    if reply_queue:
-                        reply_queue.put({"cmd": cmd_type, "channel": ch, "success": result})
-                elif cmd_type == "on_off_mfc":
-                    ch = command["channel"]
-                    state = command["state"]
-                    try:
-                        result = self.mfc.on_off(ch, state)
-                    except Exception as e:
-                        print(f"[Worker] on_off_mfc error: {e}")
-                        result = False
-                    if reply_queue:
-                        reply_queue.put({"cmd": cmd_type, "channel": ch, "success": result})
-                elif cmd_type == "read_mfc":
-                    ch = command["channel"]
-                    try:
-                        value = self.mfc.read_flow(ch)
-                    except Exception as e:
-                        print(f"[Worker] read_mfc error: {e}")
-                        value = None
-                    if reply_queue:
-                        reply_queue.put({"cmd": cmd_type, "channel": ch, "value": value})
-            finally:
-                try:
-                    self.modbus_client.connect()
-                    self.tk4.client = self.modbus_client
-                    self.psm4.client = self.modbus_client
-                    self.relay.client = self.modbus_client
-                except Exception as e:
-                    print(f"[Worker] Error reconnecting Modbus after MFC: {e}")
-
-    # --- MFM (ASCII, needs port switch) ---
-        elif cmd_type == "read_mfm":
-            try:
-                self.modbus_client.close()
-                try:
-                    value = self.mfm.read_flow()
-                except Exception as e:
-                    print(f"[Worker] read_mfm error: {e}")
-                    value = None
-                if reply_queue:
-                    reply_queue.put({"cmd": cmd_type, "value": value})
-            finally:
-                try:
-                    self.modbus_client.connect()
-                    self.tk4.client = self.modbus_client
-                    self.psm4.client = self.modbus_client
-                    self.relay.client = self.modbus_client
-                except Exception as e:
-                    print(f"[Worker] Error reconnecting Modbus after MFM: {e}")
-
-    # --- Gas Analyzer (separate port) ---
-        elif cmd_type == "read_gas":
-            try:
-                values = self.gas_analyzer.read_gases()
-            except Exception as e:
-                print(f"[Worker] read_gas error: {e}")
-                values = None
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "values": values})
-
-    # --- Poll all devices (periodic) ---
-        elif cmd_type == "read_all":
-            try:
-                self.handle_polling()
-            except Exception as e:
-                print(f"[Worker] handle_polling error: {e}")
-        
-        elif cmd_type == "relay_open_all":
-            try:
-                self.relay.open_all()
-                success = True
-            except Exception as e:
-                print(f"[Worker] relay_open_all error: {e}")
-                success = False
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "success": success})
-
-        elif cmd_type == "relay_close_all":
-            try:
-                self.relay.close_all()
-                success = True
-            except Exception as e:
-                print(f"[Worker] relay_close_all error: {e}")
-                success = False
-            if reply_queue:
-                reply_queue.put({"cmd": cmd_type, "success": success})
-
-
-
-    def handle_polling(self):
-    # 1. TK4 main controllers (poll one by one, yield to button queue between)
-        for i, addr in enumerate(TK4_ADDRESSES):
-            if self.data.controllers_enabled[i]:
-                try:
-                    self.data.main_temps[i] = self.tk4.read_temperature(addr)
-                except Exception as e:
-                    print(f"TK4 polling error for addr {addr}: {e}")
-                    self.data.main_temps[i] = None
-        # Yield to urgent button commands
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return  # After processing, return to main worker loop
-            except queue.Empty:
-                pass
-
-    # 2. TK4 read-only sensors
-        for i, addr in enumerate(TK4_RO_ADDRESSES):
-            if self.data.readonly_enabled[i]:
-                try:
-                    self.data.ro_temps[i] = self.tk4.read_temperature(addr)
-                except Exception as e:
-                    print(f"TK4 RO polling error for addr {addr}: {e}")
-                    self.data.ro_temps[i] = None
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return
-            except queue.Empty:
-                pass
-
-    # 3. PSM4 pressures
-        try:
-            self.data.pressures = self.psm4.read_pressures()
-        except Exception as e:
-            print(f"PSM4 polling error: {e}")
-            self.data.pressures = ["NC"] * 4
+    # --- Polling (see Acquisition.poll_once/process_command) ---
+    def service_pending(self):
+        # Yield to urgent button commands between device reads
         try:
             command = self.button_command_queue.get_nowait()
-            self.process_command(command)
-            return
         except queue.Empty:
-            pass
-        
-        if any(temp is not None and temp != 31000 and temp > self.max_temp for temp in self.data.main_temps):
-            self.abnormal_logger.log_event("Max temperature exceeded")
-            self.handle_emergency_stop()
-            return
-
-    # Check for over-pressure
-        if any(
-            press is not None and press != "NC" and press > self.max_press
-            for press in self.data.pressures
-        ):
-            self.abnormal_logger.log_event("Max pressure exceeded")
-            self.handle_emergency_stop()
-            +eturn
-        
-    # 4. Power meter (if enabled)
-        if self.pm_enabled:
-            try:
-                self.data.power = self.pm.read_power()
-                self.data.energy = self.pm.read_energy()
-            except Exception as e:
-                print(f"Power meter polling error: {e}")
-                self.data.power = None
-                self.data.energy = None
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return
-            except queue.Empty:
-                pass
-
-    # 5. Close Modbus before MFM/MFC
-        try:
-            self.modbus_client.close()
-        except Exception as e:
-            print(f"Modbus close error: {e}")
-
-    # 6. MFM
-        if self.mfm_enabled:
-            try:
-                self.data.flow = self.mfm.read_flow()
-            except Exception as e:
-                print(f"MFM polling error: {e}")
-                self.data.flow = None
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return
-            except queue.Empty:
-                pass
-
-    # 7. MFC
-        if self.mfc_enabled:
-            try:
-                self.data.mfc_flows = self.mfc.read_all_flows()
-            except Exception as e:
-                print(f"MFC polling error: {e}")
-                self.data.mfc_flows = [None] * 4
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return
-            except queue.Empty:
-                pass
-
-    # 8. Reopen Modbus after
-        try:
-            self.modbus_client.connect()
-            self.tk4.client = self.modbus_client
-            self.psm4.client = self.modbus_client
-            self.relay.client = self.modbus_client
-        except Exception as e:
-            print(f"Modbus reconnect error: {e}")
-        try:
-            command = self.button_command_queue.get_nowait()
-            self.process_command(command)
-            return
-        except queue.Empty:
-            pass
-
-    # 9. Gas analyzer
-        if self.gas_analyzer_enabled and self.gas_analyzer:
-            try:
-                vals = self.gas_analyzer.read_gases()
-                if vals and isinstance(vals, dict):
-                    for k in self.gas_values:
-                        self.gas_values[k] = vals.get(k)
-            except Exception as e:
-                print(f"Gas analyzer read error: {e}")
-            try:
-                command = self.button_command_queue.get_nowait()
-                self.process_command(command)
-                return
-            except queue.Empty:
-                pass
-
-    # 10. Logging
-        try:
-            self.logger.log(self.data, self.gas_values)
-        except Exception as e:
-            print(f"Logger error: {e}")
-
-        time.sleep(1)
-
-
+            return False
+        self.process_command(command)
+        return True
 
+    def on_limit_exceeded(self, description, **event):
+        self.journal.record(event.pop("code", LIMIT), description, **event)
+        self.handle_emergency_stop()
 
-        self.data.ro_temps = [self.tk4.read_temperature(addr) for addr in TK4_RO_ADDRESSES]
-        self.data.pressures = self.psm4.read_pressures()
-    # Close Modbus before MFC/MFM
-        self.modbus_client.close()
-        self.data.flow = self.mfm.read_flow()
-        self.data.mfc_flows = self.mfc.read_all_flows()
-    # Reopen Modbus after
-        self.modbus_client.connect()
-        self.tk4.client = self.modbus_client
-        self.psm4.client = self.modbus_client
-        self.relay.client = self.modbus_client
-        if self.gas_analyzer_enabled and self.gas_analyzer:
-            try:
-                vals = self.gas_analyzer.read_gases()
-                if vals and isinstance(vals, dict):
-                    for k in self.gas_values:
-                        self.gas_values[k] = vals.get(k)
-            except Exception as e:
-                print(f"Gas analyzer read error: {e}")
-        self.logger.log(self.data, self.gas_values)
-
-        time.sleep(1)
+    def on_interlock(self, description):
+        # Client mode: the service already ran the emergency stop
+        self.journal.record(INTERLOCK, description)
+        self.pre_emergency_heater_states = list(self.data.controller_states)
+        self.pre_emergency_mfc_states = list(self.mfc_states)
+        self.save_settings()
+        self.show_alarm(f"EMERGENCY STOP ACTIVATED!\n{description}")
+        self.update_status(f"EMERGENCY STOP: {description}", COLOR_RED)
 
 
     # --- GUI callbacks use the queue ---
@@ -1304,7 +465,7 @@ class ControlApplication:
                 mfm_result = ser.readline().decode().strip()
 
         except Exception as e:
-            print(f"MFM read error: {e}")
+            log.error(f"MFM read error: {e}")
             mfm_result = None
 
         finally:
@@ -1317,7 +478,7 @@ class ControlApplication:
                     self.psm4.client = self.modbus_client
                     self.relay.client = self.modbus_client
             except Exception as e:
-                print(f"Error reconnecting Modbus after MFM: {e}")
+                log.error(f"Error reconnecting Modbus after MFM: {e}")
 
         return mfm_result
 
@@ -1371,7 +532,8 @@ class ControlApplication:
      
     def handle_emergency_stop(self, sender=None, app_data=None):
     # Save current ON/OFF states before emergency stop
-        self.abnormal_logger.log_event("Emergency stop activated")
+        self.journal.record(EMERGENCY_STOP, "Emergency stop activated",
+                            heaters=list(self.data.controller_states), mfcs=list(self.mfc_states))
         self.pre_emergency_heater_states = list(self.data.controller_states)
         self.pre_emergency_mfc_states = list(self.mfc_states)
         self.save_settings()
@@ -1386,7 +548,7 @@ class ControlApplication:
         try:
             relay_open_queue.get(timeout=2)
         except queue.Empty:
-            print("[Emergency] Timeout opening all relays")
+            log.warning("[Emergency] Timeout opening all relays")
 
     # 2. Schedule closing all relays after 1 second (do NOT block GUI)
         def close_all_relays_later():
@@ -1399,7 +561,7 @@ class ControlApplication:
             try:
                 relay_close_queue.get(timeout=2)
             except queue.Empty:
-                print("[Emergency] Timeout closing all relays")
+                log.warning("[Emergency] Timeout closing all relays")
         threading.Thread(target=close_all_relays_later, daemon=True).start()
 
     # 3. Stop all MFCs (set flow to 0, turn off) - fire-and-forget, no wait
@@ -1418,13 +580,13 @@ class ControlApplication:
     # 4. Show alarm/status in GUI
         self.show_alarm("EMERGENCY STOP ACTIVATED!\nAll relays toggled")
         self.update_status("EMERGENCY STOP: All relays toggled", COLOR_RED)
-        self.abnormal_logger.log_event("Emergency stop activated")
 
 
 
  
     def handle_restart(self, sender=None, app_data=None):
         """Restore only those heaters and MFCs that were ON before Emergency Stop."""
+        self.journal.record(EMERGENCY_RESET, "Restart after emergency stop")
     # 1. Restore heater setpoints and turn on only those previously ON
         for idx, addr in enumerate(TK4_ADDRESSES):
         # Restore setpoint
@@ -1439,7 +601,7 @@ class ControlApplication:
             try:
                 sv_queue.get(timeout=4)
             except queue.Empty:
-                print(f"[Restart] Timeout restoring heater {idx+1} SV")
+                log.warning(f"[Restart] Timeout restoring heater {idx+1} SV")
         # Only turn ON if it was ON before emergency
             if self.pre_emergency_heater_states[idx]:
                 start_queue = queue.Queue()
@@ -1453,7 +615,7 @@ class ControlApplication:
                     if result.get("success"):
                         self.data.controller_states[idx] = True
                 except queue.Empty:
-                    print(f"[Restart] Timeout starting heater {idx+1}")
+                    log.warning(f"[Restart] Timeout starting heater {idx+1}")
 
     # 2. Restore MFC flows and turn ON only those previously ON
         for i, ch in enumerate(self.mfc.channels):
@@ -1468,7 +630,7 @@ class ControlApplication:
             try:
                 set_queue.get(timeout=2)
             except queue.Empty:
-                print(f"[Restart] Timeout restoring MFC channel {ch} SV")
+                log.warning(f"[Restart] Timeout restoring MFC channel {ch} SV")
             if self.pre_emergency_mfc_states[i]:
                 on_queue = queue.Queue()
                 self.button_command_queue.put({
@@ -1480,7 +642,7 @@ class ControlApplication:
                 try:
                     on_queue.get(timeout=2)
                 except queue.Empty:
-                    print(f"[Restart] Timeout turning ON MFC channel {ch}")
+                    log.warning(f"[Restart] Timeout turning ON MFC channel {ch}")
 
     # 3. Pulse relays for START as before
         for idx in range(4):
@@ -1540,15 +702,17 @@ class ControlApplication:
                 disable_alarm_btn = dpg.add_button(label="Disable Alarm", tag="disable_alarm_btn", callback=self.disable_alarm, enabled=True, width=button_width)
                 plot_btn = dpg.add_button(
                 label="Plot",
-                callback=lambda: show_plot_window(blue_button_theme=blue_button_theme),
+                callback=lambda: show_plot_window(self.log_catalog, self.plot_exporter, blue_button_theme=blue_button_theme),
                 width=button_width
             )
+                stats_btn = dpg.add_button(label="Stats", callback=lambda: dpg.configure_item("driver_stats_window", show=True), width=button_width)
 
 
                 dpg.add_spacer(width=10)
                 dpg.add_text("", tag="status_text", color=(255, 255, 0))
 
                 dpg.bind_item_theme(plot_btn, blue_button_theme)
+                dpg.bind_item_theme(stats_btn, blue_button_theme)
                 dpg.bind_item_theme(settings_btn, blue_button_theme)
                 dpg.bind_item_theme(enable_alarm_btn, green_button_theme)
                 dpg.bind_item_theme(disable_alarm_btn, red_button_theme)
@@ -1765,6 +929,14 @@ class ControlApplication:
             with dpg.group(horizontal=True):
                 dpg.add_button(label="Save", callback=self.save_limits)
                 dpg.add_button(label="Cancel", callback=lambda: dpg.configure_item("settings_popup", show=False))
+    # Driver stats window (refreshed once a second while shown)
+        with dpg.window(label="Driver Stats", show=False, tag="driver_stats_window", width=1000, height=450):
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Reset", callback=lambda: STATS.reset())
+                dpg.add_button(label="Save", callback=self.save_driver_stats)
+            with dpg.table(tag="driver_stats_table", header_row=True, resizable=True, row_background=True):
+                for title in ROW_HEADERS:
+                    dpg.add_table_column(label=title)
         with dpg.window(label="Alarm", modal=True, show=False, tag="alarm_popup", no_title_bar=True, width=500, height=180):
             alarm_text = dpg.add_text("", tag="alarm_text", color=[255, 0, 0])
             dpg.bind_item_font(alarm_text, alarm_font)
@@ -1954,51 +1126,27 @@ class ControlApplication:
     # TK4 Controllers
         for i in range(4):
             dpg.set_value(f"sv_display_{i}", f"{self.data.setpoints[i]:.1f}")  # <-- Add this line
-            if self.data.controllers_enabled[i]:
-                temp = self.data.main_temps[i]
-                if temp is not None:
-                    if temp > 2000:
-                        dpg.set_value(f"pv_display_{i}", "OPEN")
-                    else:
-                        dpg.set_value(f"pv_display_{i}", f"{temp:.1f}")
-                else:
-                    dpg.set_value(f"pv_display_{i}", "--.-")
-            else:
-                dpg.set_value(f"pv_display_{i}", "--.-")
+            dpg.set_value(f"pv_display_{i}", self.data.main_temps.format(i, missing="--.-", open_text="OPEN"))
     #
 
         # Read-only sensors
         for i in range(2):
-            if self.data.readonly_enabled[i]:
-                temp = self.data.ro_temps[i]
-                if temp is not None:
-                    if temp > 2000:
-                        dpg.set_value(f"readonly_temp_{i}", "OPEN")
-                    else:
-                        dpg.set_value(f"readonly_temp_{i}", f"{temp:.1f}")
-                else:
-                    dpg.set_value(f"readonly_temp_{i}", "--.-")
-            else:
-                dpg.set_value(f"readonly_temp_{i}", "--.-")
+            dpg.set_value(f"readonly_temp_{i}", self.data.ro_temps.format(i, missing="--.-", open_text="OPEN"))
                 
                     
         # Update PSM4 pressures
         for i in range(4):
-            dpg.set_value(f"psm_pressure_{i}", self.data.pressures[i])
+            text = "--" if self.data.pressures.status[i] & ST_NO_DATA else "NC"
+            dpg.set_value(f"psm_pressure_{i}", self.data.pressures.format(i, "{:.2f}", missing=text))
         # Power meter
         if self.pm_enabled:
-            power = self.data.power
-            energy = self.data.energy
-            dpg.set_value("pm_power_display", f"{power:.2f} W" if power is not None else "0.00 W")
-            dpg.set_value("pm_energy_display", f"{energy:.3f} Wh" if energy is not None else "0.000 Wh")
+            meters = self.data.meters
+            dpg.set_value("pm_power_display", meters.format(DeviceData.POWER, "{:.2f} W", missing="0.00 W"))
+            dpg.set_value("pm_energy_display", meters.format(DeviceData.ENERGY, "{:.3f} Wh", missing="0.000 Wh"))
         else:
             dpg.set_value("pm_power_display", "0.00 W")
             dpg.set_value("pm_energy_display", "0.000 Wh")
-        flow = self.data.flow
-        if flow is not None:
-            dpg.set_value("mfm_flow_display", f"{flow:.2f}")
-        else:
-            dpg.set_value("mfm_flow_display", "--")
+        dpg.set_value("mfm_flow_display", self.data.meters.format(DeviceData.FLOW, "{:.2f}"))
 
         for gas in ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']:
             val = self.gas_values.get(gas)
@@ -2008,24 +1156,43 @@ class ControlApplication:
         # Last update time
         dpg.set_value("last_update", f"Last Update: {datetime.now().strftime('%H:%M:%S')}")
         for i in range(4):
-            val = self.data.mfc_flows[i]
-            dpg.set_value(f"mfc_pv_{i}", f"{val:.2f}" if val is not None else "--")
+            dpg.set_value(f"mfc_pv_{i}", self.data.mfc_flows.format(i, "{:.2f}"))
     
+    def save_driver_stats(self, sender=None, app_data=None):
+        STATS.dump(STATS_FILE)
+        self.update_status(f"Driver stats appended to {STATS_FILE}", COLOR_GREEN)
+
+    def update_stats_table(self):
+        dpg.delete_item("driver_stats_table", children_only=True, slot=1)
+        for row in STATS.rows():
+            with dpg.table_row(parent="driver_stats_table"):
+                for text in row:
+                    dpg.add_text(text)
+
     def run(self):
         last_update = 0
+        last_stats = 0
         update_interval = 0.05
         while dpg.is_dearpygui_running():
             current_time = time.time()
             if current_time - last_update >= update_interval:
                 self.update_displays()
                 last_update = current_time
+            if current_time - last_stats >= 1.0 and dpg.is_item_shown("driver_stats_window"):
+                self.update_stats_table()
+                last_stats = current_time
+            show_plot_messages()
             dpg.render_dearpygui_frame()
         self.running = False
+        self.plot_exporter.shutdown(wait=False)
         self.worker_thread.join(timeout=2)
-        if self.pm_enabled:
-            self.pm.close()
-        self.tk4.close()
+        if self.logger is not None:
+            self.logger.close()
+        STATS.stop_dump(STATS_FILE)
+        self.close()
         self.save_settings()
+        self.settings_store.close()
+        self.journal.close()
         dpg.destroy_context()
 
 
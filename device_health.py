@@ -0,0 +1,150 @@
+"""
+Circuit breakers for devices that stop answering.
+
+Every bus transaction reports to HEALTH through driver_stats.STATS.  After
+FAILURE_THRESHOLD timeouts in a row a device's circuit opens and its polled
+reads are skipped (status ST_OFFLINE) instead of costing a timeout every
+cycle.  One probe goes through after BACKOFF_MIN seconds, then after twice
+as long each time it fails, up to BACKOFF_MAX; the first good reply closes
+the circuit and polling resumes.  Commands (setpoints, relay, MFC set) are
+never blocked, and any reply they get closes the circuit too.
+
+    if HEALTH.allow("TK4_3"):
+        ...read...
+"""
+import threading
+import time
+
+from driver_log import get_logger
+from driver_stats import STATS
+
+CLOSED, OPEN, PROBING = "closed", "open", "probing"
+FAILURE_THRESHOLD = 3  # timeouts in a row before a device is taken off the poll
+BACKOFF_MIN = 2.0      # s until the first probe
+BACKOFF_MAX = 60.0
+
+log = get_logger("health")
+
+
+class Breaker:
+    __slots__ = ("state", "failures", "backoff", "next_probe", "skipped", "trips")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = BACKOFF_MIN
+        self.next_probe = 0.0
+        self.skipped = 0
+        self.trips = 0
+
+    def allow(self, now):
+        if self.state == CLOSED:
+            return True
+        # A probe that never reported back (no transaction) expires like a failed one
+        if now >= self.next_probe:
+            self.state = PROBING
+            self.next_probe = now + self.backoff
+            return True
+        self.skipped += 1
+        return False
+
+    def success(self):
+        """True when this closed an open circuit."""
+        reopened = self.state != CLOSED
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = BACKOFF_MIN
+        return reopened
+
+    def failure(self, now):
+        """True when this opened the circuit."""
+        self.failures += 1
+        if self.state == PROBING:
+            self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        elif self.state == CLOSED and self.failures < FAILURE_THRESHOLD:
+            return False
+        opened = self.state == CLOSED
+        if opened:
+            self.trips += 1
+        self.state = OPEN
+        self.next_probe = now + self.backoff
+        return opened
+
+
+class DeviceHealth:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def _breaker(self, device):
+        breaker = self.breakers.get(device)
+        if breaker is None:
+            breaker = self.breakers[device] = Breaker()
+        return breaker
+
+    def allow(self, device):
+        """True when a polled read of device should go on the bus now."""
+        with self.lock:
+            breaker = self.breakers.get(device)
+            return breaker is None or breaker.allow(time.monotonic())
+
+    def success(self, device):
+        with self.lock:
+            reopened = self._breaker(device).success()
+        if reopened:
+            log.info(f"[Health] {device} is back, polling resumed")
+
+    def failure(self, device):
+        with self.lock:
+            breaker = self._breaker(device)
+            opened = breaker.failure(time.monotonic())
+            backoff = breaker.backoff
+        if opened:
+            log.warning(f"[Health] {device} not answering, polling suspended (probe every {backoff:.0f}+ s)")
+
+    def trip(self, device):
+        """Open the circuit now, e.g. for a device that failed the self-test."""
+        with self.lock:
+            breaker = self._breaker(device)
+            breaker.success()
+            for _ in range(FAILURE_THRESHOLD):
+                breaker.failure(time.monotonic())
+
+    def observe(self, device, command, ok, timeout):
+        """STATS observer: a reply closes the circuit, a timeout counts against it."""
+        if ok:
+            self.success(device)
+        elif timeout:
+            self.failure(device)
+        else:
+            # A garbled reply is still a reply, but a probe must not stay pending
+            with self.lock:
+                breaker = self.breakers.get(device)
+                if breaker is not None and breaker.state == PROBING:
+                    breaker.failure(time.monotonic())
+
+    def state(self, device):
+        with self.lock:
+            breaker = self.breakers.get(device)
+            return CLOSED if breaker is None else breaker.state
+
+    def reset(self, device=None):
+        """Close one circuit, or all of them (self-test re-probes everything)."""
+        with self.lock:
+            if device is None:
+                self.breakers = {}
+            else:
+                self.breakers.pop(device, None)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                device: {"state": b.state, "failures": b.failures, "trips": b.trips, "skipped": b.skipped,
+                         "next_probe_s": round(max(0.0, b.next_probe - now), 1) if b.state != CLOSED else None}
+                for device, b in self.breakers.items()
+            }
+
+
+HEALTH = DeviceHealth()
+STATS.observers.append(HEALTH.observe)
@@ -0,0 +1,470 @@
+"""
+Hardware-free simulators for every device on the rig.
+
+Each simulator owns a pseudo-terminal and answers on the wire exactly like
+the real device, so the unmodified drivers (pymodbus, pyserial) can be
+pointed at the pty path instead of a COM port:
+
+    RS485 bus      Modbus RTU slaves 1-6 (TK4), 7 (PSM4), 8 (relay board)
+                   and TSM-D ASCII for the MFC channels and the MFM
+    Power meter    SCPI-like lines, ":NUMERIC:NORMAL:VALUE?3" etc.
+    Gas analyzer   0x11 0x01 0x01 0xED request, 3 byte header + 10 uint16
+
+Timing: every reply is held back for `latency` seconds plus the time the
+request and reply would take on the wire at `baudrate` (10 bits per byte
+for 8N1), with optional random `jitter`.  Devices listed in `offline`
+never answer, which is how timeouts are exercised.
+
+    python device_simulator.py --latency 0.02 --write-settings sim_settings.json
+
+Linux/macOS only (needs pty).
+"""
+import argparse
+import json
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from modbus_rtu import crc16
+from tsmd import build, checksum
+
+GAS_NAMES = ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']
+GAS_REQUEST = bytes([0x11, 0x01, 0x01, 0xED])
+
+
+def with_crc(pdu):
+    return pdu + struct.pack("<H", crc16(pdu))
+
+
+class WireTiming:
+    """Delay model: latency + (request + reply bytes) on the wire + jitter."""
+    def __init__(self, baudrate=9600, latency=0.0, jitter=0.0, bits_per_byte=10):
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.bits_per_byte = bits_per_byte
+
+    def delay(self, request_len, reply_len):
+        wire = (request_len + reply_len) * self.bits_per_byte / self.baudrate if self.baudrate else 0.0
+        return self.latency + wire + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class PtySimulator(threading.Thread):
+    """
+    Base class: a pty pair and a thread that frames incoming bytes and
+    writes replies.  `port` is the path the drivers open.  Subclasses
+    implement split(buffer) -> (frame or None, rest) and handle(frame) ->
+    reply bytes or None.
+    """
+    name_prefix = "sim"
+
+    def __init__(self, timing=None):
+        super().__init__(name=self.name_prefix, daemon=True)
+        self.timing = timing or WireTiming()
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.requests = 0
+        self.replies = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._halt = threading.Event()
+        self._buffer = b""
+
+    def run(self):
+        while not self._halt.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                # Like a real line: a pause longer than a frame resets partial input.
+                self._buffer = b""
+                continue
+            try:
+                chunk = os.read(self.master, 4096)
+            except OSError:
+                break
+            self.bytes_in += len(chunk)
+            self._buffer += chunk
+            while self._buffer:
+                frame, self._buffer = self.split(self._buffer)
+                if frame is None:
+                    break
+                self.requests += 1
+                reply = self.handle(frame)
+                if reply:
+                    time.sleep(self.timing.delay(len(frame), len(reply)))
+                    os.write(self.master, reply)
+                    self.replies += 1
+                    self.bytes_out += len(reply)
+
+    def stop(self):
+        self._halt.set()
+        if self.is_alive():
+            self.join(timeout=1)
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"requests": self.requests, "replies": self.replies,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+    def split(self, buffer):
+        raise NotImplementedError
+
+    def handle(self, frame):
+        raise NotImplementedError
+
+
+# --- Modbus RTU slaves ---
+
+class ModbusSlave:
+    """Register map of one Modbus slave; subclasses update values in refresh()."""
+    def __init__(self, unit):
+        self.unit = unit
+        self.input_registers = {}
+        self.holding_registers = {}
+
+    def refresh(self):
+        pass
+
+    def write(self, address, value):
+        if address not in self.holding_registers:
+            return False
+        self.holding_registers[address] = value
+        return True
+
+
+class TK4Slave(ModbusSlave):
+    """
+    TK4 temperature controller: PV at input 0x03E8 (raw) / 0x03E9 (decimal
+    point), SV at holding 0x0000, RUN(0)/STOP(1) at holding 0x0032.  PV
+    moves towards SV while running and back to ambient when stopped.
+    """
+    def __init__(self, unit, pv=25.0, ambient=25.0, decimal=1, rate=0.05, open_sensor=False):
+        super().__init__(unit)
+        self.pv = pv
+        self.ambient = ambient
+        self.decimal = decimal
+        self.rate = rate
+        self.open_sensor = open_sensor
+        self.holding_registers = {0x0000: int(ambient), 0x0032: 1}
+        self._last = time.monotonic()
+
+    def refresh(self):
+        now = time.monotonic()
+        dt, self._last = now - self._last, now
+        target = self.holding_registers[0x0000] if self.holding_registers[0x0032] == 0 else self.ambient
+        self.pv += (target - self.pv) * min(1.0, self.rate * dt)
+        raw = 31000 if self.open_sensor else int(round(self.pv * 10 ** self.decimal))
+        self.input_registers[0x03E8] = raw
+        self.input_registers[0x03E9] = 0 if self.open_sensor else self.decimal
+
+
+class PSM4Slave(ModbusSlave):
+    """PSM4: channel i has raw at 0x03E9 + 5*i and decimal at 0x03EA + 5*i (value / 10**dec / 10 bar)."""
+    def __init__(self, unit=7, pressures=(1.0, 1.5, 2.0, None), decimal=1):
+        super().__init__(unit)
+        self.pressures = list(pressures)
+        self.decimal = decimal
+
+    def refresh(self):
+        for i, bar in enumerate(self.pressures):
+            base = 0x03E8 + 5 * i
+            # None is a disconnected sensor, which the PSM4 reports far above 20 bar.
+            raw = 0xFFFF if bar is None else int(round(bar * 10 * 10 ** self.decimal))
+            self.input_registers[base + 1] = min(raw, 0xFFFF)
+            self.input_registers[base + 2] = self.decimal
+
+
+class RelaySlave(ModbusSlave):
+    """Relay board: channel n at holding n (0x0100 on, 0x0200 off), 0x0000 = 0x0700 all on / 0x0800 all off."""
+    def __init__(self, unit=8, channels=8):
+        super().__init__(unit)
+        self.states = [False] * channels
+        self.holding_registers = {i: 0 for i in range(channels + 1)}
+
+    def write(self, address, value):
+        if address == 0 and value in (0x0700, 0x0800):
+            self.states = [value == 0x0700] * len(self.states)
+        elif 1 <= address <= len(self.states) and value in (0x0100, 0x0200):
+            self.states[address - 1] = value == 0x0100
+        else:
+            return False
+        self.holding_registers[address] = value
+        return True
+
+
+# --- TSM-D ASCII (MFC channels, MFM) ---
+
+class TsmdDevices:
+    """
+    MFC channels and the MFM on the TSM-D ASCII protocol.  Frames are
+    ":{id}{cmd}{addr}{value}{XOR checksum}\\r"; read replies carry the flow
+    as 8 hex digits (IEEE754 big endian) at [7:15].
+    """
+    def __init__(self, channels=(1, 2, 3, 4), mfm_id=1, mfm_flow=10.0):
+        self.setpoints = {ch: 0.0 for ch in channels}
+        self.enabled = {ch: False for ch in channels}
+        self.mfm_id = mfm_id
+        self.mfm_flow = mfm_flow
+
+    def flow(self, channel):
+        return self.setpoints[channel] if self.enabled[channel] else 0.0
+
+    @staticmethod
+    def _reply(body):
+        return build(body)
+
+    def _read_reply(self, dev, value):
+        return self._reply(f":{dev}0304{struct.pack('>f', value).hex().upper()}")
+
+    def handle(self, frame):
+        text = frame.decode("ascii", "replace").rstrip("\r")
+        if len(text) < 7 or f"{checksum(frame[:len(text) - 2]):02X}" != text[-2:]:
+            return None
+        dev, cmd, rest = text[1:3], text[3:5], text[5:-2]
+        try:
+            unit = int(dev)
+        except ValueError:
+            return None
+        if cmd == "03" and rest == "00" and int(dev, 16) == self.mfm_id:
+            return self._read_reply(dev, self.mfm_flow)
+        if unit not in self.setpoints:
+            return None
+        if cmd == "03" and rest == "0038":
+            return self._read_reply(dev, self.flow(unit))
+        if cmd == "01" and rest.startswith("07") and len(rest) == 10:
+            self.setpoints[unit] = struct.unpack(">f", bytes.fromhex(rest[2:]))[0]
+            return self._reply(f":{dev}81")
+        if cmd == "58" and rest in ("0201", "0200"):
+            self.enabled[unit] = rest == "0201"
+            return self._reply(f":{dev}D8")
+        return None
+
+
+class RS485BusSimulator(PtySimulator):
+    """
+    The shared RS485 line: Modbus RTU slaves and TSM-D ASCII devices.  A
+    frame starting with ':' is TSM-D (up to '\\r'), anything else is RTU,
+    delimited by the function code's fixed request length.
+    """
+    name_prefix = "sim-rs485"
+
+    def __init__(self, slaves=None, tsmd=None, timing=None, offline=()):
+        super().__init__(timing)
+        if slaves is None:
+            slaves = [TK4Slave(u, pv=25.0 + u) for u in range(1, 7)] + [PSM4Slave(7), RelaySlave(8)]
+        self.slaves = {s.unit: s for s in slaves}
+        self.tsmd = tsmd if tsmd is not None else TsmdDevices()
+        # Modbus unit ids (int) or "MFC<n>" / "MFM" that never answer
+        self.offline = set(offline)
+        self.crc_errors = 0
+
+    def split(self, buffer):
+        if buffer[:1] == b":":
+            end = buffer.find(b"\r")
+            return (None, buffer) if end < 0 else (buffer[:end + 1], buffer[end + 1:])
+        if len(buffer) < 8:
+            return None, buffer
+        fc = buffer[1]
+        if fc in (0x0F, 0x10):
+            size = 9 + buffer[6]
+        elif fc in (0x01, 0x02, 0x03, 0x04, 0x05, 0x06):
+            size = 8
+        else:
+            # Unknown function: drop the byte and resynchronise.
+            return None, buffer[1:]
+        if len(buffer) < size:
+            return None, buffer
+        return buffer[:size], buffer[size:]
+
+    def handle(self, frame):
+        if frame[:1] == b":":
+            # ":{id}0300{cs}\r" (10 bytes) is the MFM read, everything else an MFC channel
+            name = "MFM" if len(frame) == 10 else "MFC" + frame[1:3].decode("ascii", "replace").lstrip("0")
+            if name in self.offline:
+                return None
+            return self.tsmd.handle(frame)
+        if crc16(frame):  # 0 over a frame with a valid CRC
+            self.crc_errors += 1
+            return None
+        unit, fc = frame[0], frame[1]
+        slave = self.slaves.get(unit)
+        if slave is None or unit in self.offline:
+            return None
+        slave.refresh()
+        if fc in (0x03, 0x04):
+            address, count = struct.unpack(">HH", frame[2:6])
+            table = slave.input_registers if fc == 0x04 else slave.holding_registers
+            try:
+                values = [table[address + i] for i in range(count)]
+            except KeyError:
+                return with_crc(bytes([unit, fc | 0x80, 0x02]))
+            return with_crc(bytes([unit, fc, 2 * count]) + struct.pack(f">{count}H", *values))
+        if fc == 0x06:
+            address, value = struct.unpack(">HH", frame[2:6])
+            if not slave.write(address, value):
+                return with_crc(bytes([unit, fc | 0x80, 0x02]))
+            return frame
+        if fc == 0x10:
+            address, count = struct.unpack(">HH", frame[2:6])
+            values = struct.unpack(f">{count}H", frame[7:7 + 2 * count])
+            if not all(slave.write(address + i, v) for i, v in enumerate(values)):
+                return with_crc(bytes([unit, fc | 0x80, 0x02]))
+            return with_crc(frame[:6])
+        return with_crc(bytes([unit, fc | 0x80, 0x01]))
+
+
+# --- Power meter ---
+
+class PowerMeterSimulator(PtySimulator):
+    """SCPI-like power meter: ?3 power (W), ?4 integrated energy (Wh), :INTEGrate:STARt/STOP/RESet."""
+    name_prefix = "sim-pm"
+
+    def __init__(self, power=1500.0, timing=None, offline=False):
+        super().__init__(timing)
+        self.power = power
+        self.offline = offline
+        self.remote = False
+        self._energy = 0.0
+        self._integrating_since = None
+
+    def energy(self):
+        energy = self._energy
+        if self._integrating_since is not None:
+            energy += self.power * (time.monotonic() - self._integrating_since) / 3600.0
+        return energy
+
+    def split(self, buffer):
+        end = buffer.find(b"\n")
+        return (None, buffer) if end < 0 else (buffer[:end + 1], buffer[end + 1:])
+
+    def handle(self, frame):
+        if self.offline:
+            return None
+        cmd = frame.decode("ascii", "replace").strip().upper()
+        if cmd.startswith(":COMMUNICATE:REMOTE"):
+            self.remote = cmd.endswith("ON")
+        elif cmd == ":INTEGRATE:START":
+            if self._integrating_since is None:
+                self._integrating_since = time.monotonic()
+        elif cmd == ":INTEGRATE:STOP":
+            self._energy = self.energy()
+            self._integrating_since = None
+        elif cmd == ":INTEGRATE:RESET":
+            self._energy = 0.0
+            self._integrating_since = None
+        elif cmd == ":NUMERIC:NORMAL:VALUE?3":
+            return f"{self.power:.4E}\r\n".encode()
+        elif cmd == ":NUMERIC:NORMAL:VALUE?4":
+            return f"{self.energy():.4E}\r\n".encode()
+        return None
+
+
+# --- Gas analyzer ---
+
+class GasAnalyzerSimulator(PtySimulator):
+    """Answers 0x11 0x01 0x01 0xED with a 3 byte header, 10 big-endian uint16 (value * 100) and a checksum."""
+    name_prefix = "sim-gas"
+
+    def __init__(self, gases=None, timing=None, offline=False):
+        super().__init__(timing)
+        self.gases = dict.fromkeys(GAS_NAMES, 0.0)
+        self.gases.update(gases or {"CO": 12.5, "CO2": 8.1, "CH4": 3.2, "H2": 20.4, "O2": 0.6, "N2": 55.2})
+        self.offline = offline
+
+    def split(self, buffer):
+        start = buffer.find(GAS_REQUEST[:1])
+        if start < 0:
+            return None, b""
+        if len(buffer) - start < len(GAS_REQUEST):
+            return None, buffer[start:]
+        frame = buffer[start:start + len(GAS_REQUEST)]
+        return (frame, buffer[start + len(GAS_REQUEST):]) if frame == GAS_REQUEST else (None, buffer[start + 1:])
+
+    def handle(self, frame):
+        if self.offline:
+            return None
+        payload = bytes([0x16, 0x15, 0x01]) + struct.pack(
+            ">10H", *(min(int(round(self.gases[n] * 100)), 0xFFFF) for n in GAS_NAMES))
+        return payload + bytes([(-sum(payload)) & 0xFF])
+
+
+class SimulatedRig:
+    """
+    All simulators together.  `ports` maps the settings.json keys to the pty
+    paths, so it can be merged into the app settings:
+
+        with SimulatedRig(latency=0.01) as rig:
+            client = ModbusSerialClient(port=rig.ports["RS485_PORT"], ...)
+    """
+    def __init__(self, baudrate=9600, latency=0.0, jitter=0.0, offline=()):
+        timing = WireTiming(baudrate, latency, jitter)
+        offline = set(offline)
+        self.bus = RS485BusSimulator(timing=timing, offline=offline)
+        self.power_meter = PowerMeterSimulator(timing=timing, offline="PM" in offline)
+        self.gas_analyzer = GasAnalyzerSimulator(timing=timing, offline="GAS" in offline)
+        self.simulators = [self.bus, self.power_meter, self.gas_analyzer]
+        self.ports = {
+            "RS485_PORT": self.bus.port,
+            "PM_PORT": self.power_meter.port,
+            "GAS_ANALYZER_PORT": self.gas_analyzer.port,
+        }
+
+    def start(self):
+        for sim in self.simulators:
+            sim.start()
+        return self
+
+    def stop(self):
+        for sim in self.simulators:
+            sim.stop()
+
+    def stats(self):
+        return {sim.name_prefix: sim.stats() for sim in self.simulators}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _parse_offline(items):
+    """'3' -> Modbus unit 3, anything else ("MFC2", "MFM", "PM", "GAS") as given."""
+    return {int(x) if x.isdigit() else x.upper() for x in items}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the device simulators on pseudo-terminals")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--latency", type=float, default=0.0, help="device turnaround in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay up to this many seconds")
+    parser.add_argument("--offline", nargs="*", default=[], help="devices that never answer: 1-8, MFC1-4, MFM, PM, GAS")
+    parser.add_argument("--write-settings", metavar="PATH", help="write the pty paths as a settings.json")
+    args = parser.parse_args(argv)
+
+    rig = SimulatedRig(args.baud, args.latency, args.jitter, _parse_offline(args.offline)).start()
+    for key, port in rig.ports.items():
+        print(f"[Simulator] {key}: {port}")
+    if args.write_settings:
+        with open(args.write_settings, "w") as f:
+            json.dump(rig.ports, f, indent=2)
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[Simulator] {json.dumps(rig.stats())}")
+        rig.stop()
+
+
+if __name__ == "__main__":
+    main()
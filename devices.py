@@ -0,0 +1,884 @@
+"""
+Device drivers shared by control_v1.0.4.py, control1.py and the headless
+tools (acquisition, benchmarks).  Nothing in here imports a GUI toolkit.
+
+TK4/PSM4/relay talk Modbus RTU through a shared pymodbus (>= 3.10, unit
+given as device_id=) or modbus_rtu client; the MFC
+channels and the MFM use TSM-D ASCII on the same RS485 line and open the
+port per transaction, so the Modbus client must be closed around them.
+Every bus exchange is recorded in driver_stats.STATS, and polled reads
+take their reply timeout from it (adaptive between the bounds below);
+commands keep the full timeout.  Polled reads of a device whose circuit
+is open (device_health) are skipped until its next probe.
+"""
+import threading
+import time
+import struct
+
+import serial
+from pymodbus.client import ModbusSerialClient
+from pymodbus.exceptions import ModbusIOException
+
+from device_health import HEALTH
+from driver_log import get_logger
+from driver_stats import STATS
+from modbus_rtu import RtuClient
+from tsmd import MIN_READ_REPLY, mfc_frame, mfc_prefix, mfm_read_frame, parse_float
+from sample_model import ChannelBlock, NAN, ST_NO_REPLY, ST_OFFLINE, ST_OK, ST_OPEN, decode_tk4, decode_psm4
+
+log = get_logger("devices")
+
+BAUDRATE = 9600
+BYTESIZE = 8
+TIMEOUT = 1
+TK4_ADDRESSES = [1, 2, 3, 4]
+TK4_RO_ADDRESSES = [5, 6]
+# RTU frame sizes: every request here is 8 bytes, a read reply 5 + 2 per register
+MODBUS_REQUEST_LEN = 8
+MODBUS_WRITE_REPLY_LEN = 8
+TSMD_COMMANDS = {"03": "read_flow", "01": "set_flow", "58": "on_off"}
+# Reply timeout bounds (floor, ceiling) in seconds; the ceiling is the old fixed timeout.
+# Floors leave room for the wire time at 9600 baud (~20 ms Modbus, ~31 ms TSM-D) plus turnaround.
+MODBUS_TIMEOUT = (0.05, 0.2)
+MFC_TIMEOUT = (0.05, 0.1)
+MFM_FLOOR = 0.05
+PM_TIMEOUT = (0.05, 2.0)
+PM_REPLY_WAIT = 0.2  # what an unknown power meter gets, the old fixed wait
+GAS_TIMEOUT = (0.05, 1.0)
+GAS_REPLY_LEN = 23       # header(3) + 10 values; some analyzers send the 20 value bytes only
+GAS_VALUES_LEN = 20
+GAS_TAIL_WAIT = 0.05     # for the last 3 bytes once 20 are in, so a headerless reply costs 50 ms, not the timeout
+
+
+def modbus_reply_len(count):
+    return 5 + 2 * count
+
+
+def record_modbus_reply(t, response, reply_len):
+    """Account a Modbus reply on transaction t; True when it is not an error."""
+    if response.isError():
+        t.fail(timeout=isinstance(response, ModbusIOException))
+        return False
+    t.received(reply_len)
+    return True
+
+
+def reply_timeout(device, command, bounds, default=None, family=None):
+    floor, ceiling = bounds
+    return STATS.timeout(device, command, ceiling if default is None else default, floor, ceiling, family)
+
+
+def modbus_client(port, transport="pymodbus"):
+    """Client for the RS485 Modbus devices; transport "native" is modbus_rtu.RtuClient."""
+    if transport == "native":
+        return RtuClient(port, baudrate=BAUDRATE, bytesize=8, parity='N', stopbits=2, timeout=0.2)
+    return ModbusSerialClient(port=port, baudrate=BAUDRATE, parity='N', stopbits=2, bytesize=8,
+                              timeout=0.2, retries=0)
+
+
+def set_modbus_timeout(client, seconds):
+    """Reply timeout of the next request on a pymodbus serial client or RtuClient."""
+    if isinstance(client, RtuClient):
+        client.set_timeout(seconds)
+        return
+    params = getattr(client, "comm_params", None)
+    if params is not None:
+        params.timeout_connect = seconds
+    else:  # pymodbus < 3.5
+        client.params.timeout = seconds
+    if client.socket is not None and client.socket.timeout != seconds:
+        client.socket.timeout = seconds
+
+
+def adapt_modbus_timeout(client, device, command, family=None):
+    set_modbus_timeout(client, reply_timeout(device, command, MODBUS_TIMEOUT, family=family))
+
+
+def full_modbus_timeout(client):
+    set_modbus_timeout(client, MODBUS_TIMEOUT[1])
+
+
+def _pm_write(ser, cmd):
+    """Write one power meter command without reading a reply."""
+    data = f"{cmd}\r\n".encode()
+    with STATS.transaction("PM", cmd) as t:
+        ser.write(data)
+        t.sent(len(data))
+
+
+class MFCController:
+    def __init__(self, port='COM6', channels=[1,2,3,4]):
+        self.port = port
+        self.channels = channels
+
+    def _open(self, timeout=0.1):
+        return serial.Serial(
+            port=self.port, baudrate=BAUDRATE, bytesize=BYTESIZE,
+            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=timeout
+        )
+
+    def send_command(self, channel, cmd, addr, value=""):
+        frame = mfc_frame(channel, cmd, addr, value)
+        
+        with STATS.transaction(f"MFC{channel}", TSMD_COMMANDS.get(cmd, cmd)) as t, self._open() as ser:
+            ser.write(frame)
+            t.sent(len(frame))
+            resp = ser.read_until(b'\r')
+            t.received(len(resp))
+            if not resp.endswith(b'\r'):
+                t.fail(timeout=True)
+            return resp
+
+    def read_flow(self, channel):
+        return parse_float(self.send_command(channel, "03", "0038"), mfc_prefix(channel))
+
+    def set_flow(self, channel, value):
+    # Build IEEE754 float as 8 ASCII hex chars
+        hexval = struct.pack('!f', float(value)).hex().upper()
+    # Correct command for TSM-D: Command "01", DataType "07"
+        resp = self.send_command(channel, "01", "07", hexval)
+    # Optionally, check response for success:
+        return resp.startswith(f":{channel:02d}81".encode())
+
+
+
+
+    def on_off(self, channel, state):
+        val = "01" if state else "00"
+        resp = self.send_command(channel, "58", "02", val)
+    # Response should start with :{channel}D8 for success
+        return resp.startswith(f":{channel:02d}D8".encode())
+
+
+    def read_flows(self, channels=None, block=None, deadline=None):
+        """
+        Read several channels in one port session: each frame goes out as
+        soon as the previous reply (or its deadline) is in, without
+        reopening the port.  Frames are not overlapped: the RS485 line is
+        half duplex and every channel answers on it.  Without a deadline
+        each channel gets its adaptive timeout.
+        """
+        channels = channels or self.channels
+        flows = block if block is not None else ChannelBlock(channels)
+        try:
+            ser = self._open(deadline or MFC_TIMEOUT[1])
+        except Exception as e:
+            log.error(f"MFC port error: {e}")
+            flows.invalidate(ST_NO_REPLY)
+            for ch in channels:
+                HEALTH.failure(f"MFC{ch}")
+            return flows
+        with ser:
+            for i, ch in enumerate(channels):
+                if not HEALTH.allow(f"MFC{ch}"):
+                    flows.invalidate(ST_OFFLINE, i)
+                    continue
+                frame = mfc_frame(ch, "03", "0038")
+                if deadline is None:
+                    ser.timeout = reply_timeout(f"MFC{ch}", "read_flow", MFC_TIMEOUT, family="MFC")
+                with STATS.transaction(f"MFC{ch}", "read_flow") as t:
+                    ser.write(frame)
+                    t.sent(len(frame))
+                    resp = ser.read_until(b'\r')
+                    t.received(len(resp))
+                    value = parse_float(resp, mfc_prefix(ch))
+                    if value is None:
+                        t.fail(timeout=not resp.endswith(b'\r'))
+                        if resp:
+                            # Wrong or torn reply: drop whatever is left before the next frame
+                            ser.reset_input_buffer()
+                flows.set(i, value)
+        return flows
+
+    def read_all_flows(self, block=None):
+        return self.read_flows(block=block)
+
+class PowerMeter:
+    def __init__(self, port='COM3'):
+        self.port = port
+        self.ser = None
+        self.lock = threading.Lock()
+        
+    def connect(self):
+        """Connect and initialize power meter using correct commands"""
+        try:
+            self.ser = serial.Serial(
+                port=self.port,
+                baudrate=9600,
+                bytesize=8,
+                parity='N',
+                stopbits=2,
+                timeout=2,
+                write_timeout=5,
+                inter_byte_timeout=0.5
+            )
+            self._send(":COMMunicate:REMote ON")
+            self._send(":NUMERIC:NORMAL:ITEM4 WH,1")
+            self._send(":SCALING:CT:ELEMENT1 10")
+            time.sleep(0.5)
+            return True
+        except Exception as e:
+            log.error(f"PM connection failed: {str(e)}")
+            if self.ser and self.ser.is_open:
+                self.close()
+            HEALTH.failure("PM")
+            return False
+    
+    def _send(self, cmd, read_response=True):
+        """Send command and get response"""
+        with self.lock, STATS.transaction("PM", cmd) as t:
+            if self.ser is None:
+                raise ConnectionError("Power meter port is not open")
+            data = f"{cmd}\r\n".encode()
+            if "?" not in cmd:
+                self.ser.write(data)
+                t.sent(len(data))
+                time.sleep(0.2)
+                if read_response:
+                    resp = self.ser.read_all()
+                    t.received(len(resp))
+                    return resp.decode().strip()
+                return None
+            # Queries: wait for the reply line only as long as the meter usually takes
+            self.ser.timeout = reply_timeout("PM", cmd, PM_TIMEOUT, PM_REPLY_WAIT)
+            self.ser.write(data)
+            t.sent(len(data))
+            resp = self.ser.read_until(b"\n")
+            t.received(len(resp))
+            if not resp.endswith(b"\n"):
+                t.fail(timeout=True)
+            return resp.decode().strip()
+    
+    def is_connected(self):
+        """Check if power meter is connected"""
+        return self.ser is not None and self.ser.is_open
+    
+    def read_power(self):
+        """Read active power using correct command"""
+        if not HEALTH.allow("PM"):
+            return NAN
+        try:
+            response = self._send(":NUMERIC:NORMAL:VALUE?3")
+            if response:
+                return float(response)
+            return NAN
+        except Exception as e:
+            log.error(f"Power read error: {str(e)}")
+            return NAN
+    
+    def read_energy(self):
+        """Read accumulated energy"""
+        if not HEALTH.allow("PM"):
+            return NAN
+        try:
+            response = self._send(":NUMERIC:NORMAL:VALUE?4")
+            if response:
+                return float(response)
+            return NAN
+        except Exception as e:
+            log.error(f"Energy read error: {str(e)}")
+            return NAN
+    
+    def start_integration(self):
+        """Start energy integration"""
+        self.reset_integration()
+        self._send(":INTEGrate:STARt", False)
+    
+    def stop_integration(self):
+        """Stop energy integration"""
+        self._send(":INTEGrate:STOP", False)
+    
+    def reset_integration(self):
+        """Reset integration counters"""
+        self._send(":INTEGrate:RESet", False)
+        time.sleep(0.5)
+    
+    def close(self):
+        """Close connection properly"""
+        if self.ser and self.ser.is_open:
+            self._send(":COMMunicate:REMote OFF", False)
+            self.ser.close()
+            self.ser = None
+
+class TK4Controller:
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+
+    
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+            
+    def read_temperature(self, address):
+        """Read temperature from controller as (value, status)"""
+        if not HEALTH.allow(f"TK4_{address}"):
+            return NAN, ST_OFFLINE
+        try:
+            with self.lock, STATS.transaction(f"TK4_{address}", "read_temperature") as t:
+                adapt_modbus_timeout(self.client, f"TK4_{address}", "read_temperature", "TK4_")
+                t.sent(MODBUS_REQUEST_LEN)
+                response = self.client.read_input_registers(
+                    address=0x03E8, 
+                    count=2, 
+                    device_id=address
+                )
+                if not record_modbus_reply(t, response, modbus_reply_len(2)):
+                    return NAN, ST_NO_REPLY
+                raw_pv, decimal_point = response.registers
+                return decode_tk4(raw_pv, decimal_point)
+        except Exception as e:
+            log.error(f"Temperature read error: {str(e)}")
+            return NAN, ST_NO_REPLY
+    
+    def set_setpoint(self, address, temperature):
+        """Set temperature setpoint"""
+        try:
+            with self.lock, STATS.transaction(f"TK4_{address}", "set_setpoint") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                response = self.client.write_register(
+                    address=0x0000,
+                    value=int(temperature ),  # 0.1°C resolution
+                    device_id=address
+                )
+                return record_modbus_reply(t, response, MODBUS_WRITE_REPLY_LEN)
+        except Exception as e:
+            log.error(f"Set temperature error: {str(e)}")
+            return False
+    
+    def control_heater(self, address, state):
+        """Control heater state (on/off)"""
+        try:
+            with self.lock, STATS.transaction(f"TK4_{address}", "control_heater") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                response = self.client.write_register(
+                    address=0x0032,
+                    value=int(state),
+                    device_id=address
+                )
+                if not record_modbus_reply(t, response, MODBUS_WRITE_REPLY_LEN):
+                    log.error(f"Control heater error: {response}")
+                    return False
+                return True
+        except Exception as e:
+            log.error(f"Control heater error: {str(e)}")
+        # Do NOT close the client here!
+            return False
+
+    
+    def close(self):
+        """Close connection"""
+        if self.client:
+            self.client.close()
+
+class ModbusRelayController:
+    def __init__(self, client, slave_id=8):
+        self.client = client
+        self.slave_id = slave_id
+        self.lock = threading.Lock()
+
+    def send_pulse(self, channel, duration=1.0):
+        # This method is now synchronous and must be called only from the worker thread!
+        try:
+            self._write_channel(channel, 'on')
+            time.sleep(duration)
+            self._write_channel(channel, 'off')
+        except Exception as e:
+            log.error(f"Relay pulse error on channel {channel}: {e}")
+
+    def _write_channel(self, channel, command):
+        value = {'on': 0x0100, 'off': 0x0200}[command]
+        log.info(f"Relay {channel} -> {command.upper()}")
+        with STATS.transaction("RELAY", f"relay_{command}") as t:
+            full_modbus_timeout(self.client)
+            t.sent(MODBUS_REQUEST_LEN)
+            record_modbus_reply(t, self.client.write_register(channel, value, device_id=self.slave_id),
+                          MODBUS_WRITE_REPLY_LEN)
+
+    def open_all(self):
+        """Open (activate) all relay channels using the group command."""
+        try:
+        # 0x0000 register, value 0x0700 (per manual: Open all)
+            with STATS.transaction("RELAY", "open_all") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                record_modbus_reply(t, self.client.write_register(0x0000, 0x0700, device_id=self.slave_id),
+                              MODBUS_WRITE_REPLY_LEN)
+            log.info("All relays OPEN (ON)")
+        except Exception as e:
+            log.error(f"Relay open_all error: {e}")
+
+    def close_all(self):
+        """Close (deactivate) all relay channels using the group command."""
+        try:
+        # 0x0000 register, value 0x0800 (per manual: Close all)
+            with STATS.transaction("RELAY", "close_all") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                record_modbus_reply(t, self.client.write_register(0x0000, 0x0800, device_id=self.slave_id),
+                              MODBUS_WRITE_REPLY_LEN)
+            log.info("All relays CLOSED (OFF)")
+        except Exception as e:
+            log.error(f"Relay close_all error: {e}")
+
+
+class PSM4Controller:
+    def __init__(self, client):
+        self.client = client  # Share TK4's Modbus client
+        self.lock = threading.Lock()
+
+    def read_pressures(self, block=None):
+        """Read all 4 pressure channels (ID=7) into a ChannelBlock"""
+        pressures = block if block is not None else ChannelBlock(4)
+        if not HEALTH.allow("PSM4"):
+            pressures.invalidate(ST_OFFLINE)
+            return pressures
+        base_addrs = [0x03E8, 0x03ED, 0x03F2, 0x03F7]
+        try:
+            with self.lock:
+                for i, addr in enumerate(base_addrs):
+                    with STATS.transaction("PSM4", "read_pressure") as t:
+                        adapt_modbus_timeout(self.client, "PSM4", "read_pressure")
+                        t.sent(MODBUS_REQUEST_LEN)
+                        response = self.client.read_input_registers(
+                            address=addr + 1,
+                            count=2,
+                            device_id=7
+                        )
+                        ok = record_modbus_reply(t, response, modbus_reply_len(2))
+                    if not ok:
+                        pressures.invalidate(ST_NO_REPLY, i)
+                        continue
+                    raw, decimal = response.registers
+                # Correct scaling: divide by 10, > 20 bar is an open sensor
+                    pressures.set(i, *decode_psm4(raw, decimal))
+
+            return pressures
+        except Exception as e:
+            log.error(f"PSM4 read error: {str(e)}")
+            pressures.invalidate(ST_NO_REPLY)
+            return pressures
+    def close(self):
+        if self.client:
+            self.client.close()
+
+
+
+# --- MFM (TSM-D) ---
+class MFMFlowMeter:
+    def __init__(self, port='COM6', device_id=1, timeout=TIMEOUT):
+        self.port = port
+        self.device_id = device_id
+        self.timeout = timeout
+
+    def build_read_flow_frame(self):
+        return mfm_read_frame(self.device_id)
+
+    def read_flow(self):
+        """Flow reading; None while the meter's circuit is open."""
+        if not HEALTH.allow("MFM"):
+            return None
+        # self.timeout is the ceiling; a meter that answers fast gets less
+        timeout = reply_timeout("MFM", "read_flow", (min(MFM_FLOOR, self.timeout), self.timeout))
+        # Always open and close the port for each read, just like mfm_mfc1.py
+        with STATS.transaction("MFM", "read_flow") as t, serial.Serial(
+            port=self.port, baudrate=BAUDRATE, bytesize=BYTESIZE,
+            parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=timeout
+        ) as ser:
+            frame = self.build_read_flow_frame()
+                #print(f"[MFM] Sending: {frame!r}")
+            ser.write(frame)
+            t.sent(len(frame))
+            resp = ser.read_until(b'\r')
+            t.received(len(resp))
+                #print(f"[MFM] Raw response: {resp!r}")
+            if not resp.endswith(b'\r'):
+                t.fail(timeout=True)
+            if not resp.startswith(b':'):
+                raise ValueError("Invalid response")
+            if len(resp) < MIN_READ_REPLY:
+                raise ValueError(f"Response too short: {len(resp)} bytes")
+            value = parse_float(resp)
+            if value is None:
+                log.debug(f"[MFM] Hex dump: {resp.hex()}")
+                raise ValueError("Invalid flow value")
+            return value
+
+class GasAnalyzer:
+    def __init__(self, port="COM10"):
+        self.port = port
+        self.ser = None
+        self.read_time = NAN  # time.monotonic() when the reply of the last good reading was in
+
+    def connect(self):
+        try:
+            self.ser = serial.Serial(self.port, baudrate=9600, timeout=1)
+            return True
+        except Exception as e:
+            log.error(f"Gas analyzer connection error: {e}")
+            self.ser = None
+            HEALTH.failure("GAS")
+            return False
+
+    def close(self):
+        if self.ser:
+            self.ser.close()
+            self.ser = None
+
+    def read_gases(self):
+        # Also keeps a missing adapter from being reopened every call
+        if not HEALTH.allow("GAS"):
+            return None
+        if not self.ser or not self.ser.is_open:
+            if not self.connect():
+                return None
+        t = STATS.transaction("GAS", "read_gases")
+        with t:
+            return self._read_gases(t)
+
+    def _read_gases(self, t):
+        try:
+            self.ser.reset_input_buffer()
+            self.ser.timeout = reply_timeout("GAS", "read_gases", GAS_TIMEOUT, PM_REPLY_WAIT)
+            request = bytes([0x11, 0x01, 0x01, 0xed])
+            self.ser.write(request)
+            t.sent(len(request))
+            # Header + 10 values; a trailing checksum is flushed before the next request
+            data = self.ser.read(GAS_VALUES_LEN)
+            if len(data) == GAS_VALUES_LEN:
+                self.ser.timeout = GAS_TAIL_WAIT
+                data += self.ser.read(GAS_REPLY_LEN - GAS_VALUES_LEN)
+            reply_time = time.monotonic()
+            if len(data) >= GAS_VALUES_LEN:
+                t.received(len(data))
+                #print(f"Raw gas analyzer response: {data.hex()} ({len(data)} bytes)")
+                if len(data) >= GAS_REPLY_LEN:
+                    raw = data[3:23]
+                elif len(data) == GAS_VALUES_LEN:
+                    raw = data  # headerless reply: the values only
+                else:
+                    log.error(f"Unexpected data length: {len(data)}")
+                    t.fail()
+                    return None
+                gas_names = ['CO', 'CO2', 'CH4', 'CnHm', 'H2', 'O2', 'C2H2', 'C2H4', 'HHV', 'N2']
+                readings = {}
+                for i, name in enumerate(gas_names):
+                    value_bytes = raw[i*2:i*2+2]
+                    value = int.from_bytes(value_bytes, byteorder='big', signed=False)
+                    readings[name] = value / 100.0
+                self.read_time = reply_time
+                return readings
+            else:
+                log.error("Not enough bytes received from analyzer.")
+                t.fail(timeout=True)
+                return None
+        except Exception as e:
+            log.error(f"Gas analyzer read error: {e}")
+            # The port failed under the call: no reply, counts toward the breaker
+            t.fail(timeout=True)
+            # Close the bad port so the next call reconnects
+            if self.ser:
+                try:
+                    self.ser.close()
+                except Exception:
+                    pass
+            self.ser = None
+            return None
+
+
+
+
+
+
+
+def _meter(index):
+    def fget(self):
+        return self.meters.values[index]
+    def fset(self, value):
+        self.meters.set(index, value)
+    return property(fget, fset)
+
+
+class DeviceData:
+    POWER, ENERGY, FLOW = range(3)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.main_temps = ChannelBlock(TK4_ADDRESSES)
+        self.ro_temps = ChannelBlock(TK4_RO_ADDRESSES)
+        self.setpoints = [25.0] * 4
+        self.controller_states = [False] * 4
+        self.controllers_enabled = [True, True, True, True]
+        self.readonly_enabled = [True, True]
+        self.pressures = ChannelBlock(4)
+        self.meters = ChannelBlock(["power", "energy", "flow"])
+        self.last_update = None  # epoch seconds at the start of the pass that filled it
+        self.mfc_flows = ChannelBlock(4)
+        self.gas_time = NAN  # time.monotonic() of the last gas analyzer reading
+
+    # Scalar views of the meter block (NaN when missing)
+    power = _meter(POWER)
+    energy = _meter(ENERGY)
+    flow = _meter(FLOW)
+
+
+class DeviceManager:
+    def __init__(self, settings, lock=None):
+        self.settings = settings
+        self.lock = lock or threading.Lock()
+        self.power_port = settings.get("PM_PORT", "COM3")
+        #self.pm = PowerMeter(port=self.power_port)
+        self.gas_port = settings.get("GAS_ANALYZER_PORT", "COM4")
+        self.gas_analyzer = GasAnalyzer(self.gas_port)
+        self.rs485_port = settings.get("RS485_PORT", "COM5")
+        self.client = modbus_client(self.rs485_port, settings.get("MODBUS_TRANSPORT", "pymodbus"))
+        self.client.connect()
+        self.psm4 = PSM4Controller(self.client)
+        self.mfc = MFCController(port=self.rs485_port)
+        self.mfm = MFMFlowMeter(port=self.rs485_port, timeout=0.1)
+        # Read-through cache of Modbus readings: key -> (time the read started, value)
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.configure_power_meter()
+
+    def _cached(self, key, max_age):
+        entry = self.cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= max_age:
+            return entry
+        return None
+
+    def _read_through(self, key, max_age, read, replied):
+        """
+        (read time, value): the cached value of key when it is at most
+        max_age s old, else read() under the bus lock.  A caller that
+        waited for the lock takes what the reader ahead of it just got.
+        Only replies (replied(value)) are cached; the read time is
+        time.monotonic() when the read began.
+        """
+        if max_age > 0:
+            entry = self._cached(key, max_age)
+            if entry is not None:
+                self.cache_hits += 1
+                return entry
+        with self.lock:
+            if max_age > 0:
+                entry = self._cached(key, max_age)
+                if entry is not None:
+                    self.cache_hits += 1
+                    return entry
+            self.cache_misses += 1
+            entry = (time.monotonic(), read())
+            if replied(entry[1]):
+                self.cache[key] = entry
+        return entry
+        
+    def read_gas_analyzer(self):
+        """Read all gas values as a dict, or None if not connected."""
+        try:
+            return self.gas_analyzer.read_gases()
+        except Exception as e:
+            log.error(f"Gas analyzer read error: {e}")
+            return None
+
+    def read_temperature(self, slave_id, max_age=0.0):
+        """
+        Return (value, status); value is NaN unless status is ST_OK.  A
+        reading up to max_age s old may come from the cache.
+        """
+        return self.read_temperature_stamped(slave_id, max_age)[:2]
+
+    def read_temperature_stamped(self, slave_id, max_age=0.0):
+        """(value, status, time.monotonic() of the read), e.g. for ChannelBlock.set."""
+        read_time, (value, status) = self._read_through(
+            ("TK4", slave_id), max_age, lambda: self._read_temperature(slave_id),
+            lambda result: result[1] in (ST_OK, ST_OPEN))
+        return value, status, read_time
+
+    def _read_temperature(self, slave_id):
+        if not HEALTH.allow(f"TK4_{slave_id}"):
+            return NAN, ST_OFFLINE
+        try:
+            with STATS.transaction(f"TK4_{slave_id}", "read_temperature") as t:
+                adapt_modbus_timeout(self.client, f"TK4_{slave_id}", "read_temperature", "TK4_")
+                t.sent(MODBUS_REQUEST_LEN)
+                result = self.client.read_input_registers(0x03E8, count=2, device_id=slave_id)
+                ok = record_modbus_reply(t, result, modbus_reply_len(2))
+            if not ok:
+                return NAN, ST_NO_REPLY
+            raw, decimal = result.registers
+            return decode_tk4(raw, decimal)
+        except Exception as e:
+            log.error(f"TK4_{slave_id}: read error: {e}")
+            return NAN, ST_NO_REPLY
+
+
+    def set_sv(self, slave_id, temperature):
+        try:
+            with self.lock, STATS.transaction(f"TK4_{slave_id}", "set_setpoint") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                return record_modbus_reply(t, self.client.write_register(0x0000, int(temperature), device_id=slave_id),
+                                     MODBUS_WRITE_REPLY_LEN)
+        except Exception as e:
+            log.error(f"[MODBUS] Failed to set SV on ID {slave_id}: {e}")
+            return False
+
+    def start_heater(self, slave_id):
+        try:
+            with self.lock, STATS.transaction(f"TK4_{slave_id}", "control_heater") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                return record_modbus_reply(t, self.client.write_register(0x0032, 0, device_id=slave_id),
+                                     MODBUS_WRITE_REPLY_LEN)
+        except Exception as e:
+            log.error(f"[MODBUS] Failed to start heater ID {slave_id}: {e}")
+            return False
+
+    def stop_heater(self, slave_id):
+        try:
+            with self.lock, STATS.transaction(f"TK4_{slave_id}", "control_heater") as t:
+                full_modbus_timeout(self.client)
+                t.sent(MODBUS_REQUEST_LEN)
+                return record_modbus_reply(t, self.client.write_register(0x0032, 1, device_id=slave_id),
+                                     MODBUS_WRITE_REPLY_LEN)
+        except Exception as e:
+            log.error(f"[MODBUS] Failed to stop heater ID {slave_id}: {e}")
+            return False
+
+    def read_power_meter(self, timeout=None):
+        """(power, energy), None where missing; timeout overrides the adaptive reply timeout."""
+        if not HEALTH.allow("PM"):
+            return None, None
+        try:
+            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
+            # Read power
+                power_line = self._pm_query(ser, ":NUMERIC:NORMAL:VALUE?3", timeout)
+                power = float(power_line) if power_line else None
+
+            # Read energy
+                energy_line = self._pm_query(ser, ":NUMERIC:NORMAL:VALUE?4", timeout)
+                energy = float(energy_line) if energy_line else None
+
+                return power, energy
+        except Exception as e:
+            log.error(f"Power Meter: read error: {e}")
+            return None, None
+
+    def _pm_query(self, ser, cmd, timeout=None):
+        data = f"{cmd}\r\n".encode()
+        with STATS.transaction("PM", cmd) as t:
+            ser.timeout = timeout or reply_timeout("PM", cmd, PM_TIMEOUT)
+            ser.write(data)
+            t.sent(len(data))
+            line = ser.readline()
+            t.received(len(line))
+            if not line.endswith(b"\n"):
+                t.fail(timeout=True)
+            return line.decode().strip()
+
+    def configure_power_meter(self):
+        try:
+            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
+                _pm_write(ser, ":COMMunicate:REMote ON")
+                time.sleep(0.2)
+                _pm_write(ser, ":NUMERIC:NORMAL:ITEM4 WH,1")
+                time.sleep(0.2)
+                _pm_write(ser, ":INTEGrate:MODE MANUAL")
+                time.sleep(0.2)
+                _pm_write(ser, ":INTEGrate:FUNCtion WP")
+                time.sleep(0.5)
+        except Exception as e:
+            log.error(f"Power meter configuration error: {e}")
+
+    
+    def start_integration(self):
+        try:
+            with serial.Serial(self.power_port, baudrate=9600, timeout=2) as ser:
+                _pm_write(ser, ":INTEGrate:RESet")
+                time.sleep(0.5)
+                _pm_write(ser, ":INTEGrate:STARt")
+        except Exception as e:
+            log.error(f"Power meter start integration error: {e}")
+
+
+    def stop_integration(self):
+        try:
+            with serial.Serial(self.power_port, baudrate=9600, timeout=0.2) as ser:
+                _pm_write(ser, ":INTEGrate:STOP")
+        except Exception as e:
+         log.error(f"Power meter stop integration error: {e}")
+
+    def reset_integration(self):
+        try:
+            with serial.Serial(self.power_port, baudrate=9600, timeout=0.2) as ser:
+                _pm_write(ser, ":INTEGrate:RESet")
+                
+        except Exception as e:
+            log.error(f"Power meter reset integration error: {e}")
+
+
+
+    def set_mfc_flow(self, channel, value):
+        try:
+            #with self.lock:
+            return self.mfc.set_flow(channel, value)
+        except Exception as e:
+            log.error(f"MFC set flow error: {e}")
+            return False
+
+    def on_off_mfc(self, channel, state):
+        try:
+            
+            return self.mfc.on_off(channel, state)
+        except Exception as e:
+            log.error(f"MFC on/off error: {e}")
+            return False
+
+    def read_mfc_flow(self, channel):
+        """Read the PV (process value/flow) for a single MFC channel."""
+        try:
+            return self.mfc.read_flow(channel)
+        except Exception as e:
+            log.error(f"MFC read flow error: {e}")
+            return None
+
+    def read_all_mfc_flows(self, block=None):
+        """Read all MFC flows (channels 1-4) into a ChannelBlock."""
+        flows = block if block is not None else ChannelBlock(self.mfc.channels)
+        try:
+            return self.mfc.read_all_flows(flows)
+        except Exception as e:
+            log.error(f"MFC read all flows error: {e}")
+            flows.invalidate(ST_NO_REPLY)
+            return flows
+
+
+    def read_mfm_flow(self):
+        """
+    Read the MFM flow value.
+    Returns a float or None if not connected.
+    """
+        try:
+            return self.mfm.read_flow()
+        except Exception as e:
+            log.error(f"MFM read flow error: {e}")
+            return None
+
+
+    def read_pressures(self, block=None, max_age=0.0):
+        """PSM4 channels into a ChannelBlock; a reading up to max_age s old may come from the cache."""
+        pressures = block if block is not None else ChannelBlock(4)
+        try:
+            _, cached = self._read_through("PSM4", max_age, lambda: self.psm4.read_pressures(),
+                                           lambda block: not all(st & (ST_NO_REPLY | ST_OFFLINE) for st in block.status))
+            pressures.copy_from(cached)
+        except Exception as e:
+            log.error(f"PSM4 read error: {e}")
+            pressures.invalidate(ST_NO_REPLY)
+        return pressures
@@ -0,0 +1,103 @@
+"""
+Leveled, rate-limited console logging for drivers and worker threads.
+
+Built on the standard logging module.  A warning or error that repeats
+(same call site, same text) is written once per RATE_WINDOW; the next one
+after the window says how many were dropped, so a device that stopped
+answering costs one line a minute instead of one per poll.  Records go
+through a QueueHandler to a listener thread that does the actual console
+write, so a slow Windows console never blocks the worker.
+
+    log = get_logger("TK4")
+    log.warning("Read error on ID %s: %s", slave_id, e)
+    log.debug("Raw reply %s", resp.hex())   # hidden unless set_level(logging.DEBUG)
+
+The level comes from the RIG_LOG_LEVEL environment variable (INFO by
+default).
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+RATE_WINDOW = 60.0                # s between repeats of the same message
+RATE_LIMIT_LEVEL = logging.WARNING  # INFO and DEBUG are never dropped
+# Messages carry their own "[Worker]"-style tags, so the logger name is not printed
+FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+
+class RateLimitFilter(logging.Filter):
+    """Let a repeated message through once per window and count the rest."""
+    def __init__(self, window=RATE_WINDOW, level=RATE_LIMIT_LEVEL):
+        super().__init__()
+        self.window = window
+        self.level = level
+        self.lock = threading.Lock()
+        self.seen = {}  # key -> [time last written, suppressed since]
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.pathname, record.lineno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                return False
+            suppressed = entry[1] if entry is not None else 0
+            self.seen[key] = [now, 0]
+            if len(self.seen) > 1000:
+                # Drop keys that have been quiet for a whole window
+                self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.window}
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} repeats suppressed)"
+            record.args = None
+        return True
+
+
+_setup_lock = threading.Lock()
+_handler = None
+_listener = None
+_level = logging.getLevelName(os.environ.get("RIG_LOG_LEVEL", "INFO").upper())
+if not isinstance(_level, int):
+    _level = logging.INFO
+
+
+def _queue_handler():
+    global _handler, _listener
+    with _setup_lock:
+        if _handler is None:
+            records = queue.SimpleQueue()
+            console = logging.StreamHandler()
+            console.setFormatter(logging.Formatter(FORMAT, DATE_FORMAT))
+            _listener = logging.handlers.QueueListener(records, console)
+            _listener.start()
+            atexit.register(_listener.stop)
+            _handler = logging.handlers.QueueHandler(records)
+            _handler.addFilter(RateLimitFilter())
+        return _handler
+
+
+def get_logger(name):
+    """Logger writing through the shared rate limit and console thread."""
+    logger = logging.getLogger(name)
+    handler = _queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+        logger.setLevel(_level)
+        logger.propagate = False
+    return logger
+
+
+def set_level(level):
+    """Change the level of every logger handed out so far."""
+    global _level
+    _level = level
+    for logger in logging.Logger.manager.loggerDict.values():
+        if isinstance(logger, logging.Logger) and _handler in logger.handlers:
+            logger.setLevel(level)
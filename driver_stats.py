@@ -0,0 +1,256 @@
+"""
+Per-transaction statistics for every driver call.
+
+Each bus transaction in devices.py runs inside STATS.transaction(device,
+command), which records latency, failures, timeouts, retries and the
+bytes written/read, keyed by (device, command).  The GUIs show
+STATS.snapshot() in a stats panel and start_dump() appends a snapshot
+to a JSON-lines file at a fixed interval.  STATS.timeout() turns the
+recent good replies into the reply timeout of the next call.
+
+    with STATS.transaction("TK4_1", "read_temperature") as t:
+        t.sent(8)
+        ...
+        t.received(9)          # or t.fail(timeout=True)
+"""
+import datetime
+import json
+import math
+import threading
+import time
+from collections import deque
+
+import serial
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from driver_log import get_logger
+
+# Histogram bucket upper edges in ms; the last bucket is open
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+RECENT = 500  # latencies kept per (device, command) for the percentiles
+# Counted as timeouts: no reply, whether the device kept quiet or the port
+# under the call failed (unplugged adapter).  Both count toward the breaker.
+TIMEOUT_ERRORS = (ModbusIOException, ConnectionException, serial.SerialException, OSError)
+# Adaptive timeouts: p99 of the good replies times the margin, once there are enough of them
+TIMEOUT_MARGIN = 2.0
+TIMEOUT_MIN_SAMPLES = 20
+
+log = get_logger("stats")
+
+
+def nearest_rank(values, q):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, math.ceil(q / 100.0 * len(values)) - 1))
+    return values[k]
+
+
+class CallStats:
+    """
+    Counters and a latency histogram for one (device, command); percentiles
+    come from the last RECENT calls, the adaptive timeout from the last
+    RECENT successful ones.
+    """
+    __slots__ = ("calls", "errors", "timeouts", "retries", "bytes_out", "bytes_in",
+                 "total_ms", "max_ms", "last_ms", "buckets", "recent", "good")
+
+    def __init__(self):
+        self.calls = self.errors = self.timeouts = self.retries = 0
+        self.bytes_out = self.bytes_in = 0
+        self.total_ms = self.max_ms = self.last_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=RECENT)
+        self.good = deque(maxlen=RECENT)
+
+    def add(self, ms, ok, timeout, retries, tx, rx):
+        self.calls += 1
+        self.errors += not ok
+        self.timeouts += timeout
+        self.retries += retries
+        self.bytes_out += tx
+        self.bytes_in += rx
+        self.total_ms += ms
+        self.last_ms = ms
+        self.recent.append(ms)
+        if ok:
+            self.good.append(ms)
+        if ms > self.max_ms:
+            self.max_ms = ms
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+
+    def percentile(self, q):
+        """Nearest-rank percentile of the recent latencies."""
+        return nearest_rank(sorted(self.recent), q)
+
+    def as_dict(self):
+        return {
+            "calls": self.calls, "errors": self.errors, "timeouts": self.timeouts,
+            "retries": self.retries, "bytes_out": self.bytes_out, "bytes_in": self.bytes_in,
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(50), 3), "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3), "last_ms": round(self.last_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "histogram": dict(zip([f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.buckets)),
+        }
+
+
+class Transaction:
+    """One bus exchange; the driver reports bytes and the outcome."""
+    __slots__ = ("stats", "device", "command", "ok", "timeout", "retries", "tx", "rx", "t0")
+
+    def __init__(self, stats, device, command):
+        self.stats = stats
+        self.device = device
+        self.command = command
+        self.ok = True
+        self.timeout = False
+        self.retries = 0
+        self.tx = self.rx = 0
+
+    def sent(self, nbytes):
+        self.tx += nbytes
+
+    def received(self, nbytes):
+        self.rx += nbytes or 0
+
+    def fail(self, timeout=False):
+        self.ok = False
+        self.timeout = self.timeout or timeout
+
+    def retry(self):
+        self.retries += 1
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fail(timeout=issubclass(exc_type, TIMEOUT_ERRORS))
+        self.stats.record(self.device, self.command, time.perf_counter() - self.t0,
+                          self.ok, self.timeout, self.retries, self.tx, self.rx)
+        return False
+
+
+class DriverStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.since = time.time()
+        self.observers = []  # called with (device, command, ok, timeout) after every transaction
+        self._dump_thread = None
+        self._dump_halt = threading.Event()
+
+    def transaction(self, device, command):
+        return Transaction(self, device, command)
+
+    def record(self, device, command, seconds, ok=True, timeout=False, retries=0, tx=0, rx=0):
+        key = (device, command)
+        with self.lock:
+            stats = self.calls.get(key)
+            if stats is None:
+                stats = self.calls[key] = CallStats()
+            stats.add(seconds * 1000.0, ok, timeout, retries, tx, rx)
+        for observer in self.observers:
+            observer(device, command, ok, timeout)
+
+    def timeout(self, device, command, default, floor, ceiling, family=None):
+        """
+        Reply timeout in seconds for the next (device, command): p99 of its
+        recent good replies x TIMEOUT_MARGIN, within [floor, ceiling].  A
+        device with too few good replies borrows those of the devices whose
+        name starts with `family` (e.g. "TK4_"); with none, `default`.
+        """
+        with self.lock:
+            stats = self.calls.get((device, command))
+            good = list(stats.good) if stats is not None else []
+            if len(good) < TIMEOUT_MIN_SAMPLES and family:
+                good = [ms for (d, c), s in self.calls.items()
+                        if c == command and d.startswith(family) for ms in s.good]
+        if len(good) < TIMEOUT_MIN_SAMPLES:
+            return default
+        seconds = nearest_rank(sorted(good), 99) * TIMEOUT_MARGIN / 1000.0
+        return min(ceiling, max(floor, seconds))
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+            self.since = time.time()
+
+    def snapshot(self):
+        """{"device/command": stats dict} plus per-device totals, sorted by time spent."""
+        with self.lock:
+            calls = {f"{d}/{c}": s.as_dict() for (d, c), s in self.calls.items()}
+            devices = {}
+            for (d, c), s in self.calls.items():
+                dev = devices.setdefault(d, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0})
+                dev["calls"] += s.calls
+                dev["errors"] += s.errors
+                dev["timeouts"] += s.timeouts
+                dev["total_ms"] += s.total_ms
+            since = self.since
+        busy = sum(d["total_ms"] for d in devices.values()) or 1.0
+        for dev in devices.values():
+            dev["share"] = round(dev["total_ms"] / busy, 4)
+            dev["total_ms"] = round(dev["total_ms"], 3)
+        order = sorted(calls, key=lambda k: -calls[k]["total_ms"])
+        return {
+            "since": datetime.datetime.fromtimestamp(since).isoformat(timespec="seconds"),
+            "devices": dict(sorted(devices.items(), key=lambda kv: -kv[1]["total_ms"])),
+            "calls": {k: calls[k] for k in order},
+        }
+
+    def rows(self):
+        """Table rows for the stats panels, busiest first."""
+        snap = self.snapshot()
+        busy = sum(d["total_ms"] for d in snap["devices"].values()) or 1.0
+        out = []
+        for key, s in snap["calls"].items():
+            device, command = key.split("/", 1)
+            out.append([
+                device, command, str(s["calls"]), str(s["errors"]), str(s["timeouts"]),
+                str(s["retries"]), f"{s['mean_ms']:.1f}", f"{s['p99_ms']:.1f}", f"{s['max_ms']:.1f}",
+                f"{s['bytes_out']}/{s['bytes_in']}", f"{100.0 * s['total_ms'] / busy:.1f}%",
+            ])
+        return out
+
+    # --- Periodic dump ---
+    def dump(self, path):
+        """Append one snapshot as a JSON line."""
+        snap = self.snapshot()
+        snap["time"] = datetime.datetime.now().isoformat(timespec="seconds")
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(snap) + "\n")
+        except Exception as e:
+            log.error(f"[Stats] Dump error: {e}")
+
+    def start_dump(self, path, interval=60.0):
+        if self._dump_thread is not None:
+            return
+        self._dump_halt.clear()
+
+        def loop():
+            while not self._dump_halt.wait(interval):
+                self.dump(path)
+        self._dump_thread = threading.Thread(target=loop, daemon=True)
+        self._dump_thread.start()
+
+    def stop_dump(self, path=None):
+        """Stop the dump thread; with a path, write a final snapshot."""
+        if self._dump_thread is not None:
+            self._dump_halt.set()
+            self._dump_thread.join(timeout=2)
+            self._dump_thread = None
+        if path:
+            self.dump(path)
+
+
+ROW_HEADERS = ["Device", "Command", "Calls", "Errors", "Timeouts", "Retries",
+               "Mean ms", "p99 ms", "Max ms", "Bytes out/in", "Time"]
+
+STATS = DriverStats()
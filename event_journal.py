@@ -0,0 +1,146 @@
+"""
+Structured journal of abnormal events (JSON lines).
+
+record() stamps the event and appends it to an in-memory queue; a writer
+thread appends everything queued to the file every FLUSH_INTERVAL, so an
+emergency stop never waits on the disk.  One line per event:
+
+    {"time": 1760000000.123, "mono": 5123.456, "code": "OVERTEMP",
+     "device": "TK4_2", "value": 512.3, "limit": 500.0, "message": "..."}
+
+`time` is epoch seconds for people and other logs, `mono` is
+time.monotonic() for ordering and intervals within one run.  EventIndex
+reads a journal (incrementally on refresh) and answers queries by code,
+device and time window without rescanning the file.
+
+    JOURNAL = EventJournal("abnormal_events.jsonl")
+    JOURNAL.record(OVERTEMP, "Overtemperature: Heater 1", device="TK4_2", value=512.3, limit=500.0)
+"""
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+from driver_log import get_logger
+
+# Event codes
+OVERTEMP = "OVERTEMP"
+OVERPRESSURE = "OVERPRESSURE"
+EMERGENCY_STOP = "EMERGENCY_STOP"
+EMERGENCY_RESET = "EMERGENCY_RESET"
+INTERLOCK = "INTERLOCK"  # emergency stop run by the acquisition service
+LIMIT = "LIMIT"          # other limit trips
+
+DEFAULT_FILE = "abnormal_events.jsonl"
+FLUSH_INTERVAL = 1.0  # s between writes
+
+log = get_logger("journal")
+
+
+class EventJournal:
+    def __init__(self, path=DEFAULT_FILE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = deque()  # append/popleft are atomic, record() takes no lock
+        self._write_lock = threading.Lock()
+        self._halt = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, code, message="", device=None, value=None, limit=None, **extra):
+        """Queue one event; returns at once."""
+        event = {"time": time.time(), "mono": time.monotonic(), "code": code}
+        if device is not None:
+            event["device"] = device
+        if value is not None:
+            event["value"] = value
+        if limit is not None:
+            event["limit"] = limit
+        if message:
+            event["message"] = message
+        event.update(extra)
+        self._queue.append(event)
+
+    def _run(self):
+        while not self._halt.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far."""
+        with self._write_lock:
+            lines = []
+            while self._queue:
+                lines.append(json.dumps(self._queue.popleft(), default=str))
+            if not lines:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.written += len(lines)
+            except OSError as e:
+                log.error(f"[Journal] Could not write {self.path}: {e}")
+
+    def close(self):
+        self._halt.set()
+        self._thread.join(timeout=2)
+        self.flush()
+
+
+class EventIndex:
+    """
+    Events of one journal file, in file order, with per-code and per-device
+    lists of positions.  refresh() reads only what was appended since the
+    last call.
+    """
+    def __init__(self, path=DEFAULT_FILE):
+        self.path = path
+        self.events = []
+        self.times = []
+        self.by_code = {}
+        self.by_device = {}
+        self._offset = 0
+        self.refresh()
+
+    def refresh(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        # Leave a partly written last line for the next refresh
+        end = data.rfind(b"\n") + 1
+        added = 0
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            i = len(self.events)
+            self.events.append(event)
+            self.times.append(event.get("time", 0.0))
+            self.by_code.setdefault(event.get("code"), []).append(i)
+            if "device" in event:
+                self.by_device.setdefault(event["device"], []).append(i)
+            added += 1
+        self._offset += end
+        return added
+
+    def query(self, code=None, device=None, start=None, end=None):
+        """Events matching every given filter; start/end are epoch seconds (inclusive)."""
+        lo = 0 if start is None else bisect.bisect_left(self.times, start)
+        hi = len(self.events) if end is None else bisect.bisect_right(self.times, end)
+        positions = None
+        for key, table in ((code, self.by_code), (device, self.by_device)):
+            if key is not None:
+                found = table.get(key, [])
+                positions = found if positions is None else sorted(set(positions) & set(found))
+        if positions is None:
+            return self.events[lo:hi]
+        return [self.events[i] for i in positions[bisect.bisect_left(positions, lo):bisect.bisect_left(positions, hi)]]
+
+    def last(self, code=None, device=None):
+        found = self.query(code, device)
+        return found[-1] if found else None
@@ -0,0 +1,105 @@
+"""
+Export finished runs from .plog segments to formatted xlsx.
+
+    python export_xlsx.py "Data log"                      # each segment -> .xlsx next to it
+    python export_xlsx.py "Data log" -o run.xlsx          # all segments merged into one sheet
+    python export_xlsx.py process_log_20250101_120000.plog --start "2025-01-01 12:30:00"
+
+Uses openpyxl's write-only mode with the headers and column widths the
+logger stored in the segment header, so the result looks like the xlsx
+files the logger used to write directly.
+"""
+import argparse
+import os
+import sys
+import time
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from log_catalog import LogCatalog, parse_timestamp
+from row_codec import TimestampFormatter
+from run_log import EXTENSION, read_records
+
+
+def _new_sheet(header):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet")
+    # Write-only sheets need the widths before the first row.
+    for i, width in enumerate(header["widths"], 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.append(header["columns"])
+    return wb, ws
+
+
+def export_run(sources, target, start=None, end=None):
+    """
+    Write every record of `sources` (.plog paths, in order) between start and
+    end (datetimes, optional) into one workbook.  Returns the row count.
+    """
+    t_start = time.mktime(start.timetuple()) if start else None
+    t_end = time.mktime(end.timetuple()) + 1 if end else None
+    fmt = TimestampFormatter()
+    wb = ws = columns = None
+    rows = 0
+    for path in sources:
+        header, records = read_records(path, t_start, t_end)
+        if wb is None:
+            wb, ws = _new_sheet(header)
+            columns = header["columns"]
+        elif header["columns"] != columns:
+            print(f"[Export] Skipping {path}: different columns")
+            continue
+        for record in records.tolist():
+            ws.append([fmt(record[0])] + [None if v != v else v for v in record[1:]])
+        rows += len(records)
+    if wb is None:
+        raise ValueError("nothing to export")
+    wb.save(target)
+    return rows
+
+
+def expand_sources(paths, start=None, end=None):
+    """Files are taken as given; folders expand to their .plog segments overlapping [start, end]."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            catalog = LogCatalog(path).refresh()
+            sources.extend(s.path for s in catalog.segments_between(start, end)
+                           if s.path.endswith(EXTENSION))
+        else:
+            sources.append(path)
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export .plog process logs to xlsx")
+    parser.add_argument("paths", nargs="+", help=".plog files or log folders")
+    parser.add_argument("-o", "--output", help="merge everything into this xlsx")
+    parser.add_argument("--start", help="first timestamp, YYYY-mm-dd HH:MM:SS")
+    parser.add_argument("--end", help="last timestamp, YYYY-mm-dd HH:MM:SS")
+    args = parser.parse_args(argv)
+
+    start, end = parse_timestamp(args.start), parse_timestamp(args.end)
+    if (args.start and start is None) or (args.end and end is None):
+        parser.error("timestamps must look like 2025-01-31 14:00:00")
+    sources = expand_sources(args.paths, start, end)
+    if not sources:
+        print("[Export] No process logs found")
+        return 1
+
+    jobs = [(sources, args.output)] if args.output else \
+        [([src], os.path.splitext(src)[0] + ".xlsx") for src in sources]
+    for job_sources, target in jobs:
+        t0 = time.perf_counter()
+        try:
+            rows = export_run(job_sources, target, start, end)
+        except Exception as e:
+            print(f"[Export] {target}: {e}")
+            continue
+        print(f"[Export] {target}: {rows} rows in {time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Catalog of process_log_* segments.
+
+The logger starts a new file every hour (control1.py) or every run
+(control_v1.0.4.py), so one run usually spans several files.  Segments are
+.plog streaming logs (run_log.py) or xlsx files from older versions and
+export_xlsx.py; when both exist for the same run the .plog is used.  The catalog
+keeps every segment sorted by its first timestamp together with its last
+timestamp, so the history viewer can ask for an arbitrary time window and
+only the overlapping files are read.
+"""
+import bisect
+import datetime
+import json
+import os
+from collections import namedtuple
+
+from driver_log import get_logger
+from run_log import read_plog_span, read_plog_segment
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+INDEX_FILE = ".log_catalog.json"
+
+LogSegment = namedtuple("LogSegment", ["path", "start", "end", "size", "mtime"])
+
+log = get_logger("catalog")
+
+
+def parse_timestamp(value):
+    """Return a datetime for a logged timestamp cell, or None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.strptime(str(value).strip(), TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def read_xlsx_span(path):
+    """Return (first, last) timestamp of an xlsx log without loading it."""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        ws = wb.active
+        first = last = None
+        for (value,) in ws.iter_rows(min_row=2, max_col=1, values_only=True):
+            ts = parse_timestamp(value)
+            if ts is None:
+                continue
+            if first is None:
+                first = ts
+            last = ts
+        return first, last
+    finally:
+        wb.close()
+
+
+def coerce_numeric(df):
+    """Turn every data column into float64 once, at load time ("NC"/"--" text in old logs becomes NaN)."""
+    import pandas as pd
+    for col in df.columns:
+        if col != "Timestamp" and df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def read_xlsx_segment(path):
+    import pandas as pd
+    df = pd.read_excel(path)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+    return coerce_numeric(df)
+
+
+class LogCatalog:
+    """
+    Time index over the log files of one folder.
+
+    refresh() only rescans the folder when its mtime changed (a file was
+    added or removed) and otherwise only re-stats the newest segment, which
+    is the one the logger is still appending to.  Spans of closed segments
+    are cached in INDEX_FILE so reopening the viewer does not touch them.
+    Lookups bisect the sorted start times.
+    """
+    def __init__(self, folder, prefix="process_log_"):
+        self.folder = folder
+        self.prefix = prefix
+        # In order of preference when one run exists in several formats.
+        self.readers = {
+            ".plog": (read_plog_span, read_plog_segment),
+            ".xlsx": (read_xlsx_span, read_xlsx_segment),
+        }
+        self.index_path = os.path.join(folder, INDEX_FILE)
+        self._segments = []
+        self._starts = []
+        self._dir_mtime = None
+        self._cache = self._load_index()
+
+    # --- Index maintenance ---
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        try:
+            with open(self.index_path, "w") as f:
+                json.dump(self._cache, f)
+        except OSError as e:
+            log.warning(f"[Catalog] Could not save index: {e}")
+
+    def _reader(self, name):
+        return self.readers.get(os.path.splitext(name)[1].lower())
+
+    def _segment_for(self, path, st):
+        name = os.path.basename(path)
+        entry = self._cache.get(name)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            start, end = entry["start"], entry["end"]
+        else:
+            try:
+                first, last = self._reader(name)[0](path)
+            except Exception as e:
+                log.warning(f"[Catalog] Skipping unreadable log {name}: {e}")
+                return None
+            if first is None:
+                return None
+            start, end = first.strftime(TIMESTAMP_FORMAT), last.strftime(TIMESTAMP_FORMAT)
+            self._cache[name] = {"size": st.st_size, "mtime": st.st_mtime, "start": start, "end": end}
+        return LogSegment(path, parse_timestamp(start), parse_timestamp(end), st.st_size, st.st_mtime)
+
+    def _rebuild(self, segments):
+        preference = list(self.readers)
+        best = {}
+        for seg in segments:
+            stem, ext = os.path.splitext(os.path.basename(seg.path))
+            rank = preference.index(ext.lower())
+            if stem not in best or rank < best[stem][0]:
+                best[stem] = (rank, seg)
+        segments = [seg for _, seg in best.values()]
+        segments.sort(key=lambda s: s.start)
+        self._segments = segments
+        self._starts = [s.start for s in segments]
+
+    def refresh(self):
+        """Bring the index up to date with the folder."""
+        try:
+            dir_mtime = os.stat(self.folder).st_mtime
+        except OSError:
+            self._rebuild([])
+            return self
+        if dir_mtime != self._dir_mtime:
+            segments = []
+            names = set()
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if not entry.name.startswith(self.prefix) or self._reader(entry.name) is None:
+                        continue
+                    names.add(entry.name)
+                    seg = self._segment_for(entry.path, entry.stat())
+                    if seg is not None:
+                        segments.append(seg)
+            for stale in set(self._cache) - names:
+                del self._cache[stale]
+            self._rebuild(segments)
+            self._dir_mtime = dir_mtime
+            self._save_index()
+        elif self._segments:
+            # Only the newest segment can still be growing.
+            last = self._segments[-1]
+            try:
+                st = os.stat(last.path)
+            except OSError:
+                self._dir_mtime = None
+                return self.refresh()
+            if st.st_size != last.size or st.st_mtime != last.mtime:
+                seg = self._segment_for(last.path, st)
+                if seg is not None:
+                    self._segments[-1] = seg
+                    self._save_index()
+        return self
+
+    # --- Lookups ---
+    def segments(self):
+        return list(self._segments)
+
+    def latest(self):
+        return self._segments[-1] if self._segments else None
+
+    def span(self):
+        """(start, end) of everything that is logged, or (None, None)."""
+        if not self._segments:
+            return None, None
+        return self._segments[0].start, self._segments[-1].end
+
+    def find(self, when):
+        """Segment whose span contains `when`, or None."""
+        i = bisect.bisect_right(self._starts, when) - 1
+        if i >= 0 and self._segments[i].end >= when:
+            return self._segments[i]
+        return None
+
+    def segments_between(self, start=None, end=None):
+        """Segments overlapping [start, end]; None means open-ended."""
+        lo = 0
+        if start is not None:
+            lo = max(bisect.bisect_right(self._starts, start) - 1, 0)
+            # Segments do not overlap, so at most the first candidate ends before `start`.
+            if lo < len(self._segments) and self._segments[lo].end < start:
+                lo += 1
+        hi = len(self._segments) if end is None else bisect.bisect_right(self._starts, end)
+        return self._segments[lo:hi]
+
+    def load_window(self, start=None, end=None):
+        """DataFrame with every logged row between start and end (inclusive)."""
+        import pandas as pd
+        frames = []
+        for seg in self.segments_between(start, end):
+            try:
+                frames.append(self._reader(seg.path)[1](seg.path))
+            except Exception as e:
+                log.error(f"[Catalog] Could not read {seg.path}: {e}")
+        if not frames:
+            return pd.DataFrame(columns=["Timestamp"])
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df = df.dropna(subset=["Timestamp"]).sort_values("Timestamp", kind="stable")
+        if start is not None:
+            df = df[df["Timestamp"] >= start]
+        if end is not None:
+            df = df[df["Timestamp"] <= end]
+        return df.reset_index(drop=True)
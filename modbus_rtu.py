@@ -0,0 +1,181 @@
+"""
+Native Modbus RTU transport for the RS485 bus.
+
+The rig sends the same dozen requests every cycle (TK4 PV reads, the
+four PSM4 channels, relay and heater writes), so RtuClient builds each
+request frame once, CRC included, and keeps one response object per
+request whose `registers` list is refilled in place.  Replies are checked
+with a table-driven CRC-16 and decoded with a precompiled struct, which
+brings the per-transaction CPU cost to a few microseconds; pymodbus
+rebuilds PDUs and response objects on every call.
+
+RtuClient implements the part of pymodbus' ModbusSerialClient the drivers
+use (connect/close/is_socket_open, read_input_registers, write_register),
+so it is selected with "MODBUS_TRANSPORT": "native" in settings.json
+instead of by changing the drivers (see devices.modbus_client).
+
+A missing or short reply raises TimeoutError; a reply with a bad CRC,
+the wrong unit or function, or a Modbus exception code comes back as a
+response whose isError() is True.  Responses are reused: read
+`registers` before the next request of the same kind.
+"""
+import struct
+
+import serial
+
+READ_INPUT_REGISTERS = 0x04
+WRITE_REGISTER = 0x06
+MIN_REPLY_LEN = 5  # unit, function, exception code / first bytes, CRC
+MAX_CACHED = 256   # requests kept; writes of ever new setpoints are built each time beyond that
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(data):
+    """Modbus CRC-16 (poly 0xA001, init 0xFFFF); 0 over a whole frame with a valid CRC."""
+    crc = 0xFFFF
+    table = CRC_TABLE
+    for b in data:
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
+
+
+def build_frame(unit, function, address, value):
+    """Request frame for the 8-byte requests used here: unit, function, two uint16, CRC."""
+    pdu = struct.pack(">BBHH", unit, function, address, value)
+    return pdu + struct.pack("<H", crc16(pdu))
+
+
+class RtuResponse:
+    """Decoded reply; `exception_code` is the Modbus exception, or -1 for a corrupt frame."""
+    __slots__ = ("unit", "function", "registers", "exception_code")
+
+    def __init__(self, unit, function, count=0):
+        self.unit = unit
+        self.function = function
+        self.registers = [0] * count
+        self.exception_code = None
+
+    def isError(self):  # pymodbus name, record_modbus_reply() calls it
+        return self.exception_code is not None
+
+    def __repr__(self):
+        if self.exception_code is None:
+            return f"RtuResponse(unit={self.unit}, function={self.function}, registers={self.registers})"
+        return f"RtuResponse(unit={self.unit}, function={self.function}, error={self.exception_code})"
+
+
+class _Request:
+    __slots__ = ("frame", "reply_len", "response", "decode")
+
+    def __init__(self, frame, reply_len, response, decode):
+        self.frame = frame
+        self.reply_len = reply_len
+        self.response = response
+        self.decode = decode
+
+
+class RtuClient:
+    def __init__(self, port, baudrate=9600, bytesize=8, parity='N', stopbits=2, timeout=0.2):
+        self.port = port
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self.timeout = timeout
+        self.socket = None  # the serial.Serial, named like pymodbus' attribute
+        self._requests = {}  # (unit, function, address, count or value) -> _Request
+        self._stale = False  # a reply went missing: drop leftovers before the next request
+
+    # --- Connection ---
+    def connect(self):
+        if self.socket is not None and self.socket.is_open:
+            return True
+        try:
+            self.socket = serial.Serial(port=self.port, baudrate=self.baudrate, bytesize=self.bytesize,
+                                        parity=self.parity, stopbits=self.stopbits, timeout=self.timeout)
+        except serial.SerialException:
+            self.socket = None
+            return False
+        self._stale = False
+        return True
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def is_socket_open(self):
+        return self.socket is not None and self.socket.is_open
+
+    @property
+    def connected(self):
+        return self.is_socket_open()
+
+    def set_timeout(self, seconds):
+        """Reply timeout of the next request."""
+        self.timeout = seconds
+        if self.socket is not None and self.socket.timeout != seconds:
+            self.socket.timeout = seconds
+
+    # --- Requests ---
+    def _request(self, unit, function, address, value):
+        key = (unit, function, address, value)
+        request = self._requests.get(key)
+        if request is None:
+            frame = build_frame(unit, function, address, value)
+            if function == READ_INPUT_REGISTERS:
+                response = RtuResponse(unit, function, value)
+                request = _Request(frame, 5 + 2 * value, response, struct.Struct(f">{value}H").unpack_from)
+            else:
+                # A write is answered with an echo of the request
+                request = _Request(frame, len(frame), RtuResponse(unit, function), None)
+            if len(self._requests) < MAX_CACHED:
+                self._requests[key] = request
+        return request
+
+    def _transact(self, request):
+        ser = self.socket
+        if ser is None:
+            raise ConnectionError(f"{self.port} is not open")
+        if self._stale:
+            ser.reset_input_buffer()
+            self._stale = False
+        response = request.response
+        ser.write(request.frame)
+        reply = ser.read(MIN_REPLY_LEN)
+        if len(reply) == MIN_REPLY_LEN and not reply[1] & 0x80 and request.reply_len > MIN_REPLY_LEN:
+            reply += ser.read(request.reply_len - MIN_REPLY_LEN)
+        if len(reply) < MIN_REPLY_LEN or (not reply[1] & 0x80 and len(reply) < request.reply_len):
+            self._stale = True
+            raise TimeoutError(f"No reply from unit {response.unit} ({len(reply)} bytes)")
+        if crc16(reply) != 0 or reply[0] != response.unit or reply[1] & 0x7F != response.function:
+            self._stale = True
+            response.exception_code = -1
+        elif reply[1] & 0x80:
+            response.exception_code = reply[2]
+        elif request.decode is None:
+            response.exception_code = None if reply == request.frame else -1
+        elif reply[2] != request.reply_len - 5:
+            response.exception_code = -1
+        else:
+            response.registers[:] = request.decode(reply, 3)
+            response.exception_code = None
+        return response
+
+    def read_input_registers(self, address, count=1, device_id=1):
+        return self._transact(self._request(device_id, READ_INPUT_REGISTERS, address, count))
+
+    def write_register(self, address, value, device_id=1):
+        return self._transact(self._request(device_id, WRITE_REGISTER, address, value))
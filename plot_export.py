@@ -0,0 +1,127 @@
+"""
+Plot export in worker processes.
+
+The GUI thread only packs the selected columns into numpy arrays and hands
+them to a process pool; rendering and savefig happen in the worker with the
+Agg canvas, so no pyplot state or global rcParams are touched in the GUI
+process.  Several exports can run at the same time.
+"""
+import concurrent.futures
+import threading
+
+DARK_RC = {
+    "axes.edgecolor": "white",
+    "axes.labelcolor": "white",
+    "xtick.color": "white",
+    "ytick.color": "white",
+    "text.color": "white",
+    "figure.facecolor": "black",
+    "axes.facecolor": "black",
+    "savefig.facecolor": "black",
+}
+
+DEFAULT_AXIS_LABELS = {
+    "Temperature": "Temperature (°C)",
+    "Pressure": "Pressure (bar)",
+    "Other": "Other",
+}
+
+
+def pack_series(df, columns):
+    """
+    Return (x, y) for the given DataFrame columns.
+    x: float64 seconds from the first timestamp, y: float32 array (columns x rows).
+    Columns are expected to be numeric already (LogCatalog coerces at load time).
+    """
+    import numpy as np
+    import pandas as pd
+    ts = pd.to_datetime(df["Timestamp"])
+    x = (ts - ts.iloc[0]).dt.total_seconds().to_numpy(dtype=np.float64)
+    y = np.empty((len(columns), len(df)), dtype=np.float32)
+    for i, col in enumerate(columns):
+        y[i] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    return x, y
+
+
+def render_plot(filename, x, y, names, groups, axis_labels=None, dark=False, figsize=(12, 5)):
+    """Render one export in the worker process. `groups[i]` is "Temperature", "Pressure" or anything else."""
+    import matplotlib
+    import matplotlib.style
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    labels = dict(DEFAULT_AXIS_LABELS, **(axis_labels or {}))
+    rc = DARK_RC if dark else {}
+    style = "dark_background" if dark else "default"
+    with matplotlib.style.context(style), matplotlib.rc_context(rc):
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        temp = [i for i, g in enumerate(groups) if g == "Temperature"]
+        press = [i for i, g in enumerate(groups) if g == "Pressure"]
+        other = [i for i, g in enumerate(groups) if g not in ("Temperature", "Pressure")]
+
+        # Up to 3 Y axes, same layout as the on-screen plot
+        ax1 = fig.add_subplot(111)
+        ax2 = ax1.twinx() if press or other else None
+        ax3 = None
+        if press and other:
+            ax3 = ax1.twinx()
+            ax3.spines["right"].set_position(("axes", 1.15))
+            ax3.spines["right"].set_visible(True)
+
+        lines = []
+        for idx, ax in [(temp, ax1), (press, ax2), (other, ax3 or ax2 or ax1)]:
+            for i in idx:
+                line, = ax.plot(x, y[i], label=names[i], linewidth=2)
+                lines.append(line)
+        ax1.set_ylabel(labels["Temperature"])
+        if press:
+            ax2.set_ylabel(labels["Pressure"])
+        if other and (ax3 or ax2):
+            (ax3 or ax2).set_ylabel(labels["Other"])
+        ax1.set_xlabel("Time (s from start)")
+        if lines:
+            ax1.legend(lines, [l.get_label() for l in lines], loc="upper left", fontsize=12)
+        fig.tight_layout()
+        fig.savefig(filename, bbox_inches="tight")
+    return filename
+
+
+class PlotExporter:
+    """
+    Queue of plot exports served by a process pool.
+
+    submit() returns immediately; on_done(filename, error) is called from a
+    pool thread when the file is written (error is None on success), so GUI
+    code must marshal it back (wx.CallAfter etc.).
+    """
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                import multiprocessing
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, filename, x, y, names, groups, on_done=None, **style):
+        future = self._executor().submit(render_plot, filename, x, y, list(names), list(groups), **style)
+        if on_done is not None:
+            future.add_done_callback(lambda f: on_done(filename, f.exception()))
+        return future
+
+    def export_frame(self, df, columns, groups, filename, on_done=None, **style):
+        """Pack `columns` of df and submit them."""
+        x, y = pack_series(df, columns)
+        return self.submit(filename, x, y, columns, groups, on_done=on_done, **style)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=not wait)
+                self._pool = None
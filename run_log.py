@@ -0,0 +1,135 @@
+"""
+Streaming binary process log (.plog).
+
+Layout: MAGIC, a little-endian uint32 header length, a JSON header
+({"columns": [...], "widths": [...]}), then fixed-width records of
+float64 values (epoch seconds first, NaN for missing values) exactly as
+RowEncoder.encode() produces them.  Appending a row is one write() of a
+few hundred bytes, so the logger never rewrites the file; export_xlsx.py
+turns finished runs into formatted workbooks afterwards.
+"""
+import datetime
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"PLOG1\n"
+EXTENSION = ".plog"
+# Companion file with the acquisition time of every value (same layout, see RowEncoder.encode_times)
+TIMES_EXTENSION = ".ptimes"
+_HEADER_LEN = struct.Struct("<I")
+
+
+class RunLogWriter:
+    """Append-only writer for one .plog segment; creates the header on first use."""
+    def __init__(self, path, columns, widths=None):
+        self.path = path
+        self.columns = list(columns)
+        self.widths = list(widths) if widths else [12] * len(self.columns)
+        self.record = struct.Struct("<" + "d" * len(self.columns))
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            header, _ = read_header(path)
+            if header["columns"] != self.columns:
+                raise ValueError(f"{path} was written with different columns")
+        self._file = open(path, "ab")
+        if new:
+            header = json.dumps({"columns": self.columns, "widths": self.widths}).encode()
+            self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+            self._file.flush()
+
+    def append(self, record):
+        """Write one record; flushed so the history viewer sees it immediately."""
+        self._file.write(self.record.pack(*record))
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_header(path):
+    """Return (header dict, offset of the first record)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a process log")
+        (size,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        header = json.loads(f.read(size))
+    return header, len(MAGIC) + _HEADER_LEN.size + size
+
+
+def read_records(path, start=None, end=None):
+    """
+    (header, array) with one row per complete record (a torn last record
+    from a crash is ignored).  start/end are epoch seconds.
+    """
+    header, offset = read_header(path)
+    width = len(header["columns"])
+    count = (os.path.getsize(path) - offset) // (8 * width)
+    records = np.fromfile(path, dtype="<f8", count=count * width, offset=offset).reshape(count, width)
+    if start is not None:
+        records = records[records[:, 0] >= start]
+    if end is not None:
+        records = records[records[:, 0] <= end]
+    return header, records
+
+
+def local_datetimes(epochs):
+    """Naive local datetime64 values (whole seconds) for epoch seconds, DST aware."""
+    seconds = np.floor(np.asarray(epochs, dtype=np.float64)).astype(np.int64)
+    if not len(seconds):
+        return seconds.astype("datetime64[s]")
+    # UTC offsets only change on hour boundaries, so look them up once per hour.
+    hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(h) * 3600).tm_gmtoff for h in hours], dtype=np.int64)
+    return (seconds + offsets[inverse]).astype("datetime64[s]")
+
+
+def times_path(path):
+    return os.path.splitext(path)[0] + TIMES_EXTENSION
+
+
+def read_channel_series(path):
+    """
+    {column: (epoch times, values)} from a .plog and its .ptimes file: each
+    channel at the times it was actually read, a value carried over from an
+    earlier pass (same acquisition time) only once.
+    """
+    header, records = read_records(path)
+    _, times = read_records(times_path(path))
+    n = min(len(records), len(times))
+    series = {}
+    for j, name in enumerate(header["columns"][1:], start=1):
+        t, v = times[:n, j], records[:n, j]
+        keep = ~np.isnan(t)
+        keep[1:] &= t[1:] != t[:-1]
+        series[name] = (t[keep], v[keep])
+    return series
+
+
+def read_plog_span(path):
+    """(first, last) timestamp of a .plog segment; only the two end records are read."""
+    header, offset = read_header(path)
+    size = 8 * len(header["columns"])
+    count = (os.path.getsize(path) - offset) // size
+    if count == 0:
+        return None, None
+    with open(path, "rb") as f:
+        f.seek(offset)
+        first = struct.unpack("<d", f.read(8))[0]
+        f.seek(offset + (count - 1) * size)
+        last = struct.unpack("<d", f.read(8))[0]
+    return (datetime.datetime.fromtimestamp(int(first)),
+            datetime.datetime.fromtimestamp(int(last)))
+
+
+def read_plog_segment(path):
+    """DataFrame with the same columns and dtypes the xlsx loader produces."""
+    import pandas as pd
+    header, records = read_records(path)
+    df = pd.DataFrame(records[:, 1:], columns=header["columns"][1:])
+    df.insert(0, "Timestamp", local_datetimes(records[:, 0]).astype("datetime64[ns]"))
+    return df
@@ -0,0 +1,244 @@
+"""
+Acquisition samples in a shared-memory ring buffer.
+
+The acquisition service (acquisition_service.py) publishes every pass
+into the next slot; any number of local processes (GUI, logger,
+analytics, exporter) attach by name and read without talking to the
+service, so a new consumer adds no serial traffic and no work to the
+poll loop.
+
+    python sample_bus.py --tail                 # print samples as they arrive
+
+The segment is a small header (samples published, capacity) followed by
+`capacity` slots of SLOT_DTYPE.  Each slot carries its own sequence
+number (seqlock): the writer sets it odd while writing sample k and to
+2k + 2 when done, so a reader knows both that the copy is whole and that
+the slot still holds sample k and was not overwritten meanwhile.
+SampleReader.view() exposes the slots as a numpy array on the shared
+memory itself, for consumers that want to scan history without copying.
+"""
+import argparse
+import os
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from row_codec import GAS_NAMES, V1_VALUE_COLUMNS
+from sample_model import NAN
+
+DEFAULT_NAME = "apgreen_samples"
+DEFAULT_CAPACITY = 3600  # one hour at the 1 s poll interval
+# DeviceData blocks in slot order
+BLOCKS = [("main_temps", 4), ("ro_temps", 2), ("pressures", 4), ("meters", 3), ("mfc_flows", 4)]
+N_VALUES = sum(n for _, n in BLOCKS)
+# Column names of the slot values: the v1 process log columns
+FIELD_NAMES = V1_VALUE_COLUMNS
+MESSAGE_LEN = 64
+
+HEADER_DTYPE = np.dtype([("head", "<u8"), ("capacity", "<u8")])
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("time", "<f8"),
+    ("values", "<f8", (N_VALUES,)),
+    ("gas", "<f8", (len(GAS_NAMES),)),
+    ("status", "u1", (N_VALUES,)),
+    ("times", "<f8", (N_VALUES,)),  # epoch seconds each value was read
+    ("gas_time", "<f8"),
+    ("trips", "<u4"),               # interlock trips since the service started
+    ("message", f"S{MESSAGE_LEN}"),  # last interlock message
+], align=True)
+
+Sample = namedtuple("Sample", "seq time values gas status trips message times gas_time")
+_created = set()  # segments owned by a SampleWriter of this process
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        # Before 3.13 the resource tracker would unlink the segment when a reader exits
+        if os.name == "posix" and name not in _created:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _views(shm):
+    header = np.ndarray((), HEADER_DTYPE, buffer=shm.buf)
+    slots = np.ndarray((int(header["capacity"]),), SLOT_DTYPE, buffer=shm.buf, offset=HEADER_DTYPE.itemsize)
+    return header, slots
+
+
+def _sample(k, record):
+    return Sample(k, float(record["time"]), tuple(record["values"].tolist()),
+                  dict(zip(GAS_NAMES, record["gas"].tolist())), tuple(record["status"].tolist()),
+                  int(record["trips"]), record["message"].decode(errors="replace"),
+                  tuple(record["times"].tolist()), float(record["gas_time"]))
+
+
+class SampleWriter:
+    def __init__(self, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY):
+        size = HEADER_DTYPE.itemsize + capacity * SLOT_DTYPE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a service that did not exit cleanly: start it over
+            old = shared_memory.SharedMemory(name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        _created.add(name)
+        self.name = name
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=self.shm.buf)
+        self.header["capacity"] = capacity
+        self.slots = np.ndarray((capacity,), SLOT_DTYPE, buffer=self.shm.buf, offset=HEADER_DTYPE.itemsize)
+        self.capacity = capacity
+        self.head = 0
+
+    def publish(self, data, gas_values, trips=0, message="", stamp=None):
+        """Write one pass (acquired at `stamp`, default now) into the next slot; readers see it once head moves."""
+        k = self.head
+        slot = self.slots[k % self.capacity]
+        slot["seq"] = 2 * k + 1
+        slot["time"] = time.time() if stamp is None else stamp
+        offset = time.time() - time.monotonic()
+        i = 0
+        for attr, n in BLOCKS:
+            block = getattr(data, attr)
+            slot["values"][i:i + n] = block.values
+            slot["status"][i:i + n] = block.status
+            slot["times"][i:i + n] = block.times
+            i += n
+        slot["times"] += offset
+        slot["gas_time"] = data.gas_time + offset
+        slot["gas"] = [NAN if gas_values.get(g) is None else gas_values[g] for g in GAS_NAMES]
+        slot["trips"] = trips
+        slot["message"] = message.encode()[:MESSAGE_LEN]
+        slot["seq"] = 2 * k + 2
+        self.head = k + 1
+        self.header["head"] = self.head
+
+    def close(self, unlink=True):
+        _created.discard(self.name)
+        # numpy views must go before the segment can be closed
+        self.header = self.slots = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class SampleReader:
+    """
+    One consumer.  read() gives the newest sample; read_new() everything
+    published since this reader's cursor, so a slow consumer only ever
+    falls behind itself (and loses the oldest samples once it is more
+    than `capacity` behind).
+    """
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+        self.shm = _attach(name)
+        self.name = name
+        self.header, self.slots = _views(self.shm)
+        self.capacity = len(self.slots)
+        head = self.published()
+        self.cursor = max(0, head - self.capacity) if from_start else head
+        self.dropped = 0
+
+    def published(self):
+        return int(self.header["head"])
+
+    def get(self, k):
+        """Sample number k (0-based), or None when it is not (or no longer) in the ring."""
+        slot = self.slots[k % self.capacity]
+        if slot["seq"] != 2 * k + 2:
+            return None
+        record = slot.copy()
+        if slot["seq"] != 2 * k + 2:
+            return None
+        return _sample(k, record)
+
+    def read(self):
+        """Newest complete sample, or None before the first publish."""
+        for _ in range(3):
+            head = self.published()
+            if head == 0:
+                return None
+            sample = self.get(head - 1)
+            if sample is not None:
+                return sample
+        return None
+
+    def read_new(self, limit=None):
+        """Samples published since the last call, oldest first."""
+        head = self.published()
+        if head - self.cursor > self.capacity:
+            self.dropped += head - self.capacity - self.cursor
+            self.cursor = head - self.capacity
+        end = head if limit is None else min(head, self.cursor + limit)
+        out = []
+        for k in range(self.cursor, end):
+            sample = self.get(k)
+            if sample is None:
+                self.dropped += 1
+            else:
+                out.append(sample)
+        self.cursor = end
+        return out
+
+    def view(self):
+        """
+        The ring itself as a numpy structured array (no copy); check each
+        row's seq after reading it, the writer does not wait for readers.
+        """
+        return self.slots
+
+    def close(self):
+        self.header = self.slots = None
+        self.shm.close()
+
+
+def apply_sample(sample, data, gas_values):
+    """Copy a Sample into a DeviceData and a gas dict (NaN gas -> None)."""
+    # Read times back on this process' monotonic clock
+    offset = time.monotonic() - time.time()
+    i = 0
+    for attr, n in BLOCKS:
+        block = getattr(data, attr)
+        for j in range(n):
+            block.values[j] = sample.values[i + j]
+            block.status[j] = sample.status[i + j]
+            block.times[j] = sample.times[i + j] + offset
+        i += n
+    data.gas_time = sample.gas_time + offset
+    for k, v in sample.gas.items():
+        gas_values[k] = None if v != v else v
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read the acquisition sample ring")
+    parser.add_argument("--name", default=DEFAULT_NAME)
+    parser.add_argument("--tail", action="store_true", help="print new samples until interrupted")
+    args = parser.parse_args(argv)
+
+    reader = SampleReader(args.name)
+    print(f"[SampleBus] '{args.name}': {reader.published()} published, capacity {reader.capacity}")
+    try:
+        while args.tail:
+            for s in reader.read_new():
+                values = " ".join("--" if v != v else f"{v:.1f}" for v in s.values)
+                print(f"{time.strftime('%H:%M:%S', time.localtime(s.time))} #{s.seq} {values}")
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if reader.dropped:
+            print(f"[SampleBus] {reader.dropped} samples dropped")
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Typed sample model shared by drivers, display, interlocks and logger.
+
+Every group of channels (TK4 temperatures, PSM4 pressures, MFC flows, ...)
+is a ChannelBlock: a contiguous float array with NaN for missing values and
+a status byte per channel that says *why* a value is missing.  Drivers fill
+blocks directly, so consumers never have to re-parse "NC"/"--"/None/31000.
+"""
+import time
+from array import array
+from time import monotonic
+
+NAN = float("nan")
+
+# Channel status bits
+ST_OK = 0x00
+ST_NO_DATA = 0x01    # not read yet
+ST_NO_REPLY = 0x02   # device did not answer or the frame was invalid
+ST_OPEN = 0x04       # sensor open / out of range (TK4 31000, PSM4 > 20 bar)
+ST_DISABLED = 0x08   # channel switched off by the operator or self-test
+ST_OFFLINE = 0x10    # device skipped while its circuit is open (device_health)
+
+# TK4 reports 31000 for an open thermocouple; anything from 2000 up is not a temperature.
+TK4_OPEN_RAW = 31000
+TEMP_OPEN_LIMIT = 2000
+# PSM4 values above this are a disconnected sensor.
+PRESSURE_OPEN_LIMIT = 20.0
+
+
+def decode_tk4(raw, decimal):
+    """(value, status) for the TK4 PV registers."""
+    value = raw / (10 ** decimal)
+    if raw == TK4_OPEN_RAW or value >= TEMP_OPEN_LIMIT:
+        return NAN, ST_OPEN
+    return value, ST_OK
+
+
+def decode_psm4(raw, decimal):
+    """(value, status) for one PSM4 channel in bar."""
+    value = raw / (10 ** decimal) / 10.0
+    if value > PRESSURE_OPEN_LIMIT:
+        return NAN, ST_OPEN
+    return round(value, 2), ST_OK
+
+
+class ChannelBlock:
+    """
+    Fixed set of channels: `values` (array of double, NaN when missing),
+    `status` (array of bytes, ST_* bits) and `times` (time.monotonic() of
+    each channel's last read, NaN before the first).  Indexing and
+    iteration yield the float values, so a block can be used wherever a
+    list of numbers was.
+    """
+    __slots__ = ("names", "values", "status", "times")
+
+    def __init__(self, names):
+        self.names = list(range(1, names + 1)) if isinstance(names, int) else list(names)
+        self.values = array("d", [NAN] * len(self.names))
+        self.status = array("B", [ST_NO_DATA] * len(self.names))
+        self.times = array("d", [NAN] * len(self.names))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __repr__(self):
+        return f"ChannelBlock({list(zip(self.names, self.values, self.status))})"
+
+    def set(self, i, value, status=ST_OK, read_time=None):
+        """
+        Store one reading taken at read_time (time.monotonic(), default now);
+        None or NaN without a status counts as no reply.
+        """
+        if status == ST_OK and (value is None or value != value):
+            status = ST_NO_REPLY
+        self.values[i] = NAN if status else value
+        self.status[i] = status
+        self.times[i] = monotonic() if read_time is None else read_time
+
+    def invalidate(self, status=ST_NO_REPLY, i=None):
+        """Mark one channel (or all when i is None) as missing."""
+        now = monotonic()
+        for j in (range(len(self.values)) if i is None else (i,)):
+            self.values[j] = NAN
+            self.status[j] = status
+            self.times[j] = now
+
+    def copy_from(self, other):
+        self.values[:] = other.values
+        self.status[:] = other.status
+        self.times[:] = other.times
+
+    def epoch_times(self):
+        """Acquisition times as epoch seconds (NaN for channels never read)."""
+        offset = time.time() - monotonic()
+        return [t + offset for t in self.times]
+
+    def ok(self, i):
+        return self.status[i] == ST_OK
+
+    def any_ok(self):
+        return any(s == ST_OK for s in self.status)
+
+    def any_above(self, limit):
+        """True if a valid channel exceeds limit (NaN never compares greater)."""
+        return any(v > limit for v in self.values)
+
+    def first_above(self, limit):
+        """Index of the first valid channel above limit, or None."""
+        for i, v in enumerate(self.values):
+            if v > limit:
+                return i
+        return None
+
+    def format(self, i, fmt="{:.1f}", missing="--", open_text=None):
+        """Display text for channel i."""
+        if self.status[i] == ST_OK:
+            return fmt.format(self.values[i])
+        if open_text is not None and self.status[i] & ST_OPEN:
+            return open_text
+        return missing
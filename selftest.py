@@ -0,0 +1,89 @@
+"""
+Device self-test, one thread per serial port.
+
+Devices on the same port are probed one after another (they share the
+line); separate ports run concurrently, so the test takes as long as the
+slowest port instead of the sum.  Results are reported as they arrive and
+the outcome is cached so the next startup can begin polling with the last
+known configuration while the test runs again.
+
+    test = SelfTest({"RS485": [("TK4_1", probe), ...], "PM": [("PowerMeter", probe)]})
+    test.start(on_result=lambda dev, ok: ..., on_done=lambda status: ...)
+"""
+import datetime
+import json
+import os
+import threading
+
+from driver_log import get_logger
+
+DISCOVERY_TIMEOUT = 0.5  # s per probe where the driver takes a timeout (power meter)
+REPLY_WAIT = 1.0         # s to wait for a probe queued to a worker thread
+
+log = get_logger("selftest")
+
+
+class SelfTest:
+    def __init__(self, groups):
+        """groups: {port name: [(device, probe), ...]}; a probe returns True when the device answered."""
+        self.groups = groups
+        self.status = {dev: False for probes in groups.values() for dev, _ in probes}
+        self.lock = threading.Lock()
+        self.remaining = len(groups)
+        self.done = threading.Event()
+
+    def _run_group(self, probes, on_result, on_done):
+        for dev, probe in probes:
+            try:
+                ok = bool(probe())
+            except Exception as e:
+                log.warning(f"[Selftest] {dev}: {e}")
+                ok = False
+            with self.lock:
+                self.status[dev] = ok
+            if on_result:
+                on_result(dev, ok)
+        with self.lock:
+            self.remaining -= 1
+            last = self.remaining == 0
+        if last:
+            self.done.set()
+            if on_done:
+                on_done(dict(self.status))
+
+    def start(self, on_result=None, on_done=None):
+        """Probe in background threads; callbacks run on those threads."""
+        if not self.groups:
+            self.done.set()
+            if on_done:
+                on_done({})
+            return
+        for port, probes in self.groups.items():
+            threading.Thread(target=self._run_group, args=(probes, on_result, on_done),
+                             name=f"selftest-{port}", daemon=True).start()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+def load_cache(path, ports):
+    """Device status of the last self-test, or None when missing or for other ports."""
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("ports") != ports:
+        return None
+    return cache.get("devices")
+
+
+def save_cache(path, ports, status):
+    cache = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "ports": ports, "devices": status}
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.error(f"[Selftest] Could not save {path}: {e}")
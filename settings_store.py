@@ -0,0 +1,126 @@
+"""
+settings.json with coalesced background writes.
+
+save() takes a snapshot of the settings and returns; a writer thread
+waits DEBOUNCE seconds after the first change and then writes only the
+newest snapshot, so a burst of setpoint edits costs one write and the
+GUI never waits on the disk.  Each write goes to a temp file that is fsync'ed and
+renamed over settings.json, so a crash leaves either the old or the new
+file, never half of one.  Keys listed in `live` are runtime state (PV
+strings and the like) and are never written.
+
+    store = SettingsStore(SETTINGS_FILE, DEFAULT_SETTINGS)
+    store.data["heater_1"]["sv"] = 120
+    store.save()
+    ...
+    store.close()          # writes anything still pending
+"""
+import copy
+import json
+import os
+import threading
+import time
+
+from driver_log import get_logger
+
+DEBOUNCE = 0.5  # s to wait for more changes before writing
+
+log = get_logger("settings")
+
+
+def read_settings(path, defaults=None):
+    """The settings file merged over defaults; a missing or unreadable file gives the defaults."""
+    data = copy.deepcopy(defaults) if defaults else {}
+    try:
+        with open(path, "r") as f:
+            data.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        log.warning(f"[Settings] Could not read {path}, using defaults: {e}")
+    return data
+
+
+class SettingsStore:
+    def __init__(self, path, defaults=None, live=(), indent=4):
+        """live: (section, key) pairs or top-level keys kept out of the file."""
+        self.path = path
+        self.live = [key if isinstance(key, tuple) else (key,) for key in live]
+        self.indent = indent
+        self.data = self.load(defaults)
+        self.writes = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+        self._thread.start()
+        if not os.path.exists(path):
+            self.save()
+
+    def load(self, defaults=None):
+        return read_settings(self.path, defaults)
+
+    def _snapshot(self, data):
+        data = copy.deepcopy(data)
+        for path in self.live:
+            section = data
+            for key in path[:-1]:
+                section = section.get(key)
+                if not isinstance(section, dict):
+                    break
+            else:
+                section.pop(path[-1], None)
+        return data
+
+    def save(self, data=None):
+        """Queue the current settings (or `data`, which replaces them) for writing."""
+        if data is not None:
+            self.data = data
+        snapshot = self._snapshot(self.data)
+        with self._cond:
+            self._pending = snapshot
+            self._cond.notify()
+
+    def update(self, values):
+        """Merge values into the settings and queue a write."""
+        self.data.update(values)
+        self.save()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Let a burst of changes collect; close() writes whatever is left
+                deadline = time.monotonic() + DEBOUNCE
+                while not self._closed and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+            self.flush()
+
+    def flush(self):
+        """Write the pending snapshot now, if there is one."""
+        with self._write_lock:
+            with self._cond:
+                snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                return
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(snapshot, f, indent=self.indent)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self.writes += 1
+            except (OSError, TypeError, ValueError) as e:
+                log.error(f"[Settings] Could not save {self.path}: {e}")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=2)
+        self.flush()
@@ -0,0 +1,34 @@
+"""
+Startup time report.
+
+Import this first in a front end: the clock starts at that import.  mark()
+prints the time since then once per stage and lists the heavy libraries
+that are already loaded, so an import that sneaks back to module level
+(pandas, matplotlib, openpyxl are only needed for plots and history) shows
+up in the console at the first poll.  For a per-module breakdown run
+`python -X importtime control1.py 2> imports.txt`.
+
+    import startup_timer
+    ...
+    startup_timer.mark("first poll")
+"""
+import sys
+import time
+
+LAUNCH = time.perf_counter()
+HEAVY_MODULES = ("pandas", "matplotlib", "openpyxl", "wx", "dearpygui", "numpy")
+
+_marked = set()
+
+
+def elapsed():
+    return time.perf_counter() - LAUNCH
+
+
+def mark(stage):
+    """Print the time to reach stage, the first time only."""
+    if stage in _marked:
+        return
+    _marked.add(stage)
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"[Startup] {stage} after {elapsed():.2f} s (loaded: {', '.join(loaded) or 'none'})")
@@ -0,0 +1,260 @@
+"""
+Telemetry for remote viewers, served from the sample ring.
+
+    python telemetry_server.py                       # localhost:8766
+    python telemetry_server.py --host 0.0.0.0        # LAN
+
+The server is just another sample_bus consumer, so subscribers never
+reach the serial worker.  Protocol: JSON lines over TCP.  A client may
+send one options line right after connecting, e.g.
+
+    {"rate": 2, "fields": ["Heater1", "PSM4_1", "CO"]}
+
+(a malformed line is answered with {"error": ...} and the connection closed)
+and then receives
+    {"type": "full", "seq": ..., "time": ..., "values": {...}, "status": {...}}
+first and every `keyframe` seconds, and in between
+    {"type": "delta", "seq": ..., "time": ..., "values": {changed only}, "status": {...}}
+at most `rate` times a second (capped by --max-rate).  Each client is
+conflated to the newest sample, so a slow client only delays itself.
+Missing values are null; status is the sample_model bit field.
+"""
+import argparse
+import json
+import math
+import socket
+import socketserver
+import threading
+import time
+
+from acquisition_service import STALE_AFTER, parse_address
+from driver_log import get_logger
+from sample_bus import DEFAULT_NAME, FIELD_NAMES, SampleReader
+
+DEFAULT_ADDRESS = "127.0.0.1:8766"
+DEFAULT_RATE = 1.0    # messages per second per client
+MAX_RATE = 10.0
+KEYFRAME_INTERVAL = 30.0
+MAX_CLIENTS = 32
+OPTIONS_WAIT = 0.5    # s to wait for the options line
+SEND_TIMEOUT = 10.0   # clients that do not read for this long are dropped
+POLL_INTERVAL = 0.05
+
+log = get_logger("telemetry")
+
+
+def snapshot(sample):
+    """Sample -> (seq, time, {field: value or None}, {field: status})."""
+    values, status = {}, {}
+    for name, v, st in zip(FIELD_NAMES, sample.values, sample.status):
+        values[name] = None if v != v else v
+        status[name] = st
+    for name, v in sample.gas.items():
+        values[name] = None if v != v else v
+    values["InterlockTrips"] = sample.trips
+    values["InterlockMessage"] = sample.message
+    return sample.seq, sample.time, values, status
+
+
+def parse_options(options, max_rate=MAX_RATE):
+    """Options line -> (rate, fields); ValueError when a value has the wrong type."""
+    rate = options.get("rate", DEFAULT_RATE)
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not math.isfinite(rate):
+        raise ValueError(f"rate must be a number, not {rate!r}")
+    fields = options.get("fields")
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        raise ValueError(f"fields must be a list of names, not {fields!r}")
+    return max(min(float(rate), max_rate), 0.01), fields
+
+
+class Subscription:
+    """Per-client rate limit and delta state."""
+    def __init__(self, rate=DEFAULT_RATE, fields=None, keyframe=KEYFRAME_INTERVAL):
+        self.interval = 1.0 / rate
+        self.fields = set(fields) if fields else None
+        self.keyframe = keyframe
+        self.seq = None
+        self.values = None
+        self.status = None
+        self.next_keyframe = 0.0
+        self.messages = 0
+        self.bytes = 0
+
+    def _pick(self, d):
+        return d if self.fields is None else {k: v for k, v in d.items() if k in self.fields}
+
+    def message(self, snap, now):
+        """Next message for this client, or None when nothing it watches changed."""
+        seq, t, values, status = snap
+        self.seq = seq
+        values, status = self._pick(values), self._pick(status)
+        if self.values is None or now >= self.next_keyframe:
+            self.next_keyframe = now + self.keyframe
+            self.values, self.status = values, status
+            return {"type": "full", "seq": seq, "time": t, "values": values, "status": status}
+        changed = {k: v for k, v in values.items() if self.values.get(k) != v}
+        changed_status = {k: v for k, v in status.items() if self.status.get(k) != v}
+        if not changed and not changed_status:
+            return None
+        self.values, self.status = values, status
+        return {"type": "delta", "seq": seq, "time": t, "values": changed, "status": changed_status}
+
+
+class _SubscriberHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        telemetry = self.server.telemetry
+        if not telemetry.register(self):
+            self.wfile.write(b'{"error": "too many clients"}\n')
+            return
+        try:
+            try:
+                rate, fields = parse_options(self.read_options(), telemetry.max_rate)
+            except ValueError as e:
+                self.wfile.write(json.dumps({"error": f"bad options: {e}"}).encode() + b"\n")
+                return
+            sub = Subscription(rate, fields, telemetry.keyframe)
+            self.subscription = sub
+            self.request.settimeout(SEND_TIMEOUT)
+            while telemetry.running:
+                snap = telemetry.wait_newer(sub.seq, timeout=1.0)
+                if snap is None:
+                    continue
+                now = time.monotonic()
+                msg = sub.message(snap, now)
+                if msg is None:
+                    continue
+                line = json.dumps(msg).encode() + b"\n"
+                self.wfile.write(line)
+                self.wfile.flush()
+                sub.messages += 1
+                sub.bytes += len(line)
+                # Rate limit: whatever arrives meanwhile is conflated into the next message
+                time.sleep(max(0.0, now + sub.interval - time.monotonic()))
+        except (OSError, ValueError):
+            pass
+        finally:
+            telemetry.unregister(self)
+
+    def read_options(self):
+        self.request.settimeout(OPTIONS_WAIT)
+        try:
+            line = self.rfile.readline()
+        except socket.timeout:
+            return {}
+        options = json.loads(line) if line.strip() else {}
+        return options if isinstance(options, dict) else {}
+
+
+class _TelemetryTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class TelemetryServer:
+    def __init__(self, shm_name=DEFAULT_NAME, address=DEFAULT_ADDRESS, max_rate=MAX_RATE,
+                 keyframe=KEYFRAME_INTERVAL, max_clients=MAX_CLIENTS):
+        self.shm_name = shm_name
+        self.max_rate = max_rate
+        self.keyframe = keyframe
+        self.max_clients = max_clients
+        self.cond = threading.Condition()
+        self.latest = None
+        self.clients = set()
+        self.running = False
+        self.server = _TelemetryTCPServer(parse_address(address), _SubscriberHandler)
+        self.server.telemetry = self
+
+    # --- Clients ---
+    def register(self, handler):
+        with self.cond:
+            if len(self.clients) >= self.max_clients:
+                return False
+            self.clients.add(handler)
+        log.info(f"[Telemetry] {handler.client_address[0]} connected ({len(self.clients)} clients)")
+        return True
+
+    def unregister(self, handler):
+        with self.cond:
+            self.clients.discard(handler)
+        log.info(f"[Telemetry] {handler.client_address[0]} disconnected")
+
+    def wait_newer(self, seq, timeout):
+        """Latest snapshot once it is newer than seq, or None after timeout."""
+        with self.cond:
+            if self.latest is None or self.latest[0] == seq:
+                self.cond.wait(timeout)
+            if self.latest is None or self.latest[0] == seq:
+                return None
+            return self.latest
+
+    def stats(self):
+        with self.cond:
+            subs = [getattr(h, "subscription", None) for h in self.clients]
+        return [{"messages": s.messages, "bytes": s.bytes} for s in subs if s is not None]
+
+    # --- Sample pump ---
+    def _pump(self):
+        reader = None
+        last_seq = None
+        last_change = time.monotonic()
+        while self.running:
+            if reader is None:
+                try:
+                    reader = SampleReader(self.shm_name)
+                except FileNotFoundError:
+                    time.sleep(1.0)
+                    continue
+            sample = reader.read()
+            now = time.monotonic()
+            if sample is not None and sample.seq != last_seq:
+                last_seq, last_change = sample.seq, now
+                snap = snapshot(sample)
+                with self.cond:
+                    self.latest = snap
+                    self.cond.notify_all()
+            elif now - last_change > STALE_AFTER:
+                # The service may have restarted with a new segment
+                reader.close()
+                reader = None
+                last_change = now
+            time.sleep(POLL_INTERVAL)
+        if reader is not None:
+            reader.close()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._pump, daemon=True).start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        log.info(f"[Telemetry] Serving '{self.shm_name}' on {self.server.server_address}")
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream acquisition samples to remote viewers")
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to serve the LAN")
+    parser.add_argument("--port", type=int, default=int(DEFAULT_ADDRESS.rsplit(":", 1)[1]))
+    parser.add_argument("--shm", default=DEFAULT_NAME)
+    parser.add_argument("--max-rate", type=float, default=MAX_RATE, help="messages/s per client")
+    parser.add_argument("--keyframe", type=float, default=KEYFRAME_INTERVAL, help="seconds between full messages")
+    parser.add_argument("--max-clients", type=int, default=MAX_CLIENTS)
+    args = parser.parse_args(argv)
+
+    server = TelemetryServer(args.shm, f"{args.host}:{args.port}", args.max_rate, args.keyframe, args.max_clients)
+    server.start()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import concurrent.futures
+import time
+
+import pytest
+
+from acquisition import Acquisition, PollClock
+
+
+def test_side_result_returns_a_finished_read():
+    read = concurrent.futures.Future()
+    read.set_result((1500.0, 2.5))
+    assert Acquisition.side_result(read, time.monotonic()) == (1500.0, 2.5)
+
+
+def test_side_result_gives_up_at_the_deadline():
+    wedged = concurrent.futures.Future()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        Acquisition.side_result(wedged, start + 0.05)
+    assert 0.04 < time.monotonic() - start < 0.5
+    # Past its deadline a read still stuck fails at once
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        Acquisition.side_result(wedged, start - 1.0)
+    assert time.monotonic() - start < 0.02
+
+
+def test_side_result_passes_on_the_read_error():
+    read = concurrent.futures.Future()
+    read.set_exception(TimeoutError("read_gases on COM10 did not finish within 1.0 s"))
+    with pytest.raises(TimeoutError, match="read_gases"):
+        Acquisition.side_result(read, time.monotonic() + 1.0)
+
+
+def test_poll_clock_keeps_the_grid():
+    clock = PollClock(0.05)
+    clock.begin()
+    first_due = clock.due
+    time.sleep(0.02)    # a pass shorter than the period
+    clock.end()
+    assert clock.remaining() <= 0.03
+    time.sleep(clock.remaining())
+    clock.begin()
+    assert clock.due == pytest.approx(first_due + 0.05)
+    assert clock.skipped == 0 and clock.overruns == 0
+
+
+def test_poll_clock_skips_missed_slots_and_counts_overruns():
+    clock = PollClock(0.02)
+    clock.begin()
+    time.sleep(0.07)    # runs through three more slots
+    clock.end()
+    assert clock.overruns == 1 and clock.remaining() <= 0
+    clock.begin()
+    assert clock.skipped >= 2
+    assert 0 < clock.remaining() <= 0.02
+
+
+def test_poll_clock_rerun_is_off_grid():
+    clock = PollClock(0.05)
+    clock.begin()
+    due = clock.due
+    clock.again()
+    assert clock.remaining() == 0.0
+    clock.begin()
+    assert clock.due == due and clock.passes == 2
+
+
+class FakeAcquisition(Acquisition):
+    """Acquisition.handle_polling() over scripted passes: True trips the temperature limit, "cmd" is cut short."""
+    poll_interval = 0.02
+
+    def __init__(self, passes):
+        self.passes = list(passes)
+        self.clock = PollClock(self.poll_interval)
+        self.armed = True
+        self.tripped = False
+        self.logged = 0
+        self.stops = 0
+        self.starts = []
+
+    def on_limit_exceeded(self, description, **event):
+        self.stops += 1
+
+    def log_sample(self):
+        self.logged += 1
+
+    def poll_once(self):
+        self.starts.append(time.monotonic())
+        step = self.passes.pop(0)
+        if step == "cmd":
+            return False
+        if step:
+            self.limit_exceeded("Max temperature exceeded")
+            return False
+        self.log_sample()
+        return True
+
+
+def test_handle_polling_paces_logs_and_rearms_a_latched_trip():
+    acq = FakeAcquisition([True, True, True, False, True])
+    start = time.monotonic()
+    while acq.passes:
+        acq.handle_polling()
+    # One emergency stop per trip: the latch holds until the clean pass re-arms it
+    assert acq.stops == 2
+    assert acq.logged == 5
+    assert not acq.armed
+    # Tripped passes wait for the clock instead of rerunning at once
+    assert time.monotonic() - start >= 4 * acq.poll_interval
+
+
+def test_handle_polling_reruns_a_pass_cut_short_by_a_command():
+    acq = FakeAcquisition(["cmd", False])
+    while acq.passes:
+        acq.handle_polling()
+    assert acq.logged == 1
+    assert acq.starts[1] - acq.starts[0] < acq.poll_interval / 2
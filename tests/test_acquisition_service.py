@@ -0,0 +1,70 @@
+import queue
+import time
+from types import SimpleNamespace
+
+from acquisition import PollClock
+from acquisition_service import AcquisitionService
+
+PERIOD = 0.02
+
+
+class FakeService(AcquisitionService):
+    """AcquisitionService.run() over a scripted sequence of passes: True is a pass over the temperature limit."""
+    def __init__(self, passes):
+        self.passes = list(passes)
+        self.clock = PollClock(PERIOD)
+        self.command_queue = queue.Queue()
+        self.server = SimpleNamespace(serve_forever=lambda: None, server_address=("test", 0))
+        self.writer = SimpleNamespace(name="test")
+        self.trips = 0
+        self.trip_message = ""
+        self.armed = True
+        self.tripped = False
+        self.running = False
+        self.pm_enabled = self.mfm_enabled = self.mfc_enabled = self.gas_analyzer_enabled = True
+        self.max_temp = 400.0
+        self.max_press = 5.0
+        self.logged = 0
+        self.stops = 0
+
+    def publish(self):
+        pass
+
+    def emergency_stop(self):
+        self.stops += 1
+
+    def log_sample(self):
+        self.logged += 1
+
+    def poll_once(self):
+        if not self.passes:
+            # End of the script: stop without counting as a clean pass
+            self.running = False
+            return None
+        if self.passes.pop(0):
+            self.limit_exceeded("Max temperature exceeded")
+            return False
+        self.log_sample()
+        return True
+
+
+def test_latched_trip_is_paced_logged_and_rearmed():
+    service = FakeService([True, True, True, False, True])
+    start = time.monotonic()
+    service.run()
+    # One stop per trip: the latch holds until the clean pass re-arms it
+    assert service.stops == 2
+    assert service.trips == 2
+    assert service.logged == 5
+    # Tripped passes wait for the clock instead of rerunning at once
+    assert time.monotonic() - start >= 4 * PERIOD
+
+
+def test_commands_are_served_during_a_trip():
+    service = FakeService([True] * 5)
+    replies = queue.Queue()
+    service.command_queue.put({"cmd": "status", "reply_queue": replies})
+    service.run()
+    reply = replies.get_nowait()
+    assert reply["trips"] == 1
+    assert not service.armed
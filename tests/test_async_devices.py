@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from async_devices import LOOP, AsyncDriver, AsyncGasAnalyzer, _coroutine
+
+
+class SlowDriver:
+    """Blocking driver stand-in: every call takes `delay` and records its thread."""
+    def __init__(self, port, delay=0.05):
+        self.port = port
+        self.delay = delay
+        self.calls = []
+        self.read_time = 1.5
+
+    def read(self, value):
+        self.calls.append((value, threading.current_thread().name))
+        time.sleep(self.delay)
+        return value
+
+    def read_gases(self):
+        return self.read({"CO": 1.0})
+
+
+class AsyncSlow(AsyncDriver):
+    read = _coroutine("read")
+
+
+def test_ports_overlap_and_one_port_stays_in_order():
+    a1, a2 = AsyncSlow(SlowDriver("A", 0.1)), AsyncSlow(SlowDriver("A", 0.1))
+    b = AsyncSlow(SlowDriver("B", 0.1))
+
+    async def poll():
+        return await asyncio.gather(a1.read(1), a2.read(2), b.read(3))
+
+    start = time.monotonic()
+    assert LOOP.run(poll()) == [1, 2, 3]
+    elapsed = time.monotonic() - start
+    # Port A runs its two calls back to back, port B alongside them (0.3 s one after another)
+    assert 0.2 <= elapsed < 0.28
+    assert a1.driver.calls[0][1] == a2.driver.calls[0][1] != b.driver.calls[0][1]
+
+
+def test_timeout_cancels_the_wait_and_drops_queued_calls():
+    driver = SlowDriver("C", delay=0.2)
+    slow = AsyncSlow(driver)
+
+    async def poll():
+        first = asyncio.ensure_future(slow.read(1))
+        await asyncio.sleep(0)  # let call 1 reach the port first
+        with pytest.raises(TimeoutError):
+            await slow.read(2, timeout=0.05)
+        return await first
+
+    start = time.monotonic()
+    assert LOOP.run(poll()) == 1
+    assert time.monotonic() - start < 0.35
+    time.sleep(0.25)
+    assert [value for value, _ in driver.calls] == [1]
+
+
+def test_run_timeout_and_stamped_gas_read():
+    with pytest.raises(TimeoutError):
+        LOOP.run(AsyncSlow(SlowDriver("D", delay=0.2)).read(1), timeout=0.05)
+    assert LOOP.run(AsyncGasAnalyzer(SlowDriver("E", delay=0)).read_gases_stamped()) == ({"CO": 1.0}, 1.5)
@@ -0,0 +1,51 @@
+import pytest
+import serial
+
+from device_health import BACKOFF_MAX, BACKOFF_MIN, CLOSED, FAILURE_THRESHOLD, HEALTH, OPEN, PROBING, Breaker
+from driver_stats import STATS
+
+
+def test_breaker_opens_after_threshold():
+    b = Breaker()
+    for _ in range(FAILURE_THRESHOLD - 1):
+        assert not b.failure(0.0)
+    assert b.failure(0.0)
+    assert b.state == OPEN and b.trips == 1
+    assert not b.allow(BACKOFF_MIN / 2)
+    assert b.skipped == 1
+
+
+def test_probe_backs_off_then_closes():
+    b = Breaker()
+    for _ in range(FAILURE_THRESHOLD):
+        b.failure(0.0)
+    assert b.allow(BACKOFF_MIN)
+    assert b.state == PROBING
+    b.failure(BACKOFF_MIN)
+    assert b.state == OPEN and b.backoff == 2 * BACKOFF_MIN
+    for _ in range(20):
+        b.state = PROBING
+        b.failure(0.0)
+    assert b.backoff == BACKOFF_MAX
+    assert b.success()
+    assert b.state == CLOSED and b.backoff == BACKOFF_MIN
+
+
+@pytest.mark.parametrize("error", [TimeoutError("no reply"), serial.SerialException("device disconnected"),
+                                   ConnectionError("port is not open")])
+def test_port_errors_trip_the_breaker(error):
+    HEALTH.reset("TEST")
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(type(error)):
+            with STATS.transaction("TEST", "read"):
+                raise error
+    assert HEALTH.state("TEST") == OPEN
+    HEALTH.reset("TEST")
+
+
+def test_garbled_reply_does_not_trip_the_breaker():
+    HEALTH.reset("TEST")
+    for _ in range(FAILURE_THRESHOLD):
+        with STATS.transaction("TEST", "read") as t:
+            t.fail()
+    assert HEALTH.state("TEST") == CLOSED
@@ -0,0 +1,100 @@
+import threading
+
+import devices
+from devices import DeviceManager
+from sample_model import ChannelBlock, ST_NO_REPLY, ST_OK
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def manager():
+    """DeviceManager with the read-through cache only (no ports)."""
+    dm = DeviceManager.__new__(DeviceManager)
+    dm.lock = threading.Lock()
+    dm.cache = {}
+    dm.cache_hits = dm.cache_misses = 0
+    return dm
+
+
+def test_cached_temperature_keeps_its_read_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(devices.time, "monotonic", clock)
+    dm = manager()
+    readings = iter([(250.0, ST_OK), (251.0, ST_OK)])
+    dm._read_temperature = lambda slave_id: next(readings)
+    assert dm.read_temperature_stamped(2, max_age=1.0) == (250.0, ST_OK, 100.0)
+    clock.now = 100.5
+    block = ChannelBlock([2])
+    block.set(0, *dm.read_temperature_stamped(2, max_age=1.0))
+    assert (block[0], block.times[0]) == (250.0, 100.0)
+    assert dm.read_temperature(2, max_age=1.0) == (250.0, ST_OK)
+    assert (dm.cache_hits, dm.cache_misses) == (2, 1)
+
+
+def test_no_reply_is_not_cached(monkeypatch):
+    monkeypatch.setattr(devices.time, "monotonic", FakeClock())
+    dm = manager()
+    readings = iter([(float("nan"), ST_NO_REPLY), (250.0, ST_OK)])
+    dm._read_temperature = lambda slave_id: next(readings)
+    assert dm.read_temperature(2, max_age=1.0)[1] == ST_NO_REPLY
+    assert dm.read_temperature(2, max_age=1.0) == (250.0, ST_OK)
+
+
+def test_waiter_reuses_the_reading_taken_ahead_of_it(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(devices.time, "monotonic", clock)
+    dm = manager()
+    entered, release = threading.Event(), threading.Event()
+    reads = []
+
+    def read():
+        reads.append(clock.now)
+        entered.set()
+        release.wait(2)
+        return len(reads)
+
+    results = {}
+
+    def caller(name):
+        results[name] = dm._read_through("k", 1.0, read, lambda value: True)
+
+    first = threading.Thread(target=caller, args=("first",))
+    first.start()
+    assert entered.wait(2)
+    # The second caller finds no entry yet and queues on the bus lock behind the read
+    second = threading.Thread(target=caller, args=("second",))
+    second.start()
+    second.join(0.05)
+    assert second.is_alive()
+    release.set()
+    first.join(2)
+    second.join(2)
+    assert results["first"] == results["second"] == (100.0, 1)
+    assert len(reads) == 1
+    assert (dm.cache_hits, dm.cache_misses) == (1, 1)
+
+
+def test_entry_past_max_age_is_read_again(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(devices.time, "monotonic", clock)
+    dm = manager()
+    reads = []
+
+    def read():
+        reads.append(clock.now)
+        return len(reads)
+
+    assert dm._read_through("k", 1.0, read, lambda value: True) == (100.0, 1)
+    clock.now = 101.0
+    assert dm._read_through("k", 1.0, read, lambda value: True) == (100.0, 1)   # exactly max_age old
+    clock.now = 101.5
+    assert dm._read_through("k", 1.0, read, lambda value: True) == (101.5, 2)
+    # max_age 0 always goes to the bus
+    assert dm._read_through("k", 0.0, read, lambda value: True) == (101.5, 3)
+    assert reads == [100.0, 101.5, 101.5]
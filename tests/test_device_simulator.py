@@ -0,0 +1,71 @@
+import struct
+
+import pytest
+
+from device_simulator import PSM4Slave, RS485BusSimulator, TK4Slave
+from modbus_rtu import READ_INPUT_REGISTERS, WRITE_REGISTER, build_frame, crc16
+from sample_model import ST_OK, ST_OPEN, decode_psm4, decode_tk4
+from tsmd import checksum, mfc_frame, mfc_prefix, mfm_read_frame, parse_float
+
+
+@pytest.fixture
+def bus():
+    slaves = [TK4Slave(2, pv=250.0, ambient=250.0), TK4Slave(3), PSM4Slave(7, pressures=(1.0, None, 2.5, 0.0))]
+    sim = RS485BusSimulator(slaves=slaves, offline={3, "MFC4"})
+    yield sim
+    sim.stop()
+
+
+def registers(reply):
+    """The uint16 values of a read reply, after checking its CRC."""
+    assert crc16(reply) == 0
+    return struct.unpack(f">{reply[2] // 2}H", reply[3:-2])
+
+
+def test_split_frames(bus):
+    rtu = build_frame(2, READ_INPUT_REGISTERS, 0x03E8, 2)
+    ascii_frame = mfc_frame(1, "03", "0038")
+    assert bus.split(rtu + ascii_frame) == (rtu, ascii_frame)
+    assert bus.split(ascii_frame + rtu) == (ascii_frame, rtu)
+    assert bus.split(rtu[:5]) == (None, rtu[:5])                  # incomplete RTU request
+    assert bus.split(ascii_frame[:-1]) == (None, ascii_frame[:-1])  # no CR yet
+    assert bus.split(b"\x02\x99" + rtu) == (None, b"\x99" + rtu)    # unknown function: resynchronise
+
+
+def test_tk4_and_psm4_register_map(bus):
+    assert decode_tk4(*registers(bus.handle(build_frame(2, READ_INPUT_REGISTERS, 0x03E8, 2)))) == (250.0, ST_OK)
+    pressures = [decode_psm4(*registers(bus.handle(build_frame(7, READ_INPUT_REGISTERS, 0x03E9 + 5 * i, 2))))
+                 for i in range(4)]
+    assert pressures[0] == (1.0, ST_OK) and pressures[1][1] == ST_OPEN and pressures[2] == (2.5, ST_OK)
+    # A write is echoed; a register outside the map is exception 2
+    write = build_frame(2, WRITE_REGISTER, 0x0000, 300)
+    assert bus.handle(write) == write
+    error = bus.handle(build_frame(2, READ_INPUT_REGISTERS, 0x0100, 1))
+    assert error[:3] == bytes([2, READ_INPUT_REGISTERS | 0x80, 2]) and crc16(error) == 0
+
+
+def test_bad_crc_is_ignored(bus):
+    frame = bytearray(build_frame(2, READ_INPUT_REGISTERS, 0x03E8, 2))
+    frame[-1] ^= 0xFF
+    assert bus.handle(bytes(frame)) is None
+    assert bus.crc_errors == 1
+
+
+def test_tsmd_replies_carry_a_valid_checksum(bus):
+    set_flow = mfc_frame(1, "01", "07", struct.pack(">f", 5.0).hex().upper())
+    for frame, reply_prefix in ((set_flow, b":0181"), (mfc_frame(1, "58", "02", "01"), b":01D8")):
+        reply = bus.handle(frame)
+        assert reply.startswith(reply_prefix)
+        assert int(reply[-3:-1], 16) == checksum(reply[:-3])
+    reply = bus.handle(mfc_frame(1, "03", "0038"))
+    assert parse_float(reply, mfc_prefix(1)) == 5.0
+    assert parse_float(bus.handle(mfm_read_frame(1))) == 10.0
+    # A frame with a wrong checksum gets no reply
+    assert bus.handle(mfc_frame(1, "03", "0038")[:-3] + b"00\r") is None
+
+
+def test_offline_devices_do_not_answer(bus):
+    assert bus.handle(build_frame(3, READ_INPUT_REGISTERS, 0x03E8, 2)) is None   # offline unit
+    assert bus.handle(build_frame(5, READ_INPUT_REGISTERS, 0x03E8, 2)) is None   # no such unit
+    assert bus.handle(mfc_frame(4, "03", "0038")) is None
+    assert bus.handle(mfc_frame(1, "03", "0038")) is not None
@@ -0,0 +1,26 @@
+import logging
+
+from driver_log import RateLimitFilter
+
+
+def record(msg, lineno=10, level=logging.WARNING):
+    return logging.LogRecord("TK4", level, "devices.py", lineno, msg, None, None)
+
+
+def test_repeats_are_suppressed_within_the_window():
+    f = RateLimitFilter(window=60.0)
+    assert f.filter(record("Read error on ID 3"))
+    assert not any(f.filter(record("Read error on ID 3")) for _ in range(5))
+    # Another message, call site or a lower level passes
+    assert f.filter(record("Read error on ID 4"))
+    assert f.filter(record("Read error on ID 3", lineno=11))
+    assert f.filter(record("Raw reply", level=logging.DEBUG))
+    assert f.filter(record("Raw reply", level=logging.DEBUG))
+
+
+def test_next_message_after_the_window_counts_the_suppressed():
+    f = RateLimitFilter(window=0.0)
+    f.seen[("TK4", "devices.py", 10, "Read error on ID 3")] = [0.0, 7]
+    r = record("Read error on ID 3")
+    assert f.filter(r)
+    assert r.getMessage() == "Read error on ID 3 (7 repeats suppressed)"
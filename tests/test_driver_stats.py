@@ -0,0 +1,62 @@
+import pytest
+
+from driver_stats import TIMEOUT_MARGIN, TIMEOUT_MIN_SAMPLES, DriverStats, nearest_rank
+
+
+def test_nearest_rank():
+    values = list(range(1, 101))
+    assert nearest_rank(values, 50) == 50
+    assert nearest_rank(values, 99) == 99
+    assert nearest_rank([], 99) == 0.0
+
+
+def test_transaction_counts_bytes_failures_and_timeouts():
+    stats = DriverStats()
+    with stats.transaction("TK4_1", "read_temperature") as t:
+        t.sent(8)
+        t.received(9)
+    with stats.transaction("TK4_1", "read_temperature") as t:
+        t.sent(8)
+        t.fail(timeout=True)
+    with pytest.raises(ValueError):
+        with stats.transaction("TK4_1", "read_temperature"):
+            raise ValueError("garbled")
+    s = stats.calls[("TK4_1", "read_temperature")]
+    assert (s.calls, s.errors, s.timeouts) == (3, 2, 1)
+    assert (s.bytes_out, s.bytes_in) == (16, 9)
+    assert len(s.good) == 1
+
+
+def test_record_fills_the_histogram():
+    stats = DriverStats()
+    for ms in (0.5, 15.0, 15.0, 3000.0, 9000.0):
+        stats.record("PM", "read_power", ms / 1000.0)
+    d = stats.calls[("PM", "read_power")].as_dict()
+    assert d["histogram"]["<=1"] == 1 and d["histogram"]["<=20"] == 2
+    assert d["histogram"]["<=5000"] == 1 and d["histogram"][">5000"] == 1
+    assert d["max_ms"] == 9000.0
+
+
+def test_adaptive_timeout():
+    stats = DriverStats()
+    # Too few replies: the default
+    stats.record("TK4_1", "read_temperature", 0.020)
+    assert stats.timeout("TK4_1", "read_temperature", 0.2, 0.05, 0.2) == 0.2
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        stats.record("TK4_1", "read_temperature", 0.030)
+    assert stats.timeout("TK4_1", "read_temperature", 0.2, 0.01, 0.2) == pytest.approx(0.030 * TIMEOUT_MARGIN)
+    # Kept within floor and ceiling
+    assert stats.timeout("TK4_1", "read_temperature", 0.2, 0.1, 0.2) == 0.1
+    assert stats.timeout("TK4_1", "read_temperature", 0.2, 0.01, 0.05) == 0.05
+    # Failed calls do not lower it
+    for _ in range(100):
+        stats.record("TK4_1", "read_temperature", 0.001, ok=False)
+    assert stats.timeout("TK4_1", "read_temperature", 0.2, 0.01, 0.2) == pytest.approx(0.030 * TIMEOUT_MARGIN)
+
+
+def test_adaptive_timeout_borrows_from_the_family():
+    stats = DriverStats()
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        stats.record("TK4_1", "read_temperature", 0.020)
+    assert stats.timeout("TK4_5", "read_temperature", 0.2, 0.01, 0.2) == 0.2
+    assert stats.timeout("TK4_5", "read_temperature", 0.2, 0.01, 0.2, family="TK4_") == pytest.approx(0.040)
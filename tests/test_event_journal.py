@@ -0,0 +1,38 @@
+import json
+
+from event_journal import EMERGENCY_STOP, OVERTEMP, EventIndex, EventJournal
+
+
+def test_records_are_written_as_json_lines(tmp_path):
+    path = tmp_path / "events.jsonl"
+    journal = EventJournal(str(path), flush_interval=60)
+    journal.record(OVERTEMP, "Overtemperature: Heater 1", device="TK4_2", value=512.3, limit=500.0)
+    journal.record(EMERGENCY_STOP)
+    assert not path.exists()    # nothing on disk until the flush
+    journal.close()
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["code"] for e in events] == [OVERTEMP, EMERGENCY_STOP]
+    assert events[0]["device"] == "TK4_2" and events[0]["limit"] == 500.0
+    assert "device" not in events[1] and "message" not in events[1]
+    assert journal.written == 2
+
+
+def test_index_queries_and_incremental_refresh(tmp_path):
+    path = tmp_path / "events.jsonl"
+    lines = [{"time": 100.0, "code": OVERTEMP, "device": "TK4_1"},
+             {"time": 200.0, "code": EMERGENCY_STOP},
+             {"time": 300.0, "code": OVERTEMP, "device": "TK4_2"}]
+    path.write_text("".join(json.dumps(e) + "\n" for e in lines))
+    index = EventIndex(str(path))
+    assert [e["time"] for e in index.query(code=OVERTEMP)] == [100.0, 300.0]
+    assert index.query(code=OVERTEMP, device="TK4_2") == [lines[2]]
+    assert [e["time"] for e in index.query(start=150.0, end=300.0)] == [200.0, 300.0]
+    assert index.query(code=OVERTEMP, start=150.0, end=250.0) == []
+    # A partly written line waits for the next refresh
+    with open(path, "a") as f:
+        f.write('{"time": 400.0, "code": "OVERTEMP", "dev')
+    assert index.refresh() == 0
+    with open(path, "a") as f:
+        f.write('ice": "TK4_1"}\n')
+    assert index.refresh() == 1
+    assert index.last(device="TK4_1")["time"] == 400.0
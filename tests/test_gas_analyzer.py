@@ -0,0 +1,88 @@
+import struct
+import time
+
+import pytest
+import serial
+
+from device_health import FAILURE_THRESHOLD, HEALTH, OPEN
+from devices import GasAnalyzer
+
+VALUES = (1250, 810, 320, 0, 2040, 60, 0, 0, 0, 5520)  # hundredths
+
+
+class FakeSerial:
+    """Replies to every request with a fixed byte string."""
+    def __init__(self, reply=b"", error=None):
+        self.reply = reply
+        self.error = error
+        self.pending = b""
+        self.timeout = 1
+        self.is_open = True
+
+    def reset_input_buffer(self):
+        self.pending = b""
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        self.pending = self.reply
+
+    def read(self, n):
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
+
+    def close(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def analyzer():
+    HEALTH.reset("GAS")
+    yield GasAnalyzer(port="test")
+    HEALTH.reset("GAS")
+
+
+def values():
+    return struct.pack(">10H", *VALUES)
+
+
+def test_reply_with_header(analyzer):
+    analyzer.ser = FakeSerial(b"\x16\x15\x01" + values() + b"\x00")
+    readings = analyzer.read_gases()
+    assert readings["CO"] == 12.5 and readings["N2"] == 55.2
+
+
+def test_headerless_reply(analyzer):
+    analyzer.ser = FakeSerial(values())
+    assert analyzer.read_gases()["H2"] == 20.4
+
+
+def test_torn_reply_is_rejected(analyzer):
+    analyzer.ser = FakeSerial(b"\x16\x15\x01" + values()[:18])
+    assert analyzer.read_gases() is None
+
+
+def test_port_error_closes_the_port(analyzer):
+    port = FakeSerial(error=OSError("device disconnected"))
+    analyzer.ser = port
+    assert analyzer.read_gases() is None
+    assert analyzer.ser is None and not port.is_open
+
+
+def test_port_errors_suspend_the_analyzer(analyzer):
+    for _ in range(FAILURE_THRESHOLD):
+        analyzer.ser = FakeSerial(error=serial.SerialException("device disconnected"))
+        analyzer.read_gases()
+    assert HEALTH.state("GAS") == OPEN
+
+
+def test_reading_carries_its_reply_time(analyzer):
+    analyzer.ser = FakeSerial(values())
+    before = time.monotonic()
+    analyzer.read_gases()
+    stamp = analyzer.read_time
+    assert before <= stamp <= time.monotonic()
+    # A failed read leaves the time of the last good reading
+    analyzer.ser = FakeSerial(b"")
+    assert analyzer.read_gases() is None
+    assert analyzer.read_time == stamp
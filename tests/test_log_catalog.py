@@ -0,0 +1,62 @@
+import datetime
+import os
+
+from log_catalog import INDEX_FILE, LogCatalog
+from run_log import RunLogWriter
+
+COLUMNS = ["Timestamp", "Heater1"]
+HOUR = datetime.datetime(2026, 3, 1, 10, 0, 0)
+
+
+def segment(folder, name, start, rows):
+    writer = RunLogWriter(os.path.join(folder, name), COLUMNS)
+    for i in range(rows):
+        writer.append((start.timestamp() + 60 * i, float(i)))
+    return writer
+
+
+def at(hours, minutes=0):
+    return HOUR + datetime.timedelta(hours=hours, minutes=minutes)
+
+
+def catalog(tmp_path):
+    segment(tmp_path, "process_log_a.plog", at(0), 30).close()   # 10:00-10:29
+    segment(tmp_path, "process_log_b.plog", at(2), 30).close()   # 12:00-12:29
+    segment(tmp_path, "other.plog", at(1), 30).close()            # not a process log
+    return LogCatalog(str(tmp_path)).refresh()
+
+
+def test_find_and_span(tmp_path):
+    cat = catalog(tmp_path)
+    assert [os.path.basename(s.path) for s in cat.segments()] == ["process_log_a.plog", "process_log_b.plog"]
+    assert cat.span() == (at(0), at(2, 29))
+    assert os.path.basename(cat.find(at(0, 15)).path) == "process_log_a.plog"
+    assert cat.find(at(1)) is None          # gap between the runs
+    assert cat.find(at(0) - datetime.timedelta(seconds=1)) is None
+
+
+def test_segments_between(tmp_path):
+    cat = catalog(tmp_path)
+    assert len(cat.segments_between()) == 2
+    assert len(cat.segments_between(at(0, 29), at(2))) == 2
+    assert len(cat.segments_between(at(0, 30), at(1, 59))) == 0
+    assert [os.path.basename(s.path) for s in cat.segments_between(start=at(1))] == ["process_log_b.plog"]
+
+
+def test_load_window_spans_segments(tmp_path):
+    df = catalog(tmp_path).load_window(at(0, 25), at(2, 4))
+    assert len(df) == 5 + 5
+    assert df["Timestamp"].is_monotonic_increasing
+    assert df["Timestamp"].iloc[0] == at(0, 25) and df["Timestamp"].iloc[-1] == at(2, 4)
+
+
+def test_growing_segment_and_cached_index(tmp_path):
+    cat = catalog(tmp_path)
+    assert os.path.exists(tmp_path / INDEX_FILE)
+    writer = segment(tmp_path, "process_log_b.plog", at(2, 30), 5)  # the logger appends to the newest run
+    writer.close()
+    assert cat.refresh().latest().end == at(2, 34)
+    # A new catalog takes closed spans from the index file
+    reopened = LogCatalog(str(tmp_path))
+    assert reopened._cache == cat._cache
+    assert reopened.refresh().span() == (at(0), at(2, 34))
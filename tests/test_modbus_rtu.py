@@ -0,0 +1,92 @@
+import struct
+
+import pytest
+
+from modbus_rtu import MAX_CACHED, READ_INPUT_REGISTERS, WRITE_REGISTER, RtuClient, build_frame, crc16
+
+
+class MemoryPort:
+    """Answers every write with the next scripted reply."""
+    timeout = 0.2
+    is_open = True
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.pending = b""
+        self.written = []
+        self.resets = 0
+
+    def write(self, data):
+        self.written.append(data)
+        self.pending = self.replies.pop(0) if self.replies else b""
+
+    def read(self, n):
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
+
+    def reset_input_buffer(self):
+        self.resets += 1
+        self.pending = b""
+
+
+def with_crc(body):
+    return body + struct.pack("<H", crc16(body))
+
+
+def client(*replies):
+    c = RtuClient("memory")
+    c.socket = MemoryPort(*replies)
+    return c
+
+
+def test_crc16_known_frame():
+    # Read input registers 0x03E8, count 2, unit 1, as sent to a TK4
+    assert build_frame(1, READ_INPUT_REGISTERS, 0x03E8, 2) == bytes.fromhex("010403E80002F1BB")
+    assert crc16(build_frame(1, READ_INPUT_REGISTERS, 0x03E8, 2)) == 0
+
+
+def test_read_decodes_registers_and_reuses_the_request():
+    c = client(with_crc(bytes([1, 4, 4]) + struct.pack(">HH", 2500, 1)),
+               with_crc(bytes([1, 4, 4]) + struct.pack(">HH", 2510, 1)))
+    first = c.read_input_registers(0x03E8, count=2, device_id=1)
+    assert not first.isError() and first.registers == [2500, 1]
+    second = c.read_input_registers(0x03E8, count=2, device_id=1)
+    assert second is first and second.registers == [2510, 1]
+    assert c.socket.written[0] == c.socket.written[1]
+
+
+def test_write_is_checked_against_its_echo():
+    frame = build_frame(2, WRITE_REGISTER, 0x0000, 300)
+    assert not client(frame).write_register(0x0000, 300, device_id=2).isError()
+    assert client(build_frame(2, WRITE_REGISTER, 0x0000, 301)).write_register(0x0000, 300, device_id=2).isError()
+
+
+def test_exception_reply():
+    response = client(with_crc(bytes([1, 0x84, 2]))).read_input_registers(0x03E8, count=2, device_id=1)
+    assert response.isError() and response.exception_code == 2
+
+
+def test_bad_crc_marks_the_frame_corrupt_and_flushes_before_the_next_request():
+    good = bytes([1, 4, 4]) + struct.pack(">HH", 2500, 1)
+    c = client(good + b"\x00\x00", with_crc(good))
+    assert c.read_input_registers(0x03E8, count=2, device_id=1).exception_code == -1
+    assert not c.read_input_registers(0x03E8, count=2, device_id=1).isError()
+    assert c.socket.resets == 1
+
+
+def test_short_reply_times_out():
+    c = client(bytes([1, 4, 4, 0x09]))
+    with pytest.raises(TimeoutError):
+        c.read_input_registers(0x03E8, count=2, device_id=1)
+
+
+def test_request_cache_is_bounded():
+    c = client()
+    for value in range(MAX_CACHED + 10):
+        c._request(1, WRITE_REGISTER, 0, value)
+    assert len(c._requests) == MAX_CACHED
+
+
+def test_closed_client_raises_connection_error():
+    with pytest.raises(ConnectionError):
+        RtuClient("memory").read_input_registers(0, count=1, device_id=1)
@@ -0,0 +1,53 @@
+import datetime
+import math
+
+from row_codec import GAS_NAMES, TEMPERATURE, VALUE, RowEncoder, TimestampFormatter
+from sample_model import ChannelBlock
+
+FIELDS = [("temps", 3, None), ("power", 1, VALUE), ("flows", 2, TEMPERATURE)]
+
+
+def encoder():
+    return RowEncoder(FIELDS, gases=GAS_NAMES[:2], access="item")
+
+
+def test_encode_converts_missing_values_to_nan():
+    temps = ChannelBlock(3)
+    temps.set(0, 25.5)
+    temps.set(2, 300.0)
+    record = encoder().encode({"temps": temps, "power": "NC", "flows": [1, 40000]}, {"CO": 12.5}, timestamp=100.0)
+    assert record[0] == 100.0
+    assert record[1] == 25.5 and math.isnan(record[2]) and record[3] == 300.0
+    assert math.isnan(record[4])                  # "NC"
+    assert record[5] == 1.0 and math.isnan(record[6])  # open sensor
+    assert record[7] == 12.5 and math.isnan(record[8])  # CO2 missing
+
+
+def test_short_sequences_and_no_gases_fill_with_nan():
+    record = encoder().encode({"temps": ChannelBlock(3), "power": 5, "flows": [2.0]}, None, timestamp=1.0)
+    assert len(record) == encoder().width == 9
+    assert record[4] == 5.0 and record[5] == 2.0
+    assert all(math.isnan(v) for v in record[6:])
+
+
+def test_pack_round_trip_keeps_nan():
+    enc = encoder()
+    record = enc.encode({"temps": ChannelBlock(3), "power": 1500.0, "flows": [1.5, 2.5]}, {"CO": 1.0, "CO2": 2.0},
+                        timestamp=1760000000.25)
+    back = enc.unpack(enc.pack(record))
+    assert len(enc.pack(record)) == 8 * enc.width
+    assert [v if v == v else "nan" for v in back] == [v if v == v else "nan" for v in record]
+
+
+def test_text_and_cells_leave_missing_values_empty():
+    enc = encoder()
+    record = (1760000000.0, 1.0, math.nan, 3.0, math.nan, 4.0, 5.0, 6.0, math.nan)
+    assert enc.to_text(record).split(",")[1:] == ["1.0", "", "3.0", "", "4.0", "5.0", "6.0", ""]
+    assert enc.to_cells(record)[1:4] == [1.0, None, 3.0]
+
+
+def test_timestamp_formatter_matches_strftime_across_hours():
+    fmt = TimestampFormatter()
+    start = datetime.datetime(2026, 3, 1, 10, 59, 58).timestamp()
+    for ts in (start, start + 1.7, start + 2.0, start + 3605.0, start - 7200.0):
+        assert fmt(ts) == datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
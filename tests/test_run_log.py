@@ -0,0 +1,57 @@
+import datetime
+import math
+
+import numpy as np
+import pytest
+
+from run_log import RunLogWriter, read_channel_series, read_plog_span, read_records, times_path
+
+COLUMNS = ["Timestamp", "Heater1", "Power"]
+T0 = datetime.datetime(2026, 3, 1, 12, 0, 0).timestamp()
+
+
+def write(path, rows, columns=COLUMNS):
+    writer = RunLogWriter(str(path), columns)
+    for row in rows:
+        writer.append(row)
+    writer.close()
+
+
+def test_round_trip_and_time_filter(tmp_path):
+    path = tmp_path / "process_log_x.plog"
+    write(path, [(T0 + i, 20.0 + i, math.nan) for i in range(5)])
+    header, records = read_records(str(path))
+    assert header["columns"] == COLUMNS
+    assert records.shape == (5, 3)
+    assert records[2, 1] == 22.0 and np.isnan(records[2, 2])
+    _, window = read_records(str(path), start=T0 + 1, end=T0 + 3)
+    assert list(window[:, 0]) == [T0 + 1, T0 + 2, T0 + 3]
+
+
+def test_reopen_appends_and_rejects_other_columns(tmp_path):
+    path = tmp_path / "process_log_x.plog"
+    write(path, [(T0, 1.0, 2.0)])
+    write(path, [(T0 + 1, 3.0, 4.0)])
+    assert len(read_records(str(path))[1]) == 2
+    with pytest.raises(ValueError):
+        RunLogWriter(str(path), COLUMNS + ["Energy"])
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / "process_log_x.plog"
+    write(path, [(T0, 1.0, 2.0), (T0 + 1, 3.0, 4.0)])
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 11)
+    assert len(read_records(str(path))[1]) == 2
+    assert read_plog_span(str(path)) == (datetime.datetime.fromtimestamp(T0), datetime.datetime.fromtimestamp(T0 + 1))
+
+
+def test_channel_series_drops_carried_over_values(tmp_path):
+    path = tmp_path / "process_log_x.plog"
+    write(path, [(T0, 20.0, 1.0), (T0 + 1, 21.0, 1.0), (T0 + 2, 22.0, 2.0)])
+    # Power was read once for the first two passes
+    write(times_path(str(path)), [(T0, T0 + 0.1, T0 + 0.5), (T0 + 1, T0 + 1.1, T0 + 0.5), (T0 + 2, T0 + 2.1, math.nan)])
+    series = read_channel_series(str(path))
+    assert list(series["Heater1"][1]) == [20.0, 21.0, 22.0]
+    times, values = series["Power"]
+    assert list(times) == [T0 + 0.5] and list(values) == [1.0]
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from acquisition import Logger
+from devices import DeviceData
+from row_codec import GAS_NAMES
+from sample_bus import FIELD_NAMES, N_VALUES, SampleReader, SampleWriter, apply_sample
+
+
+@pytest.fixture
+def ring():
+    writer = SampleWriter(f"apgreen_test_{os.getpid()}", capacity=4)
+    reader = SampleReader(writer.name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def sample_data(temp):
+    data = DeviceData()
+    data.main_temps.set(0, temp)
+    data.pressures.set(1, 1.25)
+    data.gas_time = 10.0
+    return data
+
+
+def test_field_names_are_the_log_columns(tmp_path):
+    logger = Logger(str(tmp_path / "run.plog"))
+    assert logger.columns == ["Timestamp"] + FIELD_NAMES + GAS_NAMES
+    assert len(FIELD_NAMES) == N_VALUES
+    logger.close()
+
+
+def test_publish_and_apply_round_trip(ring):
+    writer, reader = ring
+    assert reader.read() is None
+    writer.publish(sample_data(250.0), {"CO": 12.5}, trips=1, message="Max temperature exceeded", stamp=100.0)
+    sample = reader.read()
+    assert sample.seq == 0 and sample.time == 100.0 and sample.trips == 1
+    assert sample.message == "Max temperature exceeded"
+    data, gases = DeviceData(), {}
+    apply_sample(sample, data, gases)
+    assert data.main_temps[0] == 250.0 and data.pressures[1] == 1.25
+    assert gases["CO"] == 12.5 and gases["CO2"] is None
+    assert abs(data.gas_time - 10.0) < 0.01
+
+
+def test_slot_being_written_is_not_read(ring):
+    writer, reader = ring
+    writer.publish(sample_data(1.0), {})
+    # Odd seq: the writer is in the middle of this slot
+    writer.slots[0]["seq"] = 1
+    assert reader.get(0) is None
+
+
+def test_slow_reader_counts_overwritten_samples(ring):
+    writer, reader = ring
+    for i in range(6):
+        writer.publish(sample_data(float(i)), {})
+    samples = reader.read_new()
+    assert [s.values[0] for s in samples] == [2.0, 3.0, 4.0, 5.0]
+    assert reader.dropped == 2
+    assert reader.read_new() == []
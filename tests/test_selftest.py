@@ -0,0 +1,55 @@
+import json
+import threading
+
+from selftest import SelfTest, load_cache, save_cache
+
+PORTS = {"RS485_PORT": "COM3", "PM_PORT": "COM5", "GAS_ANALYZER_PORT": "COM6"}
+
+
+def test_ports_are_probed_in_parallel():
+    # Each PM probe waits for the RS485 one: only passes when the groups run at the same time
+    rs485_started = threading.Event()
+    seen = []
+
+    def broken():
+        raise OSError("port gone")
+    test = SelfTest({
+        "RS485": [("TK4_1", lambda: rs485_started.set() or True), ("PSM4", broken)],
+        "PM": [("PowerMeter", lambda: rs485_started.wait(2))],
+        "GAS": [("GasAnalyzer", lambda: None)],
+    })
+    assert test.status == {"TK4_1": False, "PSM4": False, "PowerMeter": False, "GasAnalyzer": False}
+    done = []
+    test.start(on_result=lambda dev, ok: seen.append((dev, ok)), on_done=done.append)
+    assert test.wait(2)
+    assert done == [{"TK4_1": True, "PSM4": False, "PowerMeter": True, "GasAnalyzer": False}]
+    assert len(seen) == 4
+    # Devices on one port are probed in order
+    assert [dev for dev, _ in seen if dev in ("TK4_1", "PSM4")] == ["TK4_1", "PSM4"]
+
+
+def test_no_groups_is_done_at_once():
+    done = []
+    test = SelfTest({})
+    test.start(on_done=done.append)
+    assert test.wait(0) and done == [{}]
+
+
+def test_cache_round_trip(tmp_path):
+    path = str(tmp_path / "selftest_cache.json")
+    assert load_cache(path, PORTS) is None
+    save_cache(path, PORTS, {"TK4_1": True, "PowerMeter": False})
+    assert load_cache(path, PORTS) == {"TK4_1": True, "PowerMeter": False}
+    assert not (tmp_path / "selftest_cache.json.tmp").exists()
+    # Another port setup does not use the cache
+    assert load_cache(path, dict(PORTS, PM_PORT="COM7")) is None
+    with open(path) as f:
+        assert json.load(f)["ports"] == PORTS
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    path = tmp_path / "selftest_cache.json"
+    path.write_text("{not json")
+    assert load_cache(str(path), PORTS) is None
+    # A failed save is logged, not raised
+    save_cache(str(tmp_path / "missing" / "selftest_cache.json"), PORTS, {})
@@ -0,0 +1,36 @@
+import json
+
+import settings_store
+from settings_store import SettingsStore
+
+DEFAULTS = {"MODBUS_TRANSPORT": "pymodbus", "heater_1": {"sv": 25.0, "pv": None}}
+
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(str(path), DEFAULTS)
+    store.close()
+    assert json.loads(path.read_text()) == DEFAULTS
+
+
+def test_saves_are_coalesced_and_live_values_left_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings_store, "DEBOUNCE", 0.05)
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"heater_1": {"sv": 300.0, "pv": 21.0}}))
+    store = SettingsStore(str(path), DEFAULTS, live=[("heater_1", "pv")])
+    assert store.data["heater_1"]["sv"] == 300.0
+    for sv in range(100):
+        store.data["heater_1"]["pv"] = 20.0 + sv
+        store.update({"heater_1": {"sv": float(sv), "pv": 20.0 + sv}})
+    store.close()
+    assert store.writes == 1
+    assert json.loads(path.read_text())["heater_1"] == {"sv": 99.0}
+    assert not (tmp_path / "settings.json.tmp").exists()
+
+
+def test_unreadable_file_gives_defaults(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("{not json")
+    store = SettingsStore(str(path), DEFAULTS)
+    assert store.data == DEFAULTS
+    store.close()
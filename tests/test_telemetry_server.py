@@ -0,0 +1,43 @@
+import pytest
+
+from telemetry_server import MAX_RATE, Subscription, parse_options
+
+
+def snap(seq, heater, co, heater_status=0):
+    return seq, 100.0 + seq, {"Heater1": heater, "CO": co}, {"Heater1": heater_status}
+
+
+def test_first_message_is_full_then_deltas():
+    sub = Subscription(rate=1.0, keyframe=30.0)
+    assert sub.message(snap(0, 20.0, 5.0), now=0.0) == {
+        "type": "full", "seq": 0, "time": 100.0,
+        "values": {"Heater1": 20.0, "CO": 5.0}, "status": {"Heater1": 0}}
+    assert sub.message(snap(1, 20.0, 5.0), now=1.0) is None   # nothing changed
+    assert sub.message(snap(2, 21.0, 5.0), now=2.0) == {
+        "type": "delta", "seq": 2, "time": 102.0, "values": {"Heater1": 21.0}, "status": {}}
+    assert sub.message(snap(3, 21.0, 5.0, heater_status=4), now=3.0)["status"] == {"Heater1": 4}
+
+
+def test_keyframe_resends_everything():
+    sub = Subscription(rate=1.0, keyframe=10.0)
+    sub.message(snap(0, 20.0, 5.0), now=0.0)
+    assert sub.message(snap(1, 20.0, 5.0), now=9.9) is None
+    msg = sub.message(snap(2, 20.0, 5.0), now=10.0)
+    assert msg["type"] == "full" and msg["values"] == {"Heater1": 20.0, "CO": 5.0}
+
+
+def test_field_filter():
+    sub = Subscription(rate=1.0, fields=["CO"])
+    assert sub.message(snap(0, 20.0, 5.0), now=0.0)["values"] == {"CO": 5.0}
+    assert sub.message(snap(1, 25.0, 5.0), now=1.0) is None   # Heater1 is not watched
+    assert sub.message(snap(2, 25.0, 6.0), now=2.0)["values"] == {"CO": 6.0}
+
+
+def test_parse_options():
+    assert parse_options({}) == (1.0, None)
+    assert parse_options({"rate": 1000, "fields": ["CO"]}) == (MAX_RATE, ["CO"])
+    assert parse_options({"rate": 0}) == (0.01, None)
+    for bad in ({"rate": None}, {"rate": [2]}, {"rate": "2"}, {"rate": True}, {"rate": float("nan")},
+                {"fields": "CO"}, {"fields": [1, 2]}):
+        with pytest.raises(ValueError):
+            parse_options(bad)
@@ -0,0 +1,32 @@
+import struct
+
+from tsmd import build, checksum, mfc_frame, mfc_prefix, mfm_read_frame, parse_float
+
+
+def reply(prefix, value):
+    body = prefix + b"0307" + struct.pack(">f", value).hex().upper().encode()
+    return body + b"%02X\r" % checksum(body)
+
+
+def test_frame_checksum_includes_the_colon():
+    frame = mfc_frame(2, "03", "0038")
+    assert frame.startswith(b":02030038") and frame.endswith(b"\r")
+    assert int(frame[-3:-1], 16) == checksum(b":02030038")
+    assert checksum(frame[:-3]) ^ int(frame[-3:-1], 16) == 0
+
+
+def test_frames_are_cached():
+    assert mfc_frame(1, "03", "0038") is mfc_frame(1, "03", "0038")
+    assert mfm_read_frame(1) == build(":010300")
+
+
+def test_parse_float_round_trip():
+    assert parse_float(reply(mfc_prefix(3), 12.5), mfc_prefix(3)) == 12.5
+    assert parse_float(reply(b":01", -0.25)) == -0.25
+
+
+def test_parse_float_rejects_foreign_short_and_garbled_replies():
+    good = reply(mfc_prefix(1), 100.0)
+    assert parse_float(good, mfc_prefix(2)) is None
+    assert parse_float(good[:12]) is None
+    assert parse_float(good[:7] + b"ZZZZZZZZ" + good[15:]) is None
@@ -0,0 +1,59 @@
+"""
+TSM-D ASCII frames for the MFC channels and the MFM.
+
+A frame is ":" + unit + command + data, the XOR of those bytes (":"
+included) as two hex digits, and CR.  Poll frames never change, so the
+builders are cached and a read costs a dict lookup instead of string
+formatting and a byte-by-byte checksum.  parse_float() takes the IEEE754
+value (8 hex digits at offset 7) straight from the reply bytes with
+binascii, without decode() or bytes.fromhex().
+
+    ser.write(mfc_frame(2, "03", "0038"))
+    flow = parse_float(ser.read_until(b"\\r"), mfc_prefix(2))
+
+bench_frames.py measures both against the previous code.
+"""
+import binascii
+import struct
+from functools import lru_cache, reduce
+from operator import xor
+
+_FLOAT = struct.Struct(">f")
+VALUE_SLICE = slice(7, 15)
+MIN_READ_REPLY = 16  # ":" unit(2) command(2) data type(2) value(8) CR
+
+
+def checksum(data):
+    """XOR of every byte before the checksum, ":" included."""
+    return reduce(xor, data, 0)
+
+
+def build(text):
+    body = text.encode("ascii")
+    return b"%s%02X\r" % (body, checksum(body))
+
+
+@lru_cache(maxsize=256)
+def mfc_frame(channel, cmd, addr, value=""):
+    return build(f":{channel:02d}{cmd}{addr}{value}")
+
+
+@lru_cache(maxsize=16)
+def mfm_read_frame(device_id):
+    return build(f":{device_id:02X}0300")
+
+
+@lru_cache(maxsize=16)
+def mfc_prefix(channel):
+    """Start of every reply from an MFC channel."""
+    return f":{channel:02d}".encode("ascii")
+
+
+def parse_float(resp, prefix=b":"):
+    """Value of a read reply, or None for a short, foreign or garbled reply."""
+    if len(resp) < MIN_READ_REPLY or not resp.startswith(prefix):
+        return None
+    try:
+        return _FLOAT.unpack(binascii.unhexlify(resp[VALUE_SLICE]))[0]
+    except binascii.Error:
+        return None